@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Measure TraceNexus server startup time with many configured instances."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+# Runs in a fresh interpreter so import costs are included in the measurement.
+_CHILD_SCRIPT = """
+import json
+import sys
+import time
+
+start = time.perf_counter()
+from tracenexus.server.mcp_server import TraceNexusServer
+
+imported = time.perf_counter()
+server = TraceNexusServer()
+constructed = time.perf_counter()
+
+print(json.dumps({
+    "import_s": imported - start,
+    "construct_s": constructed - imported,
+    "total_s": constructed - start,
+    "langfuse_imported": "langfuse" in sys.modules,
+    "langsmith_imported": "langsmith" in sys.modules,
+}))
+"""
+
+
+def _instance_env(instances: int) -> dict[str, str]:
+    names = [f"bench{i + 1}" for i in range(instances)]
+    env = dict(os.environ)
+    env.update(
+        {
+            "LANGFUSE_NAMES": ",".join(names),
+            "LANGFUSE_PUBLIC_KEYS": ",".join(f"pk-{name}" for name in names),
+            "LANGFUSE_SECRET_KEYS": ",".join(f"sk-{name}" for name in names),
+            "LANGFUSE_HOSTS": ",".join("https://cloud.langfuse.com" for _ in names),
+            "LANGSMITH_NAMES": ",".join(names),
+            "LANGSMITH_API_KEYS": ",".join(f"ls-{name}" for name in names),
+            "PYTHONPATH": str(REPO_ROOT),
+        }
+    )
+    return env
+
+
+def _run_once(instances: int) -> dict:
+    completed = subprocess.run(
+        [sys.executable, "-c", _CHILD_SCRIPT],
+        env=_instance_env(instances),
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark TraceNexus startup.")
+    parser.add_argument(
+        "--instances",
+        type=int,
+        default=12,
+        help="Instances to configure per provider (default: 12)",
+    )
+    parser.add_argument(
+        "--runs", type=int, default=5, help="Number of fresh-process runs"
+    )
+    args = parser.parse_args()
+
+    results = [_run_once(args.instances) for _ in range(args.runs)]
+    for key in ("import_s", "construct_s", "total_s"):
+        values = [result[key] for result in results]
+        print(
+            f"{key:12s} median={statistics.median(values) * 1000:8.1f} ms  "
+            f"min={min(values) * 1000:8.1f} ms"
+        )
+    print(f"langfuse SDK imported at startup:  {results[-1]['langfuse_imported']}")
+    print(f"langsmith SDK imported at startup: {results[-1]['langsmith_imported']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""Compare trace YAML emission with plain ``yaml.dump`` and the trace emitter."""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable
+
+import yaml
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+from tracenexus.providers.cassette import Cassette  # noqa: E402
+from tracenexus.providers.emitter import dump_yaml  # noqa: E402
+
+
+def _synthetic_trace(observations: int) -> dict[str, Any]:
+    """A Langfuse-shaped trace with datetimes and non-ASCII text."""
+    start = datetime(2025, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+    trace_id = str(uuid.uuid4())
+    return {
+        "id": trace_id,
+        "name": "agent-run",
+        "timestamp": start,
+        "sessionId": str(uuid.uuid4()),
+        "tags": ["prod", "eval"],
+        "input": {"question": "Wie spät ist es in Tōkyō?"},
+        "observations": [
+            {
+                "id": str(uuid.uuid4()),
+                "traceId": trace_id,
+                "type": "GENERATION" if i % 3 == 0 else "SPAN",
+                "name": f"step-{i % 25}",
+                "startTime": start + timedelta(milliseconds=i * 40),
+                "endTime": start + timedelta(milliseconds=i * 40 + 35),
+                "parentObservationId": str(uuid.uuid4()) if i else None,
+                "model": "gpt-4o-mini" if i % 3 == 0 else None,
+                "usage": {"input": 120 + i, "output": 48, "total": 168 + i},
+                "input": {"messages": [{"role": "user", "content": "Grüße " * 20}]},
+                "output": {"content": "Résumé of the step output. " * 10},
+                "metadata": {"attempt": 1, "cached": i % 5 == 0},
+            }
+            for i in range(observations)
+        ],
+    }
+
+
+def _chat_trace(turns: int) -> dict[str, Any]:
+    """A trace whose LLM calls each carry the whole chat history so far."""
+    start = datetime(2025, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+    history: list[dict[str, str]] = [
+        {"role": "system", "content": "You are a careful coding agent. " * 20}
+    ]
+    observations = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"Step {i}: run the tests. " * 15})
+        reply = {"role": "assistant", "content": f"Ran step {i}, all green. " * 15}
+        observations.append(
+            {
+                "id": str(uuid.uuid4()),
+                "type": "GENERATION",
+                "startTime": start + timedelta(seconds=i),
+                "input": {"messages": [dict(message) for message in history]},
+                "output": reply,
+            }
+        )
+        history.append(reply)
+    return {"id": str(uuid.uuid4()), "observations": observations}
+
+
+def _largest_recorded_trace(path: str) -> dict[str, Any]:
+    """The recorded trace with the longest JSON, from a --record cassette."""
+    cassette = Cassette(path)
+    entries = [cassette.get("trace", trace_id) for trace_id in cassette.trace_ids()]
+    recorded = [entry["data"] for entry in entries if entry and "data" in entry]
+    if not recorded:
+        raise SystemExit(f"No recorded traces in {path}")
+    return max(recorded, key=lambda trace: len(repr(trace)))
+
+
+def _plain_dump(trace: dict[str, Any]) -> str:
+    # What the providers did before the shared emitter
+    return yaml.dump(trace, sort_keys=False, indent=2, default_flow_style=False)
+
+
+def _time(func: Callable[[Any], str], trace: Any, runs: int) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func(trace)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark trace YAML emission.")
+    parser.add_argument(
+        "--observations",
+        type=int,
+        default=5000,
+        help="Observations in the synthetic trace (default: 5000)",
+    )
+    parser.add_argument(
+        "--turns",
+        type=int,
+        default=100,
+        help="LLM calls in the synthetic chat trace (default: 100)",
+    )
+    parser.add_argument(
+        "--cassette",
+        help="Use the largest trace recorded in this cassette (from "
+        "tracenexus --record) instead of the synthetic one",
+    )
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per emitter")
+    args = parser.parse_args()
+
+    if args.cassette:
+        trace = _largest_recorded_trace(args.cassette)
+        label = f"recorded trace {trace.get('id')}"
+    else:
+        trace = _synthetic_trace(args.observations)
+        label = f"{args.observations} observations"
+    size_mb = len(dump_yaml(trace).encode("utf-8")) / 1e6
+
+    baseline = statistics.median(_time(_plain_dump, trace, args.runs))
+    emitter = statistics.median(_time(dump_yaml, trace, args.runs))
+    print(f"trace: {label}, {size_mb:.1f} MB of YAML")
+    print(
+        f"yaml.dump   median={baseline * 1000:8.1f} ms  {size_mb / baseline:6.1f} MB/s"
+    )
+    print(f"dump_yaml   median={emitter * 1000:8.1f} ms  {size_mb / emitter:6.1f} MB/s")
+    print(f"speedup: {baseline / emitter:.1f}x")
+
+    chat = _chat_trace(args.turns)
+    inline = dump_yaml(chat)
+    shared = dump_yaml(chat, dedup=True)
+    inline_s = statistics.median(_time(dump_yaml, chat, args.runs))
+    shared_s = statistics.median(
+        _time(lambda trace: dump_yaml(trace, dedup=True), chat, args.runs)
+    )
+    print(f"chat trace: {args.turns} LLM calls carrying the full history")
+    print(f"inline      median={inline_s * 1000:8.1f} ms  {len(inline) / 1e6:6.2f} MB")
+    print(f"dedup       median={shared_s * 1000:8.1f} ms  {len(shared) / 1e6:6.2f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from tracenexus import analytics
+from tracenexus.analytics import SpanAggregator, analyze_traces, percentiles
+from tracenexus.providers.langfuse import LangfuseProvider
+
+
+def _trace(trace_id: str, index: int) -> dict:
+    start = datetime(2025, 1, 1, 12, 0, 0)
+    return {
+        "id": trace_id,
+        "name": "agent",
+        "timestamp": start,
+        "observations": [
+            {
+                "id": f"{trace_id}-retriever",
+                "type": "SPAN",
+                "name": "retriever",
+                "startTime": start,
+                "endTime": start + timedelta(milliseconds=100 * (index + 1)),
+                "level": "ERROR" if index == 0 else "DEFAULT",
+            },
+            {
+                "id": f"{trace_id}-llm",
+                "type": "GENERATION",
+                "name": "llm",
+                "model": "gpt-4o",
+                "startTime": start,
+                "endTime": start + timedelta(milliseconds=500),
+                "usage": {"input": 100, "output": 20, "total": 120},
+                "calculatedTotalCost": 0.01,
+            },
+        ],
+    }
+
+
+def test_percentiles_match_linear_interpolation():
+    """Test the pure-Python percentiles against known values."""
+    assert percentiles([1.0, 2.0, 3.0, 4.0], [0, 50, 100]) == [1.0, 2.5, 4.0]
+    assert percentiles([10.0], [95]) == [10.0]
+
+
+def test_span_aggregator_without_numpy():
+    """Test the pure-Python reductions used when NumPy is missing."""
+    aggregator = SpanAggregator()
+    rows = [
+        {"name": "retriever", "kind": "SPAN", "latency_ms": float(ms), "status": "ok"}
+        for ms in range(1, 101)
+    ]
+    rows.append({"name": "retriever", "kind": "SPAN", "status": "error"})
+    with patch.object(analytics, "_numpy", lambda: None):
+        aggregator.add("t1", rows)
+        (summary,) = aggregator.summarize()
+
+    assert summary["count"] == 101
+    assert summary["p50_ms"] == pytest.approx(50.5)
+    assert summary["p95_ms"] == pytest.approx(95.05)
+    assert summary["max_ms"] == 100.0
+    assert summary["errors"] == 1
+    assert summary["cost"] is None
+
+
+def test_span_aggregator_numpy_matches_pure_python():
+    """Test that the NumPy reductions give the pure-Python results."""
+    pytest.importorskip("numpy")
+    rows = [
+        {
+            "name": "llm" if ms % 3 else "retriever",
+            "kind": "GENERATION",
+            "latency_ms": float(ms * 7 % 101) if ms % 5 else None,
+            "input_tokens": float(ms) if ms % 2 else None,
+            "cost": ms / 1000,
+            "status": "error" if ms % 11 == 0 else "ok",
+        }
+        for ms in range(1, 250)
+    ]
+    rows.append({"name": "empty", "kind": "SPAN", "status": "ok"})
+    vectorized, pure = SpanAggregator(), SpanAggregator()
+    vectorized.add("t1", rows)
+    with patch.object(analytics, "_numpy", lambda: None):
+        pure.add("t1", rows)
+        expected = pure.summarize()
+
+    assert analytics._numpy() is not None
+    actual = vectorized.summarize()
+    assert [row["name"] for row in actual] == [row["name"] for row in expected]
+    for got, want in zip(actual, expected):
+        assert got == pytest.approx(want)
+
+
+@pytest.mark.asyncio
+async def test_analyze_traces_table():
+    """Test aggregating fetched traces into a per-span-name table."""
+    with patch("langfuse.Langfuse") as MockLangfuse:
+        MockLangfuse.return_value.fetch_trace.side_effect = lambda trace_id: (
+            MagicMock(data=_trace(trace_id, int(trace_id[1:])))
+        )
+        provider = LangfuseProvider("pk", "sk", "https://lf.example.com", "prod")
+
+        result = await analyze_traces(provider, trace_ids=["t0", "t1", "t2", "t3"])
+
+    lines = result.splitlines()
+    assert lines[0] == "traces: 4, spans: 12"
+    assert lines[1].startswith("name | kind | count | p50_ms")
+    rows = {line.split(" | ")[0]: line.split(" | ") for line in lines[2:]}
+    columns = lines[1].split(" | ")
+    retriever = dict(zip(columns, rows["retriever"]))
+    assert retriever["count"] == "4"
+    assert retriever["p50_ms"] == "250"
+    assert retriever["max_ms"] == "400"
+    assert retriever["error_rate"] == "0.25"
+    llm = dict(zip(columns, rows["llm"]))
+    assert llm["input_tokens"] == "400"
+    assert llm["cost"] == "0.04"
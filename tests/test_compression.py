@@ -0,0 +1,115 @@
+import zlib
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from tracenexus.server.compression import (
+    CompressionMiddleware,
+    CompressionStats,
+    choose_encoding,
+)
+
+LARGE_BODY = "observation: retriever\n" * 500
+
+
+@pytest.fixture
+def app_setup():
+    """Set up a small app wrapped in the compression middleware."""
+    stats = CompressionStats()
+
+    async def large(request):
+        return PlainTextResponse(LARGE_BODY)
+
+    async def small(request):
+        return PlainTextResponse("ok")
+
+    app = Starlette(
+        routes=[
+            Route("/large", large),
+            Route("/small", small),
+        ],
+        middleware=[Middleware(CompressionMiddleware, minimum_size=256, stats=stats)],
+    )
+    client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    )
+    return client, stats
+
+
+@pytest.mark.asyncio
+async def test_large_response_is_gzip_compressed(app_setup):
+    """Test that responses above the minimum size are compressed."""
+    client, stats = app_setup
+
+    response = await client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text == LARGE_BODY
+    assert response.num_bytes_downloaded < len(LARGE_BODY)
+    snapshot = stats.snapshot()
+    assert snapshot["compressed_responses"] == 1
+    assert snapshot["sent_bytes"] < snapshot["raw_bytes"] == len(LARGE_BODY)
+
+
+@pytest.mark.asyncio
+async def test_small_or_unaccepted_responses_are_untouched(app_setup):
+    """Test that small responses and clients without gzip get plain bodies."""
+    client, stats = app_setup
+
+    small = await client.get("/small", headers={"Accept-Encoding": "gzip"})
+    plain = await client.get("/large", headers={"Accept-Encoding": "identity"})
+
+    assert "content-encoding" not in small.headers
+    assert small.text == "ok"
+    assert "content-encoding" not in plain.headers
+    assert plain.text == LARGE_BODY
+    assert stats.snapshot()["compressed_responses"] == 0
+
+
+@pytest.mark.asyncio
+async def test_event_stream_is_compressed_per_event():
+    """Test that SSE streams are compressed and flushed after every event."""
+
+    async def app(scope, receive, send):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"text/event-stream")],
+            }
+        )
+        for i in range(3):
+            body = f"data: event {i}\n\n".encode()
+            await send({"type": "http.response.body", "body": body, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    middleware = CompressionMiddleware(app)
+    scope = {"type": "http", "path": "/sse", "headers": [(b"accept-encoding", b"gzip")]}
+    await middleware(scope, None, send)
+
+    # Headers go out before the first event
+    assert sent[0]["type"] == "http.response.start"
+    assert (b"content-encoding", b"gzip") in sent[0]["headers"]
+
+    # Every event is sync-flushed, so each chunk decodes on its own
+    decoder = zlib.decompressobj(31)
+    events = [decoder.decompress(message["body"]) for message in sent[1:4]]
+    assert events == [f"data: event {i}\n\n".encode() for i in range(3)]
+    assert middleware.stats.snapshot()["responses"] == 1
+
+
+def test_choose_encoding():
+    """Test Accept-Encoding negotiation."""
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0, deflate") is None
+    assert choose_encoding("br") is None
+    assert choose_encoding("") is None
@@ -0,0 +1,135 @@
+import json
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from tracenexus.export import build_trace_filter, export_traces
+from tracenexus.providers.langfuse import LangfuseProvider
+
+
+def _trace(trace_id: str) -> dict:
+    start = datetime(2025, 1, 1, 12, 0, 0)
+    return {
+        "id": trace_id,
+        "name": "agent",
+        "timestamp": start,
+        "observations": [
+            {
+                "id": f"{trace_id}-obs",
+                "type": "GENERATION",
+                "name": "llm",
+                "startTime": start,
+                "endTime": start + timedelta(milliseconds=250),
+                "usage": {"input": 10, "output": 5, "total": 15},
+            }
+        ],
+    }
+
+
+def _fetch_trace(trace_id):
+    if trace_id == "missing":
+        raise Exception("404 not found")
+    return MagicMock(data=_trace(trace_id))
+
+
+def _read_rows(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.mark.asyncio
+async def test_export_trace_ids_to_jsonl(tmp_path):
+    """Test exporting an ID list as span rows, skipping failures."""
+    output = str(tmp_path / "spans.jsonl")
+    with patch("langfuse.Langfuse") as MockLangfuse:
+        MockLangfuse.return_value.fetch_trace.side_effect = _fetch_trace
+        provider = LangfuseProvider("pk", "sk", "https://lf.example.com", "prod")
+
+        summary = await export_traces(
+            provider, output, trace_ids=["t1", "missing", "t2"], concurrency=2
+        )
+
+    assert summary["exported"] == 2
+    assert summary["failed"] == 1
+    assert summary["failed_trace_ids"] == ["missing"]
+    rows = _read_rows(output)
+    assert len(rows) == summary["rows"] == 4
+    assert {row["trace_id"] for row in rows} == {"t1", "t2"}
+    llm_row = next(row for row in rows if row["span_id"] == "t1-obs")
+    assert llm_row["latency_ms"] == 250.0
+    assert llm_row["total_tokens"] == 15.0
+
+
+@pytest.mark.asyncio
+async def test_export_resumes_after_interruption(tmp_path):
+    """Test that a re-run skips checkpointed traces and drops partial output."""
+    output = str(tmp_path / "spans.jsonl")
+    with patch("langfuse.Langfuse") as MockLangfuse:
+        MockLangfuse.return_value.fetch_trace.side_effect = _fetch_trace
+        provider = LangfuseProvider("pk", "sk", "https://lf.example.com", "prod")
+
+        await export_traces(provider, output, trace_ids=["t1", "t2"], batch_rows=1)
+        # Simulate rows written after the last checkpoint of a crashed run
+        with open(output, "a", encoding="utf-8") as f:
+            f.write('{"trace_id": "partial"}\n')
+
+        summary = await export_traces(provider, output, trace_ids=["t1", "t2", "t3"])
+
+    assert summary["skipped"] == 2
+    assert summary["exported"] == 1
+    rows = _read_rows(output)
+    assert [row["trace_id"] for row in rows].count("t1") == 2
+    assert "partial" not in {row["trace_id"] for row in rows}
+    assert {row["trace_id"] for row in rows} == {"t1", "t2", "t3"}
+
+
+@pytest.mark.asyncio
+async def test_export_lists_traces_by_filter(tmp_path):
+    """Test that traces are listed page by page with the filter applied."""
+    output = str(tmp_path / "spans.jsonl")
+    # A full first page (the default page size is 50) and a short last page
+    pages = {
+        1: [MagicMock(id=f"t{i}") for i in range(50)],
+        2: [MagicMock(id="t50")],
+    }
+    with patch("langfuse.Langfuse") as MockLangfuse:
+        client = MockLangfuse.return_value
+        client.fetch_trace.side_effect = _fetch_trace
+        client.fetch_traces.side_effect = lambda page, **kwargs: MagicMock(
+            data=pages[page]
+        )
+        provider = LangfuseProvider("pk", "sk", "https://lf.example.com", "prod")
+        trace_filter = build_trace_filter(name="agent", since="2025-01-01T00:00:00Z")
+
+        summary = await export_traces(
+            provider, output, trace_filter=trace_filter, limit=60
+        )
+
+    assert summary["exported"] == 51
+    assert client.fetch_traces.call_count == 2
+    kwargs = client.fetch_traces.call_args_list[0].kwargs
+    assert kwargs["name"] == "agent"
+    assert kwargs["from_timestamp"].year == 2025
+
+
+def test_build_trace_filter_rejects_bad_timestamps():
+    """Test that invalid timestamps are reported."""
+    with pytest.raises(ValueError):
+        build_trace_filter(since="yesterday")
+
+
+@pytest.mark.asyncio
+async def test_export_refuses_to_overwrite_unrelated_output(tmp_path):
+    """Test that an existing file without a progress file is left untouched."""
+    output = tmp_path / "notes.txt"
+    output.write_text("keep me\n")
+    with patch("langfuse.Langfuse") as MockLangfuse:
+        MockLangfuse.return_value.fetch_trace.side_effect = _fetch_trace
+        provider = LangfuseProvider("pk", "sk", "https://lf.example.com", "prod")
+
+        with pytest.raises(FileExistsError):
+            await export_traces(provider, str(output), trace_ids=["t1"])
+
+    assert output.read_text() == "keep me\n"
+    assert not (tmp_path / "notes.txt.progress").exists()
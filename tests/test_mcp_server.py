@@ -1,6 +1,8 @@
+import os
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+import yaml
 
 from tracenexus.server.mcp_server import TraceNexusServer
 
@@ -67,8 +69,9 @@ def test_server_initialization(server_setup):
     server_instance, mock_mcp_instance, _, _, captured_tools = server_setup
 
     assert mock_mcp_instance is not None
-    # Check if the .tool() method on the mock_mcp_instance was called twice
-    assert mock_mcp_instance.tool.call_count == 2
+    # get_trace and watch_trace for each of the two instances, plus status,
+    # export, analyze and get_trace_payload
+    assert mock_mcp_instance.tool.call_count == 8
 
     # Verify names were passed to the tool decorator
     call_args_list = mock_mcp_instance.tool.call_args_list
@@ -82,6 +85,11 @@ def test_server_initialization(server_setup):
     # Verify that the tools were captured
     assert "langsmith_test_get_trace" in captured_tools
     assert "langfuse_test_get_trace" in captured_tools
+    assert "langsmith_test_watch_trace" in captured_tools
+    assert "langfuse_test_watch_trace" in captured_tools
+    assert "export_traces" in captured_tools
+    assert "analyze_traces" in captured_tools
+    assert "tracenexus_status" in captured_tools
 
     # Since we replaced the run logic, we can't test it this way anymore.
     # To test run, we'd need a more complex setup with processes.
@@ -108,7 +116,9 @@ async def test_langsmith_get_trace_tool(server_setup):
     # The first argument to the tool function will be `self` (the server_instance)
     result = await langsmith_tool_func(trace_id="ls_trace_123")
 
-    mock_ls_provider_instance.get_trace.assert_called_once_with("ls_trace_123")
+    mock_ls_provider_instance.get_trace.assert_called_once_with(
+        "ls_trace_123", timeout=None
+    )
     assert result == "yaml_trace_output_ls"
 
 
@@ -127,5 +137,345 @@ async def test_langfuse_get_trace_tool(server_setup):
     # Call the captured tool function
     result = await langfuse_tool_func(trace_id="lf_trace_456")
 
-    mock_lf_provider_instance.get_trace.assert_called_once_with("lf_trace_456")
+    mock_lf_provider_instance.get_trace.assert_called_once_with(
+        "lf_trace_456", timeout=None
+    )
     assert result == "yaml_trace_output_lf"
+
+
+def test_reload_providers_swaps_only_changed_tools(server_setup):
+    """Test that a reload re-registers tools only for changed instances."""
+    server_instance, mock_mcp_instance, mock_ls_provider, mock_lf_provider, tools = (
+        server_setup
+    )
+    new_lf_provider = MagicMock()
+
+    with patch("tracenexus.server.mcp_server._refresh_provider_env"), patch(
+        "tracenexus.server.mcp_server.LangSmithProviderFactory"
+    ) as MockLangSmithProviderFactory, patch(
+        "tracenexus.server.mcp_server.LangfuseProviderFactory"
+    ) as MockLangfuseProviderFactory:
+        # LangSmith "test" is unchanged; Langfuse "test" is replaced by "staging"
+        MockLangSmithProviderFactory.create_providers.return_value = [
+            ("test", mock_ls_provider)
+        ]
+        MockLangfuseProviderFactory.create_providers.return_value = [
+            ("staging", new_lf_provider)
+        ]
+        server_instance.reload_providers()
+
+    removed = [call.args[0] for call in mock_mcp_instance.remove_tool.call_args_list]
+    assert removed == ["langfuse_test_get_trace", "langfuse_test_watch_trace"]
+    mock_lf_provider.retire.assert_called_once()
+    mock_ls_provider.retire.assert_not_called()
+    assert "langfuse_staging_get_trace" in tools
+    assert server_instance.langsmith_providers == {"test": mock_ls_provider}
+    assert server_instance.langfuse_providers == {"staging": new_lf_provider}
+
+
+@pytest.mark.asyncio
+async def test_watch_trace_tool(server_setup):
+    """Test that the watch_trace tool forwards the cursor to the provider."""
+    _, _, _, mock_lf_provider_instance, captured_tools = server_setup
+
+    mock_lf_provider_instance.watch_trace = AsyncMock(return_value="delta_yaml")
+
+    result = await captured_tools["langfuse_test_watch_trace"](
+        trace_id="lf_trace_456", since="abc:3", wait_seconds=120, timeout=5
+    )
+
+    mock_lf_provider_instance.watch_trace.assert_called_once_with(
+        "lf_trace_456", since="abc:3", wait_seconds=60.0, timeout=5
+    )
+    assert result == "delta_yaml"
+
+
+@pytest.mark.asyncio
+async def test_search_local_traces_tool():
+    """Test that an index path registers the search tool and hooks providers."""
+    from tracenexus.server.settings import ServerSettings
+
+    with patch(
+        "tracenexus.server.mcp_server.LangSmithProviderFactory"
+    ) as MockLangSmithProviderFactory, patch(
+        "tracenexus.server.mcp_server.LangfuseProviderFactory"
+    ) as MockLangfuseProviderFactory:
+        mock_lf_provider = MagicMock(trace_listeners=[], provider_type="langfuse")
+        mock_lf_provider.name = "test"
+        MockLangSmithProviderFactory.create_providers.return_value = []
+        MockLangfuseProviderFactory.create_providers.return_value = [
+            ("test", mock_lf_provider)
+        ]
+        server_instance = TraceNexusServer(ServerSettings(index_path=":memory:"))
+
+    assert server_instance.trace_index is not None
+    assert mock_lf_provider.trace_listeners == [server_instance.trace_index.listener]
+
+    server_instance.trace_index.add_trace(
+        "langfuse",
+        "test",
+        "trace-1",
+        [{"span_id": "obs-1", "name": "shell_tool", "error": "permission denied"}],
+    )
+    tools = await server_instance.mcp_http.get_tools()
+    assert "search_local_traces" in tools
+
+    result = await server_instance.create_search_tool()(query="permission")
+    assert "trace-1" in result
+    assert "obs-1" in result
+
+
+@pytest.mark.parametrize(
+    "transport, run_kwargs",
+    [
+        ("stdio", {"transport": "stdio", "show_banner": False}),
+        ("http", {"transport": "streamable-http", "port": 52734, "path": "/mcp"}),
+    ],
+)
+def test_single_transport_runs_in_process(transport, run_kwargs):
+    """Test that a single transport is served without forking a second server."""
+    from tracenexus.server.settings import ServerSettings
+
+    with patch(
+        "tracenexus.server.mcp_server.LangSmithProviderFactory"
+    ) as MockLangSmithProviderFactory, patch(
+        "tracenexus.server.mcp_server.LangfuseProviderFactory"
+    ) as MockLangfuseProviderFactory, patch(
+        "tracenexus.server.mcp_server.multiprocessing.Process"
+    ) as MockProcess, patch(
+        "tracenexus.server.mcp_server.signal.signal"
+    ):
+        MockLangSmithProviderFactory.create_providers.return_value = []
+        MockLangfuseProviderFactory.create_providers.return_value = []
+        server_instance = TraceNexusServer(
+            ServerSettings(transport=transport, warm_up=False)
+        )
+        server_instance.mcp_http = MagicMock()
+        server_instance.mcp_sse = MagicMock()
+
+        server_instance.run()
+
+    MockProcess.assert_not_called()
+    server_instance.mcp_sse.run.assert_not_called()
+    call_kwargs = server_instance.mcp_http.run.call_args.kwargs
+    assert {key: call_kwargs[key] for key in run_kwargs} == run_kwargs
+
+
+@pytest.mark.asyncio
+async def test_status_reports_request_and_cache_statistics():
+    """Test that the status tool and HTTP endpoint report per-instance stats."""
+    import httpx
+
+    from tracenexus.providers.langfuse import LangfuseProvider
+    from tracenexus.server.settings import ServerSettings
+
+    def fetch_trace(trace_id):
+        if trace_id == "missing":
+            raise Exception("404 not found")
+        return MagicMock(data={"id": trace_id, "observations": []})
+
+    with patch("langfuse.Langfuse") as MockLangfuse, patch(
+        "tracenexus.server.mcp_server.LangSmithProviderFactory"
+    ) as MockLangSmithProviderFactory, patch(
+        "tracenexus.server.mcp_server.LangfuseProviderFactory"
+    ) as MockLangfuseProviderFactory:
+        MockLangfuse.return_value.fetch_trace.side_effect = fetch_trace
+        provider = LangfuseProvider("pk", "sk", "https://lf.example.com", "prod")
+        MockLangSmithProviderFactory.create_providers.return_value = []
+        MockLangfuseProviderFactory.create_providers.return_value = [("prod", provider)]
+        server_instance = TraceNexusServer(
+            ServerSettings(transport="http", request_timeout=0)
+        )
+
+        for trace_id in ("t1", "t2", "t3", "missing"):
+            await provider.get_trace(trace_id)
+
+        status = yaml.safe_load(await server_instance.create_status_tool()())
+        transport = httpx.ASGITransport(app=server_instance.mcp_http.http_app())
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            response = await client.get("/status")
+
+    stats = status["providers"]["langfuse/prod"]
+    requests = stats["requests"]["get_trace"]
+    assert (requests["count"], requests["ok"], requests["not_found"]) == (4, 3, 1)
+    assert requests["not_found_rate"] == 0.25
+    assert requests["p50_ms"] <= requests["p99_ms"] <= requests["max_ms"]
+    assert stats["caches"]["prefetched"]["misses"] == 4
+    assert status["server"]["transport"] == "http"
+    assert response.status_code == 200
+    assert (
+        response.json()["providers"]["langfuse/prod"]["requests"] == stats["requests"]
+    )
+
+
+@pytest.mark.asyncio
+async def test_compact_tools_take_instance_argument():
+    """Test that compact mode registers a fixed tool set with an instance enum."""
+    from tracenexus.server.settings import ServerSettings
+
+    def mock_provider():
+        provider = MagicMock(trace_listeners=[])
+        provider.get_trace = AsyncMock(return_value="yaml_trace_output")
+        return provider
+
+    providers = {name: mock_provider() for name in ("prod", "staging", "dev")}
+    with patch(
+        "tracenexus.server.mcp_server.LangSmithProviderFactory"
+    ) as MockLangSmithProviderFactory, patch(
+        "tracenexus.server.mcp_server.LangfuseProviderFactory"
+    ) as MockLangfuseProviderFactory:
+        MockLangSmithProviderFactory.create_providers.return_value = [
+            ("dev", providers["dev"])
+        ]
+        MockLangfuseProviderFactory.create_providers.return_value = [
+            ("prod", providers["prod"]),
+            ("staging", providers["staging"]),
+        ]
+        server_instance = TraceNexusServer(
+            ServerSettings(transport="http", compact_tools=True)
+        )
+
+        tools = await server_instance.mcp_http.get_tools()
+        assert {"get_trace", "watch_trace"} <= set(tools)
+        assert not any(name.startswith("langfuse_") for name in tools)
+        schema = tools["get_trace"].parameters["properties"]["instance"]
+        assert schema["enum"] == ["dev", "prod", "staging"]
+
+        result = await tools["get_trace"].fn(
+            provider="langfuse", instance="staging", trace_id="t1"
+        )
+        assert result == "yaml_trace_output"
+        providers["staging"].get_trace.assert_awaited_once_with("t1", timeout=None)
+
+        # A reload refreshes the enum instead of adding per-instance tools
+        MockLangfuseProviderFactory.create_providers.return_value = [
+            ("prod", providers["prod"])
+        ]
+        with patch("tracenexus.server.mcp_server._refresh_provider_env"):
+            server_instance.reload_providers()
+        tools = await server_instance.mcp_http.get_tools()
+        schema = tools["get_trace"].parameters["properties"]["instance"]
+        assert schema["enum"] == ["dev", "prod"]
+
+
+@pytest.mark.asyncio
+async def test_profiling_writes_call_profiles_and_can_be_toggled(tmp_path):
+    """Test that profiled get_trace calls are written and the mode can change."""
+    import json
+    import time
+
+    import httpx
+
+    from tracenexus.providers.langfuse import LangfuseProvider
+    from tracenexus.server.settings import ServerSettings
+
+    def fetch_trace(trace_id):
+        time.sleep(0.05)
+        return MagicMock(data={"id": trace_id, "observations": []})
+
+    with patch("langfuse.Langfuse") as MockLangfuse, patch(
+        "tracenexus.server.mcp_server.LangSmithProviderFactory"
+    ) as MockLangSmithProviderFactory, patch(
+        "tracenexus.server.mcp_server.LangfuseProviderFactory"
+    ) as MockLangfuseProviderFactory:
+        MockLangfuse.return_value.fetch_trace.side_effect = fetch_trace
+        provider = LangfuseProvider("pk", "sk", "https://lf.example.com", "prod")
+        MockLangSmithProviderFactory.create_providers.return_value = []
+        MockLangfuseProviderFactory.create_providers.return_value = [("prod", provider)]
+        server_instance = TraceNexusServer(
+            ServerSettings(
+                transport="http", request_timeout=0, profile_dir=str(tmp_path)
+            )
+        )
+        await provider.get_trace("t1")
+
+        transport = httpx.ASGITransport(app=server_instance.mcp_http.http_app())
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            response = await client.post("/profiling", json={"mode": "cprofile"})
+            rejected = await client.post("/profiling", json={"rate": 2})
+        await provider.get_trace("t2")
+        server_instance.profiler.flush()
+
+    assert response.json()["mode"] == "cprofile"
+    assert response.json()["profiled"] == 1
+    assert rejected.status_code == 400
+    assert json.loads((tmp_path / "control.json").read_text())["mode"] == "cprofile"
+    calls = [
+        json.loads(line) for line in (tmp_path / "calls.jsonl").read_text().splitlines()
+    ]
+    assert [(call["trace_id"], call["mode"]) for call in calls] == [
+        ("t1", "sample"),
+        ("t2", "cprofile"),
+    ]
+    assert calls[0]["fetch_ms"] >= 50
+    assert calls[1]["file"].endswith(".prof")
+    folded = (tmp_path / "calls" / calls[0]["file"]).read_text()
+    # Stacks start at the profiled phase, not at the worker thread's bootstrap
+    assert folded.startswith("fetch;") and "concurrent.futures" not in folded
+    aggregate = next(tmp_path.glob("aggregate-*.folded")).read_text()
+    assert "fetch;tracenexus.providers.base:fetch_trace_dict" in aggregate
+
+
+def test_export_tool_stays_inside_export_dir(tmp_path):
+    """Test that export_traces outputs are confined to the export directory."""
+    from tracenexus.server.settings import ServerSettings
+
+    with patch("tracenexus.server.mcp_server.LangSmithProviderFactory"), patch(
+        "tracenexus.server.mcp_server.LangfuseProviderFactory"
+    ):
+        server_instance = TraceNexusServer(
+            ServerSettings(transport="http", export_dir=str(tmp_path / "exports"))
+        )
+
+    export_dir = str(tmp_path / "exports")
+    assert server_instance.resolve_export_path("runs/spans.jsonl") == (
+        f"{export_dir}/runs/spans.jsonl"
+    )
+    assert (tmp_path / "exports" / "runs").is_dir()
+    for output in ("../spans.jsonl", str(tmp_path / "spans.jsonl"), "", "runs/.."):
+        with pytest.raises(ValueError):
+            server_instance.resolve_export_path(output)
+    (tmp_path / "exports" / "escape").symlink_to(tmp_path)
+    with pytest.raises(ValueError):
+        server_instance.resolve_export_path("escape/spans.jsonl")
+
+
+def test_refresh_provider_env_drops_settings_deleted_from_dotenv(tmp_path, monkeypatch):
+    """Test that provider settings removed from .env leave the environment."""
+    from tracenexus.server import mcp_server
+
+    dotenv = tmp_path / ".env"
+    dotenv.write_text("LANGFUSE_NAMES=prod\nLANGFUSE_HOSTS=https://lf.example.com\n")
+    for key in ("LANGFUSE_NAMES", "LANGFUSE_HOSTS"):
+        # Set first so that the original state is restored afterwards
+        monkeypatch.setenv(key, "")
+        monkeypatch.delenv(key)
+    monkeypatch.setenv("LANGSMITH_NAMES", "from-shell")
+    monkeypatch.setattr(mcp_server, "_dotenv_keys", set())
+    monkeypatch.setattr(mcp_server, "find_dotenv", lambda: str(dotenv))
+
+    mcp_server.load_env()
+    assert os.environ["LANGFUSE_NAMES"] == "prod"
+
+    dotenv.write_text("LANGFUSE_HOSTS=https://lf2.example.com\n")
+    mcp_server._refresh_provider_env()
+
+    assert "LANGFUSE_NAMES" not in os.environ
+    assert os.environ["LANGFUSE_HOSTS"] == "https://lf2.example.com"
+    # Settings from the shell are not the .env file's to remove
+    assert os.environ["LANGSMITH_NAMES"] == "from-shell"
+
+
+def test_otlp_receiver_needs_a_single_transport():
+    """Test that --otlp-port is refused with the dual-transport mode."""
+    from tracenexus.server.settings import ServerSettings
+
+    with patch("tracenexus.server.mcp_server.LangSmithProviderFactory"), patch(
+        "tracenexus.server.mcp_server.LangfuseProviderFactory"
+    ):
+        with pytest.raises(ValueError, match="single transport"):
+            TraceNexusServer(ServerSettings(transport="both", otlp_port=4318))
@@ -1,14 +1,30 @@
+import asyncio
+import copy
+import gzip
+import json
 import os
+import threading
+import urllib.request
 import uuid
 import warnings
 from datetime import datetime, timedelta
-from unittest.mock import MagicMock, patch
+from unittest.mock import ANY, MagicMock, patch
 
 import pytest
 import yaml
 
+from tracenexus.providers.base import TraceFilter
+from tracenexus.providers.cassette import CassetteRecorder, ReplayProviderFactory
+from tracenexus.providers.emitter import dump_yaml, to_plain
 from tracenexus.providers.langfuse import LangfuseProvider, LangfuseProviderFactory
 from tracenexus.providers.langsmith import LangSmithProvider, LangSmithProviderFactory
+from tracenexus.providers.otlp import OtlpProvider, OtlpSpanStore, spans_from_otlp_json
+from tracenexus.providers.payloads import PayloadStore
+from tracenexus.server.otlp_receiver import (
+    OtlpReceiver,
+    UnsupportedEncoding,
+    decode_export_request,
+)
 
 
 @pytest.mark.asyncio
@@ -42,9 +58,7 @@ async def test_langsmith_provider_get_trace_success():
         "metadata": {},
     }
 
-    with patch(
-        "tracenexus.providers.langsmith.Client"
-    ) as MockLangsmithClientConstructor:
+    with patch("langsmith.Client") as MockLangsmithClientConstructor:
         mock_langsmith_client_instance = MockLangsmithClientConstructor.return_value
         mock_langsmith_client_instance.read_run = MagicMock(return_value=mock_run_obj)
 
@@ -57,8 +71,8 @@ async def test_langsmith_provider_get_trace_success():
 
         assert trace["id"] == dummy_uuid
         assert trace["name"] == "Test Run"
-        assert trace["start_time"] == start_time_obj
-        assert trace["end_time"] == end_time_obj
+        assert trace["start_time"] == start_time_obj.isoformat()
+        assert trace["end_time"] == end_time_obj.isoformat()
         assert trace["status"] == "completed"
         assert trace["inputs"] == {"input": "test"}
         assert trace["outputs"] == {"output": "result"}
@@ -70,9 +84,7 @@ async def test_langsmith_provider_get_trace_success():
 async def test_langsmith_provider_get_trace_not_found():
     """Test LangSmithProvider.get_trace handling of not found errors."""
 
-    with patch(
-        "tracenexus.providers.langsmith.Client"
-    ) as MockLangsmithClientConstructor:
+    with patch("langsmith.Client") as MockLangsmithClientConstructor:
         mock_langsmith_client_instance = MockLangsmithClientConstructor.return_value
 
         # Simulate a 404 error
@@ -102,7 +114,7 @@ async def test_langsmith_provider_factory():
         os.environ,
         {"LANGSMITH_API_KEYS": "key1,key2,key3", "LANGSMITH_NAMES": "prod,dev,test"},
     ):
-        with patch("tracenexus.providers.langsmith.Client"):
+        with patch("langsmith.Client"):
             providers = LangSmithProviderFactory.create_providers()
 
             assert len(providers) == 3
@@ -119,7 +131,7 @@ async def test_langsmith_provider_factory():
     with patch.dict(
         os.environ, {"LANGSMITH_API_KEYS": "key1,key2", "LANGSMITH_NAMES": ""}
     ):
-        with patch("tracenexus.providers.langsmith.Client"):
+        with patch("langsmith.Client"):
             providers = LangSmithProviderFactory.create_providers()
 
             assert len(providers) == 2
@@ -157,8 +169,8 @@ async def test_langfuse_provider_get_trace_success():
     expected_dict_representation = {
         "id": dummy_trace_id,
         "name": "Langfuse Test Trace",
-        "start_time": start_time_obj,  # yaml.dump can handle datetime
-        "end_time": end_time_obj,  # yaml.dump can handle datetime
+        "start_time": start_time_obj,
+        "end_time": end_time_obj,
         "status": "SUCCESS",
         "inputs": {"prompt": "Hello"},
         "outputs": {"completion": "World"},
@@ -180,9 +192,7 @@ async def test_langfuse_provider_get_trace_success():
     mock_fetch_response_obj = MagicMock()
     mock_fetch_response_obj.data = mock_trace_details_obj
 
-    with patch(
-        "tracenexus.providers.langfuse.Langfuse"
-    ) as MockLangfuseClientConstructor:
+    with patch("langfuse.Langfuse") as MockLangfuseClientConstructor:
         mock_langfuse_client_instance = MockLangfuseClientConstructor.return_value
         # Mock the fetch_trace method to return our mock_fetch_response_obj
         mock_langfuse_client_instance.fetch_trace = MagicMock(
@@ -210,10 +220,8 @@ async def test_langfuse_provider_get_trace_success():
             assert loaded_data["name"] == "Langfuse Test Trace"
             assert loaded_data["inputs"] == {"prompt": "Hello"}
             assert loaded_data["metadata"] == {"user": "test_user"}
-            # Note: datetime objects get converted to YAML timestamp strings.
-            # Comparing them directly after loading might require parsing them back to datetime
-            # or comparing their string representations if that's easier for the test.
-            assert str(loaded_data["start_time"]) == str(start_time_obj)
+            # Datetimes are emitted as ISO 8601 strings
+            assert loaded_data["start_time"] == start_time_obj.isoformat()
 
         except ImportError:
             warnings.warn(
@@ -227,9 +235,7 @@ async def test_langfuse_provider_get_trace_success():
 async def test_langfuse_provider_get_trace_not_found():
     """Test LangfuseProvider.get_trace handling of not found errors."""
 
-    with patch(
-        "tracenexus.providers.langfuse.Langfuse"
-    ) as MockLangfuseClientConstructor:
+    with patch("langfuse.Langfuse") as MockLangfuseClientConstructor:
         mock_langfuse_client_instance = MockLangfuseClientConstructor.return_value
 
         # Simulate a not found error
@@ -267,7 +273,7 @@ async def test_langfuse_provider_factory():
             "LANGFUSE_NAMES": "prod,dev,test",
         },
     ):
-        with patch("tracenexus.providers.langfuse.Langfuse"):
+        with patch("langfuse.Langfuse"):
             providers = LangfuseProviderFactory.create_providers()
 
             assert len(providers) == 3
@@ -290,7 +296,7 @@ async def test_langfuse_provider_factory():
             "LANGFUSE_NAMES": "",
         },
     ):
-        with patch("tracenexus.providers.langfuse.Langfuse"):
+        with patch("langfuse.Langfuse"):
             providers = LangfuseProviderFactory.create_providers()
 
             assert len(providers) == 2
@@ -322,3 +328,787 @@ async def test_langfuse_provider_factory():
     ):
         providers = LangfuseProviderFactory.create_providers()
         assert len(providers) == 0
+
+
+def test_providers_defer_client_creation():
+    """Test that SDK clients are only built on first use."""
+    with patch("langfuse.Langfuse") as MockLangfuseClientConstructor, patch(
+        "langsmith.Client"
+    ) as MockLangsmithClientConstructor:
+        langfuse_provider = LangfuseProvider(
+            public_key="test_pk",
+            secret_key="test_sk",
+            host="https://test.com",
+            name="test",
+        )
+        langsmith_provider = LangSmithProvider(api_key="test_api_key", name="test")
+
+        MockLangfuseClientConstructor.assert_not_called()
+        MockLangsmithClientConstructor.assert_not_called()
+        assert not langfuse_provider.client_initialized
+        assert not langsmith_provider.client_initialized
+
+        # Repeated access reuses the same client
+        assert langfuse_provider.client is langfuse_provider.client
+        assert langsmith_provider.client is langsmith_provider.client
+
+        MockLangfuseClientConstructor.assert_called_once_with(
+            public_key="test_pk",
+            secret_key="test_sk",
+            host="https://test.com",
+            httpx_client=ANY,
+        )
+        MockLangsmithClientConstructor.assert_called_once_with(
+            api_key="test_api_key", api_url=ANY, auto_batch_tracing=False
+        )
+
+
+def test_provider_factory_reuses_unchanged_providers():
+    """Test that factories only rebuild instances whose settings changed."""
+    with patch.dict(
+        os.environ,
+        {"LANGSMITH_API_KEYS": "key1,key2", "LANGSMITH_NAMES": "prod,dev"},
+    ):
+        first = dict(LangSmithProviderFactory.create_providers())
+
+    with patch.dict(
+        os.environ,
+        {"LANGSMITH_API_KEYS": "key1,key3", "LANGSMITH_NAMES": "prod,dev"},
+    ):
+        second = dict(LangSmithProviderFactory.create_providers(first))
+
+    assert second["prod"] is first["prod"]
+    assert second["dev"] is not first["dev"]
+    assert second["dev"].api_key == "key3"
+
+
+def test_langsmith_reload_rebuilds_instances_when_only_the_endpoint_changes():
+    """Test that a new LANGSMITH_ENDPOINT alone replaces the instances."""
+    settings = {"LANGSMITH_API_KEYS": "key1", "LANGSMITH_NAMES": "prod"}
+    with patch.dict(
+        os.environ, {**settings, "LANGSMITH_ENDPOINT": "https://a.example.com"}
+    ):
+        first = dict(LangSmithProviderFactory.create_providers())
+        unchanged = dict(LangSmithProviderFactory.create_providers(first))
+    with patch.dict(
+        os.environ, {**settings, "LANGSMITH_ENDPOINT": "https://b.example.com"}
+    ):
+        second = dict(LangSmithProviderFactory.create_providers(first))
+
+    assert unchanged["prod"] is first["prod"]
+    assert second["prod"] is not first["prod"]
+    assert second["prod"].endpoint == "https://b.example.com"
+
+
+def test_provider_retire_waits_for_in_flight_calls():
+    """Test that a retired provider closes its client after in-flight calls."""
+    with patch("langsmith.Client") as MockLangsmithClientConstructor:
+        provider = LangSmithProvider(api_key="test_api_key", name="test")
+        mock_client = provider.client
+
+        with provider._track_call():
+            provider.retire()
+            mock_client.cleanup.assert_not_called()
+
+        mock_client.cleanup.assert_called_once()
+        assert not provider.client_initialized
+        MockLangsmithClientConstructor.assert_called_once()
+
+
+def test_providers_share_connection_pool_per_host():
+    """Test that instances on the same host share one HTTP pool."""
+    with patch("langfuse.Langfuse") as MockLangfuseClientConstructor:
+        providers = [
+            LangfuseProvider("pk1", "sk1", "https://cloud.langfuse.com", "dev"),
+            LangfuseProvider("pk2", "sk2", "https://CLOUD.langfuse.com/", "prod"),
+            LangfuseProvider("pk3", "sk3", "https://self-hosted.test", "other"),
+        ]
+        for provider in providers:
+            provider.client
+
+        pools = [
+            call.kwargs["httpx_client"]
+            for call in MockLangfuseClientConstructor.call_args_list
+        ]
+        assert pools[0] is pools[1]
+        assert pools[0] is not pools[2]
+        # Credentials stay per instance
+        assert [
+            call.kwargs["public_key"]
+            for call in MockLangfuseClientConstructor.call_args_list
+        ] == ["pk1", "pk2", "pk3"]
+
+
+def test_langsmith_clients_share_warmed_adapter(monkeypatch):
+    """Test that real LangSmith clients use the adapter warmed up at startup."""
+    import requests
+
+    monkeypatch.delenv("LANGSMITH_ENDPOINT", raising=False)
+    monkeypatch.delenv("LANGCHAIN_ENDPOINT", raising=False)
+    url = "https://api.smith.langchain.com"
+    warmed = []
+
+    def send(adapter, request, **kwargs):
+        warmed.append(adapter)
+        response = requests.Response()
+        response.status_code, response.request = 200, request
+        return response
+
+    with patch.object(requests.adapters.HTTPAdapter, "send", send):
+        LangSmithProvider("lsv2_key1", "dev").warm_up()
+    providers = [
+        LangSmithProvider("lsv2_key1", "dev"),
+        LangSmithProvider("lsv2_key2", "prod"),
+    ]
+    sessions = [provider.client.session for provider in providers]
+
+    adapter = sessions[0].get_adapter(url)
+    assert warmed == [adapter]
+    assert sessions[1].get_adapter(url) is adapter
+    assert sessions[0] is not sessions[1]
+    # Closing one client's session leaves the shared pool open for the other
+    with patch.object(adapter, "close") as close_adapter:
+        providers[0].close()
+        sessions[0].close()
+    close_adapter.assert_not_called()
+    assert sessions[1].get_adapter(url) is adapter
+    providers[1].close()
+
+
+def test_langsmith_warm_up_does_not_import_the_sdk(monkeypatch):
+    """Test that warming up a LangSmith host leaves the SDK unimported."""
+    import sys
+
+    import requests
+
+    monkeypatch.setenv("LANGSMITH_ENDPOINT", "https://warm.smith.example.com")
+    # Any import of the SDK fails
+    monkeypatch.setitem(sys.modules, "langsmith", None)
+    monkeypatch.setitem(sys.modules, "langsmith.client", None)
+
+    def send(adapter, request, **kwargs):
+        response = requests.Response()
+        response.status_code, response.request = 200, request
+        return response
+
+    with patch.object(requests.adapters.HTTPAdapter, "send", send):
+        LangSmithProvider("lsv2_key", "dev").warm_up()
+
+
+@pytest.mark.asyncio
+async def test_langfuse_provider_watch_trace_returns_only_changes():
+    """Test that watch_trace returns only observations changed since the cursor."""
+    snapshots = [
+        {
+            "id": "t1",
+            "output": None,
+            "observations": [
+                {"id": "o1", "name": "retriever", "endTime": None},
+            ],
+        },
+        {
+            "id": "t1",
+            "output": None,
+            "observations": [
+                {"id": "o1", "name": "retriever", "endTime": "2025-01-01T00:00:01"},
+                {"id": "o2", "name": "llm", "endTime": None},
+            ],
+        },
+        {
+            "id": "t1",
+            "output": "done",
+            "observations": [
+                {"id": "o1", "name": "retriever", "endTime": "2025-01-01T00:00:01"},
+                {"id": "o2", "name": "llm", "endTime": None},
+            ],
+        },
+    ]
+
+    def fetch_trace(trace_id):
+        response = MagicMock()
+        response.data = copy.deepcopy(
+            snapshots.pop(0) if len(snapshots) > 1 else snapshots[0]
+        )
+        return response
+
+    with patch("langfuse.Langfuse") as MockLangfuseClientConstructor:
+        MockLangfuseClientConstructor.return_value.fetch_trace = MagicMock(
+            side_effect=fetch_trace
+        )
+        provider = LangfuseProvider("pk", "sk", "https://test.com", "test")
+
+        first = yaml.safe_load(await provider.watch_trace("t1"))
+        assert first["full"] is True
+        assert first["trace"]["id"] == "t1"
+        assert [o["id"] for o in first["observations"]] == ["o1"]
+
+        second = yaml.safe_load(await provider.watch_trace("t1", first["cursor"]))
+        assert second["full"] is False
+        assert "trace" not in second
+        assert [o["id"] for o in second["observations"]] == ["o1", "o2"]
+
+        third = yaml.safe_load(await provider.watch_trace("t1", second["cursor"]))
+        assert third["trace"]["output"] == "done"
+        assert third["observations"] == []
+
+        # An unknown cursor falls back to the full trace
+        assert yaml.safe_load(await provider.watch_trace("t1", "stale:9"))["full"]
+
+
+@pytest.mark.asyncio
+async def test_langfuse_prefetches_traces_in_same_session():
+    """Test that session siblings are prefetched and served from the cache."""
+    from tracenexus.providers.prefetch import Prefetcher
+
+    def fetch_trace(trace_id):
+        response = MagicMock()
+        response.data = {"id": trace_id, "sessionId": "s1", "observations": []}
+        return response
+
+    listener_threads = []
+
+    def fetch_traces(**kwargs):
+        listener_threads.append(threading.current_thread().name)
+        return MagicMock(
+            data=[MagicMock(id="t1"), MagicMock(id="t2"), MagicMock(id="t3")]
+        )
+
+    with patch("langfuse.Langfuse") as MockLangfuseClientConstructor:
+        client = MockLangfuseClientConstructor.return_value
+        client.fetch_trace = MagicMock(side_effect=fetch_trace)
+        client.fetch_traces.side_effect = fetch_traces
+        provider = LangfuseProvider("pk", "sk", "https://test.com", "test")
+        prefetcher = Prefetcher(ttl=60, max_related=5)
+        provider.trace_listeners.append(prefetcher.listener)
+
+        await provider.get_trace("t1")
+        await asyncio.gather(*provider._background_tasks)
+
+        client.fetch_traces.assert_called_once_with(session_id="s1", limit=6)
+        # Listeners run on the instance's own listener threads
+        assert listener_threads[0].startswith("tracenexus-test-listeners")
+        assert client.fetch_trace.call_count == 3
+        assert prefetcher.prefetched_count == 2
+
+        trace = yaml.safe_load(await provider.get_trace("t2"))
+        assert trace["id"] == "t2"
+        await asyncio.gather(*provider._background_tasks)
+        # Served from the prefetch cache; the session is not expanded again
+        assert client.fetch_trace.call_count == 3
+        client.fetch_traces.assert_called_once()
+
+        # The prefetched copy is served once; a repeat lookup is fresh
+        await provider.get_trace("t2")
+        await asyncio.gather(*provider._background_tasks)
+        assert client.fetch_trace.call_count == 4
+
+
+@pytest.mark.asyncio
+async def test_get_trace_deadline_is_passed_to_upstream_request():
+    """Test that a timeout reaches the HTTP call and bounds the wait."""
+    release = threading.Event()
+
+    def slow_get(trace_id, request_options):
+        release.wait(5)
+        return {"id": trace_id}
+
+    with patch("langfuse.Langfuse") as MockLangfuseClientConstructor:
+        trace_api = MockLangfuseClientConstructor.return_value.client.trace
+        trace_api.get = MagicMock(side_effect=slow_get)
+        provider = LangfuseProvider("pk", "sk", "https://test.com", "test")
+        provider.request_timeout = 30.0
+
+        result = await provider.get_trace("t1", timeout=0.2)
+        release.set()
+
+    assert result == "Timed out after 0.2s fetching trace from test: t1"
+    trace_api.get.assert_called_once_with(
+        "t1", request_options={"timeout_in_seconds": 1}
+    )
+    assert provider.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_get_trace_releases_provider():
+    """Test that cancelling a request stops waiting on the upstream fetch."""
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_read_run(trace_id):
+        started.set()
+        release.wait(5)
+
+    with patch("langsmith.Client") as MockLangsmithClientConstructor:
+        MockLangsmithClientConstructor.return_value.read_run = MagicMock(
+            side_effect=slow_read_run
+        )
+        provider = LangSmithProvider(api_key="test_api_key", name="test")
+
+        task = asyncio.create_task(provider.get_trace("run-1"))
+        await asyncio.to_thread(started.wait, 5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        release.set()
+
+    assert provider.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_provider_executor_sheds_load_per_instance():
+    """Test that a saturated instance rejects calls without affecting others."""
+    release = threading.Event()
+
+    def slow_get(trace_id, request_options=None):
+        release.wait(5)
+        return {"id": trace_id}
+
+    with patch("langfuse.Langfuse") as MockLangfuseClientConstructor, patch(
+        "langsmith.Client"
+    ) as MockLangsmithClientConstructor:
+        MockLangfuseClientConstructor.return_value.fetch_trace = MagicMock(
+            side_effect=lambda trace_id: MagicMock(data=slow_get(trace_id))
+        )
+        MockLangsmithClientConstructor.return_value.read_run = MagicMock(
+            return_value=MagicMock(dict=MagicMock(return_value={"id": "run-1"}))
+        )
+        slow = LangfuseProvider("pk", "sk", "https://test.com", "slow")
+        slow.executor.configure(max_workers=1, max_queue=1)
+        healthy = LangSmithProvider(api_key="test_api_key", name="healthy")
+
+        running = asyncio.create_task(slow.get_trace("t1"))
+        queued = asyncio.create_task(slow.get_trace("t2"))
+        while slow.executor.stats()["queued"] < 1:
+            await asyncio.sleep(0.01)
+
+        rejected = await slow.get_trace("t3")
+        assert "overloaded" in rejected
+        assert yaml.safe_load(await healthy.get_trace("run-1"))["id"] == "run-1"
+
+        stats = slow.executor.stats()
+        assert (stats["active"], stats["queued"], stats["rejected"]) == (1, 1, 1)
+        assert stats["utilization"] == 1.0
+
+        release.set()
+        await asyncio.gather(running, queued)
+        assert slow.executor.stats()["completed"] == 2
+
+
+def test_emitter_converts_sdk_values_to_plain_types():
+    """Test that UUIDs, datetimes and nested models become JSON types."""
+    run_id = uuid.uuid4()
+    started = datetime(2025, 1, 1, 12, 0, 0)
+    model = MagicMock(spec=["dict"])
+    model.dict.return_value = {"id": run_id, "tags": ("a", "b")}
+
+    plain = to_plain({"run": model, "start_time": started, 1: None})
+
+    assert plain == {
+        "run": {"id": str(run_id), "tags": ["a", "b"]},
+        "start_time": "2025-01-01T12:00:00",
+        "1": None,
+    }
+
+
+@pytest.mark.asyncio
+async def test_langsmith_provider_keeps_unicode_in_yaml():
+    """Test that non-ASCII text is emitted as-is rather than escaped."""
+    with patch("langsmith.Client") as MockLangsmithClientConstructor:
+        MockLangsmithClientConstructor.return_value.read_run = MagicMock(
+            return_value=MagicMock(
+                dict=MagicMock(return_value={"id": "run-1", "outputs": "héllo 世界"})
+            )
+        )
+        provider = LangSmithProvider(api_key="test_api_key", name="test")
+
+        trace_yaml_str = await provider.get_trace("run-1")
+
+    assert "héllo 世界" in trace_yaml_str
+    assert trace_yaml_str == dump_yaml({"id": "run-1", "outputs": "héllo 世界"})
+
+
+@pytest.mark.asyncio
+async def test_large_payload_is_spilled_and_read_in_ranges(tmp_path):
+    """Test that an oversized output becomes a handle readable in ranges."""
+    document = "Grüße aus Köln. " * 200
+    with patch("langsmith.Client") as MockLangsmithClientConstructor:
+        MockLangsmithClientConstructor.return_value.read_run = MagicMock(
+            return_value=MagicMock(
+                dict=MagicMock(return_value={"id": "run-1", "outputs": document})
+            )
+        )
+        provider = LangSmithProvider(api_key="test_api_key", name="test")
+        provider.payload_store = PayloadStore(str(tmp_path), threshold=1000)
+
+        trace = yaml.safe_load(await provider.get_trace("run-1"))
+
+    stub = trace["outputs"]
+    assert stub["size_bytes"] == len(document.encode("utf-8"))
+    assert document.startswith(stub["preview"])
+
+    # Odd-sized ranges split multi-byte characters; reads must still join up
+    pieces, offset = [], 0
+    while offset is not None:
+        chunk = provider.payload_store.read(stub["payload_handle"], offset, 333)
+        pieces.append(chunk["data"])
+        offset = chunk["next_offset"]
+    assert "".join(pieces) == document
+
+    with pytest.raises(ValueError):
+        provider.payload_store.read("../etc/passwd")
+
+
+@pytest.mark.asyncio
+async def test_dedup_writes_repeated_history_once():
+    """Test that a repeated chat history is emitted once and aliased after."""
+    system = {"role": "system", "content": "You are a careful agent. " * 20}
+    question = {"role": "user", "content": "Why did the build fail? " * 20}
+    observations = [
+        {"id": "obs-1", "input": {"messages": [system]}},
+        {"id": "obs-2", "input": {"messages": [dict(system), dict(question)]}},
+        {"id": "obs-3", "input": {"messages": [dict(system), dict(question)]}},
+    ]
+    trace_data = {"id": "t1", "observations": observations}
+    with patch("langfuse.Langfuse") as MockLangfuseClientConstructor:
+        MockLangfuseClientConstructor.return_value.fetch_trace = MagicMock(
+            return_value=MagicMock(data=trace_data)
+        )
+        provider = LangfuseProvider("pk", "sk", "https://test.com", "test")
+        inline = await provider.get_trace("t1")
+        provider.dedup = True
+        shared = await provider.get_trace("t1")
+
+    assert yaml.safe_load(shared) == yaml.safe_load(inline)
+    # The content repeats the sentence 20 times; it appears once per copy
+    assert shared.count("You are a careful agent.") == 20
+    assert inline.count("You are a careful agent.") == 60
+    assert len(shared) < len(inline) / 2
+
+
+@pytest.mark.asyncio
+async def test_langfuse_paged_fetch_joins_pages_in_order_with_retries():
+    """Test that paged mode fetches pages concurrently and retries failures."""
+    start = datetime(2025, 1, 1, 12, 0, 0)
+    failed_once = set()
+
+    def get_many(trace_id, page, limit, request_options):
+        if page == 2 and page not in failed_once:
+            failed_once.add(page)
+            raise Exception("502 bad gateway")
+        data = [
+            MagicMock(
+                dict=MagicMock(
+                    return_value={
+                        "id": f"obs-{page}-{i}",
+                        "startTime": start + timedelta(seconds=page),
+                    }
+                )
+            )
+            for i in range(limit if page < 3 else 1)
+        ]
+        return MagicMock(data=data, meta=MagicMock(total_pages=3))
+
+    header = MagicMock(id="t1")
+    header.dict.return_value = {"id": "t1", "name": "agent", "observations": []}
+    with patch("langfuse.Langfuse") as MockLangfuseClientConstructor, patch(
+        "tracenexus.providers.langfuse._RETRY_BACKOFF_SECONDS", 0
+    ):
+        api = MockLangfuseClientConstructor.return_value.client
+        api.observations.get_many.side_effect = get_many
+        api.trace.list.return_value = MagicMock(data=[MagicMock(id="t0"), header])
+        provider = LangfuseProvider("pk", "sk", "https://test.com", "test")
+        provider.page_size = 2
+
+        trace = yaml.safe_load(await provider.get_trace("t1", timeout=30))
+
+    assert trace["name"] == "agent"
+    assert [o["id"] for o in trace["observations"]] == [
+        "obs-1-0",
+        "obs-1-1",
+        "obs-2-0",
+        "obs-2-1",
+        "obs-3-0",
+    ]
+    assert api.observations.get_many.call_count == 4
+    list_kwargs = api.trace.list.call_args.kwargs
+    assert list_kwargs["to_timestamp"] == start + timedelta(seconds=2)
+    MockLangfuseClientConstructor.return_value.fetch_trace.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_langfuse_paged_fetch_of_trace_without_observations():
+    """Test that paged mode fetches traces without observations whole."""
+
+    def get(trace_id, request_options):
+        if trace_id != "t1":
+            raise Exception("404 not found")
+        return {"id": "t1", "name": "agent", "observations": []}
+
+    with patch("langfuse.Langfuse") as MockLangfuseClientConstructor:
+        api = MockLangfuseClientConstructor.return_value.client
+        api.observations.get_many.return_value = MagicMock(
+            data=[], meta=MagicMock(total_pages=0)
+        )
+        api.trace.get.side_effect = get
+        provider = LangfuseProvider("pk", "sk", "https://test.com", "test")
+        provider.page_size = 2
+
+        trace = yaml.safe_load(await provider.get_trace("t1", timeout=30))
+        missing = await provider.get_trace("t2", timeout=30)
+
+    assert trace["name"] == "agent"
+    assert missing == "Trace not found in test: t2"
+    api.trace.list.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_langfuse_paged_fetch_falls_back_when_header_is_not_listed():
+    """Test that a trace missing from the trace list is fetched whole."""
+    observation = MagicMock()
+    observation.dict.return_value = {
+        "id": "obs-1",
+        "startTime": datetime(2025, 1, 1, 12, 0, 0),
+    }
+    whole = {"id": "t1", "sessionId": "s1", "observations": [{"id": "obs-1"}]}
+    with patch("langfuse.Langfuse") as MockLangfuseClientConstructor:
+        api = MockLangfuseClientConstructor.return_value.client
+        api.observations.get_many.return_value = MagicMock(
+            data=[observation], meta=MagicMock(total_pages=1)
+        )
+        api.trace.list.return_value = MagicMock(
+            data=[MagicMock(id=f"other-{i}") for i in range(100)]
+        )
+        api.trace.get.return_value = whole
+        provider = LangfuseProvider("pk", "sk", "https://test.com", "test")
+        provider.page_size = 2
+
+        trace = yaml.safe_load(await provider.get_trace("t1", timeout=30))
+
+    assert trace["sessionId"] == "s1"
+    assert [o["id"] for o in trace["observations"]] == ["obs-1"]
+    assert api.trace.list.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_langfuse_paged_fetches_share_one_page_pool():
+    """Test that concurrent paged fetches share a pool sized like the executor."""
+    threads = set()
+
+    def get_many(trace_id, page, limit, request_options):
+        threads.add(threading.current_thread().name)
+        observation = MagicMock()
+        observation.dict.return_value = {
+            "id": f"{trace_id}-{page}",
+            "startTime": datetime(2025, 1, 1, 12, 0, 0),
+        }
+        return MagicMock(data=[observation], meta=MagicMock(total_pages=6))
+
+    with patch("langfuse.Langfuse") as MockLangfuseClientConstructor:
+        api = MockLangfuseClientConstructor.return_value.client
+        api.observations.get_many.side_effect = get_many
+        api.trace.list.side_effect = lambda **kwargs: MagicMock(
+            data=[MagicMock(id=f"t{i}", dict=lambda: {}) for i in range(4)]
+        )
+        provider = LangfuseProvider("pk", "sk", "https://test.com", "test")
+        provider.page_size = 1
+        provider.executor.configure(2, 8)
+
+        traces = await asyncio.gather(
+            *(provider.get_trace(f"t{i}", timeout=30) for i in range(4))
+        )
+        provider.close()
+
+    assert all(len(yaml.safe_load(trace)["observations"]) == 6 for trace in traces)
+    page_threads = {name for name in threads if "-pages" in name}
+    assert 0 < len(page_threads) <= 2
+
+
+def test_otlp_protobuf_without_package_is_unsupported():
+    """Test that protobuf requests report a missing optional package."""
+    try:
+        import opentelemetry.proto  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        pytest.skip("opentelemetry-proto is installed")
+
+    with pytest.raises(UnsupportedEncoding, match="opentelemetry-proto"):
+        decode_export_request(b"", "application/x-protobuf", "")
+
+
+def test_default_payload_dir_must_be_private(tmp_path, monkeypatch):
+    """Test that a pre-created default spill directory open to others is refused."""
+    monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+    store = PayloadStore()
+    assert store.directory.startswith(str(tmp_path / "tracenexus-payloads-"))
+    assert os.stat(store.directory).st_mode & 0o777 == 0o700
+
+    os.chmod(store.directory, 0o777)
+    with pytest.raises(PermissionError, match="accessible by other users"):
+        PayloadStore()
+    # An explicitly chosen directory only needs to belong to the user
+    PayloadStore(store.directory)
+
+
+def test_otlp_receiver_rejects_oversized_and_malformed_requests(monkeypatch):
+    """Test that gzip bombs get 413 and a bad Content-Length gets 400."""
+    import http.client
+
+    monkeypatch.setattr("tracenexus.server.otlp_receiver.MAX_BODY_BYTES", 1024)
+    store = OtlpSpanStore()
+    receiver = OtlpReceiver(store, "127.0.0.1", 0)
+    receiver.start()
+    try:
+        bomb = gzip.compress(b" " * 100_000)
+        assert len(bomb) < 1024
+        connection = http.client.HTTPConnection("127.0.0.1", receiver.port)
+        connection.request(
+            "POST",
+            "/v1/traces",
+            body=bomb,
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+        )
+        assert connection.getresponse().status == 413
+
+        connection = http.client.HTTPConnection("127.0.0.1", receiver.port)
+        connection.putrequest("POST", "/v1/traces")
+        connection.putheader("Content-Length", "lots")
+        connection.endheaders()
+        response = connection.getresponse()
+        assert response.status == 400
+        assert "Content-Length" in json.loads(response.read())["error"]
+    finally:
+        receiver.stop()
+    assert store.stats()["spans"] == 0
+
+
+def _otlp_export(trace_id, spans):
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {"key": "service.name", "value": {"stringValue": "agent"}}
+                    ]
+                },
+                "scopeSpans": [{"scope": {"name": "app"}, "spans": spans}],
+            }
+        ]
+    }
+
+
+def _otlp_span(trace_id, span_id, parent_id, name, start_second):
+    start = 1735732800 + start_second
+    return {
+        "traceId": trace_id,
+        "spanId": span_id,
+        "parentSpanId": parent_id,
+        "name": name,
+        "kind": 3,
+        "startTimeUnixNano": str(start * 1_000_000_000),
+        "endTimeUnixNano": str((start + 1) * 1_000_000_000),
+        "status": {"code": 0},
+        "attributes": [
+            {"key": "gen_ai.usage.input_tokens", "value": {"intValue": "12"}}
+        ],
+    }
+
+
+@pytest.mark.asyncio
+async def test_otlp_receiver_serves_posted_spans_as_traces():
+    """Test that spans posted over OTLP/HTTP JSON are returned by get_trace."""
+    trace_id = "5B8EFFF798038103D269B633813FC60C"
+    export = _otlp_export(
+        trace_id,
+        [
+            _otlp_span(trace_id, "eee19b7ec3c1b174", "", "agent run", 0),
+            _otlp_span(trace_id, "eee19b7ec3c1b175", "eee19b7ec3c1b174", "llm", 1),
+        ],
+    )
+    store = OtlpSpanStore()
+    receiver = OtlpReceiver(store, "127.0.0.1", 0)
+    receiver.start()
+    try:
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{receiver.port}/v1/traces",
+            data=gzip.compress(json.dumps(export).encode()),
+            headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+        )
+        with urllib.request.urlopen(request) as response:
+            assert response.status == 200
+    finally:
+        receiver.stop()
+
+    provider = OtlpProvider(store, port=receiver.port)
+    trace = yaml.safe_load(await provider.get_trace(trace_id.lower()))
+
+    assert trace["name"] == "agent run"
+    assert trace["service"] == "agent"
+    assert trace["spanCount"] == 2
+    assert trace["spans"][1]["parentSpanId"] == "eee19b7ec3c1b174"
+    assert trace["spans"][1]["kind"] == "CLIENT"
+    assert trace["spans"][1]["attributes"]["gen_ai.usage.input_tokens"] == 12
+    missing = await provider.get_trace("0" * 32)
+    assert missing == f"Trace not found in local: {'0' * 32}"
+
+
+def test_otlp_store_evicts_oldest_spans_to_spill_file(tmp_path):
+    """Test that the span ring is bounded and evicted spans stay readable."""
+    spilled = OtlpSpanStore(max_spans=3, spill_path=str(tmp_path / "spans.db"))
+    dropped = OtlpSpanStore(max_spans=3)
+    for store in (spilled, dropped):
+        for second, trace_id in enumerate(["a" * 32, "a" * 32, "b" * 32, "b" * 32]):
+            span = _otlp_span(trace_id, f"{second:016x}", "", "step", second)
+            store.add(spans_from_otlp_json(_otlp_export(trace_id, [span])))
+
+    assert len(spilled) == 3
+    assert spilled.stats()["evicted"] == 1
+    assert [s["id"] for s in spilled.get("a" * 32)] == [
+        "0000000000000000",
+        "0000000000000001",
+    ]
+    assert len(dropped.get("a" * 32)) == 1
+    assert spilled.trace_ids() == ["b" * 32, "a" * 32]
+    spilled.close()
+
+
+@pytest.mark.asyncio
+async def test_recorded_fetches_replay_offline(tmp_path):
+    """Test that recorded responses and errors replay without the upstream."""
+    start = datetime(2025, 1, 1, 12, 0, 0)
+    trace_data = {
+        "id": "t1",
+        "name": "agent",
+        "timestamp": start,
+        "observations": [
+            {"id": "obs-1", "startTime": start, "output": "héllo"},
+        ],
+    }
+
+    def fetch_trace(trace_id):
+        if trace_id != "t1":
+            raise Exception("404 trace not found")
+        return MagicMock(data=copy.deepcopy(trace_data))
+
+    recorder = CassetteRecorder(str(tmp_path))
+    with patch("langfuse.Langfuse") as MockLangfuseClientConstructor:
+        MockLangfuseClientConstructor.return_value.fetch_trace.side_effect = fetch_trace
+        provider = LangfuseProvider("pk", "sk", "https://test.com", "prod")
+        provider.recorder = recorder
+        live = await provider.get_trace("t1")
+        live_missing = await provider.get_trace("t2")
+    assert recorder.recorded_count == 2
+
+    [(name, replay)] = ReplayProviderFactory.create_providers(str(tmp_path), 0.0)
+    assert (name, replay.provider_type) == ("prod", "langfuse")
+    with patch("langfuse.Langfuse") as MockLangfuseClientConstructor:
+        assert await replay.get_trace("t1") == live
+        assert await replay.get_trace("t2") == live_missing
+        MockLangfuseClientConstructor.assert_not_called()
+    assert await replay.get_trace("t3") == "Trace not found in prod: t3"
+    assert replay.fetch_spans("t1")[1]["span_id"] == "obs-1"
+    assert list(replay.iter_trace_ids(TraceFilter())) == ["t1", "t2"]
+    # Replay instances carry the real provider's state and close cleanly
+    assert replay.page_size == 0
+    replay.retire()
+    assert not replay.client_initialized
@@ -0,0 +1,184 @@
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from tracenexus.providers.langfuse import LangfuseProvider
+from tracenexus.providers.langsmith import LangSmithProvider
+from tracenexus.server.trace_index import TraceIndex
+
+
+def _langfuse_trace(trace_id: str) -> dict:
+    start = datetime(2025, 1, 1, 12, 0, 0)
+    return {
+        "id": trace_id,
+        "name": "triage-agent",
+        "timestamp": start,
+        "input": {"question": "why did the deploy fail?"},
+        "output": None,
+        "latency": 2.5,
+        "totalCost": 0.01,
+        "observations": [
+            {
+                "id": "obs-1",
+                "traceId": trace_id,
+                "type": "GENERATION",
+                "name": "plan",
+                "model": "gpt-4o",
+                "startTime": start,
+                "endTime": start + timedelta(milliseconds=1200),
+                "usage": {"input": 120, "output": 30, "total": 150},
+                "calculatedTotalCost": 0.004,
+                "level": "DEFAULT",
+                "input": "Plan the next step",
+                "output": "Call the shell tool",
+            },
+            {
+                "id": "obs-2",
+                "traceId": trace_id,
+                "parentObservationId": "obs-1",
+                "type": "SPAN",
+                "name": "shell_tool",
+                "startTime": start + timedelta(milliseconds=1200),
+                "endTime": start + timedelta(milliseconds=1500),
+                "level": "ERROR",
+                "statusMessage": "open /etc/shadow: permission denied",
+                "input": {"cmd": "cat /etc/shadow"},
+            },
+        ],
+    }
+
+
+def test_langfuse_spans_from_trace():
+    """Test flattening a Langfuse trace into span rows."""
+    provider = LangfuseProvider("pk", "sk", "https://lf.example.com", "prod")
+    header, items = provider.split_trace(_langfuse_trace("trace-1"))
+    rows = provider.spans_from_trace("trace-1", header, items)
+
+    assert [row["span_id"] for row in rows] == ["trace-1", "obs-1", "obs-2"]
+    assert rows[0]["kind"] == "TRACE"
+    assert rows[0]["status"] == "error"
+    assert rows[1]["model"] == "gpt-4o"
+    assert rows[1]["latency_ms"] == pytest.approx(1200.0)
+    assert rows[1]["total_tokens"] == 150.0
+    assert rows[1]["parent_id"] == "trace-1"
+    assert rows[2]["parent_id"] == "obs-1"
+    assert rows[2]["error"] == "open /etc/shadow: permission denied"
+
+
+def test_langsmith_spans_from_trace():
+    """Test flattening LangSmith runs into span rows."""
+    provider = LangSmithProvider(api_key="test_api_key", name="test")
+    start = datetime(2025, 1, 1, 12, 0, 0)
+    root = {
+        "id": "run-1",
+        "trace_id": "run-1",
+        "name": "agent",
+        "run_type": "chain",
+        "start_time": start,
+        "end_time": start + timedelta(seconds=2),
+        "error": None,
+    }
+    child = {
+        "id": "run-2",
+        "trace_id": "run-1",
+        "parent_run_id": "run-1",
+        "name": "ChatOpenAI",
+        "run_type": "llm",
+        "start_time": start,
+        "end_time": start + timedelta(seconds=1),
+        "extra": {"metadata": {"ls_model_name": "gpt-4o-mini"}},
+        "prompt_tokens": 10,
+        "completion_tokens": 5,
+        "total_tokens": 15,
+        "error": "RateLimitError: too many requests",
+    }
+    rows = provider.spans_from_trace("run-1", root, [child])
+
+    assert rows[0]["latency_ms"] == pytest.approx(2000.0)
+    assert rows[1]["model"] == "gpt-4o-mini"
+    assert rows[1]["parent_id"] == "run-1"
+    assert rows[1]["status"] == "error"
+
+
+def test_trace_index_search():
+    """Test indexing span rows and searching them."""
+    provider = LangfuseProvider("pk", "sk", "https://lf.example.com", "prod")
+    index = TraceIndex()
+    header, items = provider.split_trace(_langfuse_trace("trace-1"))
+    index.listener(provider, "trace-1", header, items)
+    # Re-indexing the same trace replaces its rows
+    index.listener(provider, "trace-1", header, items)
+    assert len(index) == 1
+
+    hits = index.search("permission denied")
+    assert len(hits) == 1
+    assert hits[0]["trace_id"] == "trace-1"
+    assert hits[0]["span_id"] == "obs-2"
+    assert "[permission]" in hits[0]["snippet"]
+
+    assert index.search("gpt")[0]["model"] == "gpt-4o"
+    assert index.search("permission", instance="staging") == []
+    # Invalid FTS5 syntax falls back to quoted terms
+    assert index.search('/etc/shadow: "permission')[0]["span_id"] == "obs-2"
+    assert index.search("nothing-matches-this") == []
+
+
+@pytest.mark.asyncio
+async def test_get_trace_notifies_listeners():
+    """Test that fetched traces are handed to trace listeners."""
+    with patch("langfuse.Langfuse") as MockLangfuse:
+        MockLangfuse.return_value.fetch_trace.return_value = MagicMock(
+            data=_langfuse_trace("trace-1")
+        )
+        provider = LangfuseProvider("pk", "sk", "https://lf.example.com", "prod")
+        index = TraceIndex()
+        provider.trace_listeners.append(index.listener)
+
+        await provider.get_trace("trace-1")
+        await asyncio.gather(*provider._background_tasks)
+
+    assert index.search("shell_tool")[0]["trace_id"] == "trace-1"
+
+
+@pytest.mark.asyncio
+async def test_langsmith_get_trace_indexes_child_runs():
+    """Test that errors in LangSmith child runs become searchable."""
+    start = datetime(2025, 1, 1, 12, 0, 0)
+    root = {
+        "id": "run-1",
+        "trace_id": "run-1",
+        "name": "agent",
+        "run_type": "chain",
+        "start_time": start,
+        "child_runs": None,
+    }
+    child = {
+        "id": "run-2",
+        "trace_id": "run-1",
+        "parent_run_id": "run-1",
+        "name": "shell_tool",
+        "run_type": "tool",
+        "start_time": start,
+        "error": "open /etc/shadow: permission denied",
+    }
+
+    def run(data):
+        mock_run = MagicMock(id=data["id"], trace_id=data["trace_id"])
+        mock_run.dict.return_value = dict(data)
+        return mock_run
+
+    with patch("langsmith.Client") as MockLangSmithClient:
+        client = MockLangSmithClient.return_value
+        client.read_run.return_value = run(root)
+        client.list_runs.return_value = [run(root), run(child)]
+        provider = LangSmithProvider(api_key="test_api_key", name="test")
+        index = TraceIndex()
+        provider.trace_listeners.append(index.listener)
+
+        await provider.get_trace("run-1")
+        await asyncio.gather(*provider._background_tasks)
+
+    hits = index.search("permission denied")
+    assert [(hit["trace_id"], hit["span_id"]) for hit in hits] == [("run-1", "run-2")]
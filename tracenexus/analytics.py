@@ -0,0 +1,197 @@
+"""Aggregate latency, token, cost and error statistics across many traces.
+
+Span rows are accumulated into per-group columns of doubles and reduced in one
+batch at the end. NumPy is used for the reductions when it is installed;
+otherwise a pure-Python fallback gives the same results. NumPy is imported on
+first use, so it does not slow down server startup.
+"""
+
+import functools
+import logging
+import math
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .export import DEFAULT_CONCURRENCY, fetch_spans_concurrently
+from .providers.base import BaseProvider, TraceFilter
+from .providers.stats import percentiles
+
+logger = logging.getLogger(__name__)
+
+GROUP_BY_FIELDS = ("name", "kind", "model")
+PERCENTILES = (50, 90, 95, 99)
+DEFAULT_MAX_GROUPS = 50
+
+_COLUMNS = ("latency_ms", "input_tokens", "output_tokens", "cost")
+
+
+class _Group:
+    __slots__ = ("kinds", "count", "errors", "columns")
+
+    def __init__(self) -> None:
+        self.kinds: Dict[str, int] = {}
+        self.count = 0
+        self.errors = 0
+        # Missing values are stored as NaN and ignored by the reductions
+        self.columns = {column: array("d") for column in _COLUMNS}
+
+
+class SpanAggregator:
+    """Accumulates span rows per group and reduces them to summary statistics."""
+
+    def __init__(self, group_by: str = "name", span_name: Optional[str] = None):
+        if group_by not in GROUP_BY_FIELDS:
+            raise ValueError(
+                f"Cannot group by '{group_by}', expected one of {GROUP_BY_FIELDS}"
+            )
+        self.group_by = group_by
+        self.span_name = span_name
+        self.traces = 0
+        self.groups: Dict[str, _Group] = {}
+
+    def add(self, trace_id: str, rows: List[Dict[str, Any]]) -> None:
+        self.traces += 1
+        for row in rows:
+            if self.span_name is not None and row.get("name") != self.span_name:
+                continue
+            key = str(row.get(self.group_by) or "(none)")
+            group = self.groups.get(key)
+            if group is None:
+                group = self.groups[key] = _Group()
+            group.count += 1
+            group.errors += row.get("status") == "error"
+            kind = str(row.get("kind") or "")
+            group.kinds[kind] = group.kinds.get(kind, 0) + 1
+            for column in _COLUMNS:
+                value = row.get(column)
+                group.columns[column].append(math.nan if value is None else value)
+
+    def summarize(self, max_groups: int = DEFAULT_MAX_GROUPS) -> List[Dict[str, Any]]:
+        """One row of statistics per group, busiest groups first."""
+        summaries = [
+            self._summarize_group(key, group) for key, group in self.groups.items()
+        ]
+        summaries.sort(key=lambda summary: (-summary["count"], summary[self.group_by]))
+        return summaries[:max_groups]
+
+    def _summarize_group(self, key: str, group: _Group) -> Dict[str, Any]:
+        summary: Dict[str, Any] = {
+            self.group_by: key,
+            "kind": max(group.kinds, key=group.kinds.__getitem__) or None,
+            "count": group.count,
+        }
+        latency_percentiles, latency_max = _reduce_latency(group.columns["latency_ms"])
+        for q, value in zip(PERCENTILES, latency_percentiles):
+            summary[f"p{q}_ms"] = value
+        summary["max_ms"] = latency_max
+        summary["errors"] = group.errors
+        summary["error_rate"] = group.errors / group.count
+        summary["input_tokens"] = _total(group.columns["input_tokens"])
+        summary["output_tokens"] = _total(group.columns["output_tokens"])
+        summary["cost"] = _total(group.columns["cost"])
+        return summary
+
+
+@functools.lru_cache(maxsize=None)
+def _numpy() -> Any:
+    """The numpy module, or None when it is not installed."""
+    try:
+        import numpy
+    except ImportError:  # pragma: no cover - optional dependency
+        return None
+    return numpy
+
+
+def _reduce_latency(
+    column: "array[float]",
+) -> Tuple[List[Optional[float]], Optional[float]]:
+    numpy = _numpy()
+    if numpy is not None:
+        values = numpy.frombuffer(column, dtype=numpy.float64)
+        values = values[~numpy.isnan(values)]
+        if values.size == 0:
+            return [None for _ in PERCENTILES], None
+        reduced = numpy.percentile(values, PERCENTILES)
+        return [float(value) for value in reduced], float(values.max())
+    present = [value for value in column if not math.isnan(value)]
+    if not present:
+        return [None for _ in PERCENTILES], None
+    computed: List[Optional[float]] = list(percentiles(present, PERCENTILES))
+    return computed, max(present)
+
+
+def _total(column: "array[float]") -> Optional[float]:
+    numpy = _numpy()
+    if numpy is not None:
+        values = numpy.frombuffer(column, dtype=numpy.float64)
+        if values.size == 0 or numpy.isnan(values).all():
+            return None
+        return float(numpy.nansum(values))
+    present = [value for value in column if not math.isnan(value)]
+    return math.fsum(present) if present else None
+
+
+def _format_cell(value: Any) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        if value.is_integer() and abs(value) < 1e12:
+            return str(int(value))
+        if abs(value) < 1:
+            return f"{value:.4g}"
+        return f"{value:.1f}"
+    return str(value)
+
+
+def format_table(rows: List[Dict[str, Any]]) -> str:
+    """Render summary rows as a compact pipe-separated table."""
+    if not rows:
+        return "(no matching spans)"
+    columns = list(rows[0])
+    lines = [" | ".join(columns)]
+    for row in rows:
+        lines.append(" | ".join(_format_cell(row[column]) for column in columns))
+    return "\n".join(lines)
+
+
+async def analyze_traces(
+    provider: BaseProvider,
+    trace_ids: Optional[Iterable[str]] = None,
+    trace_filter: Optional[TraceFilter] = None,
+    limit: Optional[int] = None,
+    group_by: str = "name",
+    span_name: Optional[str] = None,
+    max_groups: int = DEFAULT_MAX_GROUPS,
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> str:
+    """Fetch traces concurrently and summarize their spans.
+
+    Args:
+        provider: The instance to analyze
+        trace_ids: Explicit trace IDs; when omitted, traces are listed with
+            `trace_filter`
+        trace_filter: Selects traces when no IDs are given
+        limit: Maximum number of traces to fetch
+        group_by: Span field to group by: name, kind or model
+        span_name: Only include spans with this name
+        max_groups: Maximum number of groups in the table
+        concurrency: Traces fetched at the same time
+
+    Returns:
+        A summary line followed by a table with one row per group
+    """
+    aggregator = SpanAggregator(group_by=group_by, span_name=span_name)
+    stats = await fetch_spans_concurrently(
+        provider,
+        aggregator.add,
+        trace_ids=trace_ids,
+        trace_filter=trace_filter,
+        limit=limit,
+        concurrency=concurrency,
+    )
+    spans = sum(group.count for group in aggregator.groups.values())
+    header = f"traces: {stats['fetched']}, spans: {spans}"
+    if stats["failed"]:
+        header += f", failed traces: {stats['failed']}"
+    logger.info(f"Analyzed {stats['fetched']} traces from {provider.name}")
+    return f"{header}\n{format_table(aggregator.summarize(max_groups))}\n"
@@ -1,10 +1,33 @@
 import argparse
+import asyncio
 import logging
 import os
+import sys
+from typing import Any, Dict, List, Optional
 
-from dotenv import find_dotenv, load_dotenv
-
-from .server.mcp_server import TraceNexusServer
+from .export import (
+    DEFAULT_BATCH_ROWS,
+    DEFAULT_CONCURRENCY,
+    EXPORT_FORMATS,
+    build_trace_filter,
+    export_traces,
+)
+from .providers import LangfuseProviderFactory, LangSmithProviderFactory
+from .providers.cassette import LATENCY_RECORDED, parse_latency
+from .providers.emitter import dump_yaml
+from .providers.executor import DEFAULT_MAX_QUEUE, DEFAULT_MAX_WORKERS
+from .providers.otlp import DEFAULT_MAX_SPANS, DEFAULT_OTLP_PORT
+from .providers.payloads import DEFAULT_SPILL_THRESHOLD
+from .providers.prefetch import DEFAULT_MAX_RELATED, DEFAULT_PREFETCH_TTL_SECONDS
+from .providers.profiling import PROFILE_MODES
+from .server.compression import DEFAULT_MINIMUM_SIZE
+from .server.mcp_server import TraceNexusServer, load_env
+from .server.settings import (
+    DEFAULT_REQUEST_TIMEOUT_SECONDS,
+    OTLP_TRANSPORT_ERROR,
+    TRANSPORTS,
+    ServerSettings,
+)
 
 # Configure logging
 logging.basicConfig(
@@ -12,7 +35,115 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-load_dotenv(find_dotenv())
+load_env()
+
+
+def _replay_latency(value: str) -> Optional[float]:
+    try:
+        return parse_latency(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def _add_export_parser(subparsers: Any) -> None:
+    export_parser = subparsers.add_parser(
+        "export",
+        help="Export traces as flat span rows for offline analysis",
+        description=(
+            "Export traces from one configured instance to JSONL, or to a "
+            "directory of Parquet/Arrow files (requires pyarrow). Re-running "
+            "with the same output resumes an interrupted export."
+        ),
+    )
+    export_parser.add_argument("instance", help="Configured instance name")
+    export_parser.add_argument(
+        "--provider",
+        choices=["langsmith", "langfuse"],
+        help="Provider type (needed when both have an instance with this name)",
+    )
+    export_parser.add_argument(
+        "-o", "--output", required=True, help="Output .jsonl file or directory"
+    )
+    export_parser.add_argument(
+        "--format", choices=EXPORT_FORMATS, default="jsonl", help="Output format"
+    )
+    export_parser.add_argument(
+        "--trace-ids",
+        help="Comma-separated trace IDs, or @FILE with one ID per line",
+    )
+    export_parser.add_argument("--name", help="Only traces with this name")
+    export_parser.add_argument("--since", help="ISO 8601 start time (inclusive)")
+    export_parser.add_argument("--until", help="ISO 8601 end time (exclusive)")
+    export_parser.add_argument(
+        "--tag", dest="tags", action="append", help="Required tag (repeatable)"
+    )
+    export_parser.add_argument("--session-id", help="Langfuse session ID")
+    export_parser.add_argument("--user-id", help="Langfuse user ID")
+    export_parser.add_argument(
+        "--project", help="LangSmith project (required to list LangSmith traces)"
+    )
+    export_parser.add_argument("--limit", type=int, help="Maximum traces to export")
+    export_parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="Traces fetched at the same time",
+    )
+    export_parser.add_argument(
+        "--batch-rows",
+        type=int,
+        default=DEFAULT_BATCH_ROWS,
+        help="Rows written between checkpoints",
+    )
+
+
+def _read_trace_ids(value: Optional[str]) -> Optional[List[str]]:
+    if not value:
+        return None
+    if value.startswith("@"):
+        with open(value[1:], encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+    return [trace_id.strip() for trace_id in value.split(",") if trace_id.strip()]
+
+
+def run_export(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the `export` subcommand."""
+    candidates = []
+    if args.provider in (None, "langsmith"):
+        candidates += LangSmithProviderFactory.create_providers()
+    if args.provider in (None, "langfuse"):
+        candidates += LangfuseProviderFactory.create_providers()  # type: ignore[arg-type]
+    matches = [provider for name, provider in candidates if name == args.instance]
+    if not matches:
+        sys.exit(f"No configured instance named '{args.instance}'")
+    if len(matches) > 1:
+        sys.exit(f"Instance '{args.instance}' is ambiguous; pass --provider")
+
+    trace_filter = build_trace_filter(
+        name=args.name,
+        since=args.since,
+        until=args.until,
+        tags=args.tags,
+        session_id=args.session_id,
+        user_id=args.user_id,
+        project=args.project,
+    )
+    provider = matches[0]
+    try:
+        return asyncio.run(
+            export_traces(
+                provider,
+                args.output,
+                fmt=args.format,
+                trace_ids=_read_trace_ids(args.trace_ids),
+                trace_filter=trace_filter,
+                limit=args.limit,
+                concurrency=args.concurrency,
+                batch_rows=args.batch_rows,
+            )
+        )
+    finally:
+        provider.close()
 
 
 def main():
@@ -43,8 +174,193 @@ def main():
         default="/mcp",
         help="Path to mount the MCP endpoints (streamable-http)",
     )
+    parser.add_argument(
+        "--transport",
+        choices=TRANSPORTS,
+        default="both",
+        help="Transports to serve: both (default) runs SSE and streamable-HTTP "
+        "in two processes; http, sse and stdio run only that transport in one "
+        "process (stdio is for editors that launch the server as a subprocess)",
+    )
+    parser.add_argument(
+        "--no-warm-up",
+        dest="warm_up",
+        action="store_false",
+        help="Do not pre-open connections to upstream hosts at startup",
+    )
+    parser.add_argument(
+        "--no-compression",
+        dest="compression",
+        action="store_false",
+        help="Do not compress HTTP/SSE responses",
+    )
+    parser.add_argument(
+        "--compression-min-size",
+        type=int,
+        default=DEFAULT_MINIMUM_SIZE,
+        help="Minimum size in bytes before regular responses are compressed",
+    )
+    parser.add_argument(
+        "--index-path",
+        type=str,
+        default=None,
+        help="SQLite file for a local full-text index of fetched traces "
+        "(enables the search_local_traces tool)",
+    )
+    parser.add_argument(
+        "--request-timeout",
+        type=float,
+        default=DEFAULT_REQUEST_TIMEOUT_SECONDS,
+        help="Default seconds to wait for an upstream fetch (0 for no limit); "
+        "tools accept a timeout argument to override it",
+    )
+    parser.add_argument(
+        "--provider-workers",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help="Worker threads for upstream calls, per provider instance",
+    )
+    parser.add_argument(
+        "--provider-queue",
+        type=int,
+        default=DEFAULT_MAX_QUEUE,
+        help="Upstream calls that may wait for a worker, per provider instance; "
+        "further calls are rejected until the queue drains",
+    )
+    parser.add_argument(
+        "--prefetch",
+        action="store_true",
+        help="Prefetch traces in the same session (Langfuse) or parent/child "
+        "runs (LangSmith) in the background after each get_trace",
+    )
+    parser.add_argument(
+        "--prefetch-ttl",
+        type=float,
+        default=DEFAULT_PREFETCH_TTL_SECONDS,
+        help="Seconds a prefetched trace is kept for its first lookup; "
+        "later lookups fetch it again",
+    )
+    parser.add_argument(
+        "--prefetch-max",
+        type=int,
+        default=DEFAULT_MAX_RELATED,
+        help="Maximum related traces prefetched per fetched trace",
+    )
+    parser.add_argument(
+        "--payload-threshold",
+        type=int,
+        default=DEFAULT_SPILL_THRESHOLD,
+        help="Return strings of at least this many characters as a handle and "
+        "preview, readable with get_trace_payload (0 keeps everything inline)",
+    )
+    parser.add_argument(
+        "--payload-dir",
+        default=None,
+        help="Directory for spilled payloads (default: a per-user directory "
+        "in the system temp dir)",
+    )
+    parser.add_argument(
+        "--export-dir",
+        default=None,
+        help="Directory the export_traces tool may write into (default: "
+        "tracenexus-exports in the working directory)",
+    )
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help="Write values repeated within a trace (such as chat histories) "
+        "once and refer back to them with YAML aliases",
+    )
+    parser.add_argument(
+        "--compact-tools",
+        action="store_true",
+        help="Expose get_trace and watch_trace once, with an instance argument, "
+        "instead of once per instance (keeps the tool list small)",
+    )
+    parser.add_argument(
+        "--langfuse-page-size",
+        type=int,
+        default=0,
+        help="Fetch Langfuse observations this many per page, several pages at "
+        "once, for very large traces (default: 0, one request per trace)",
+    )
+    parser.add_argument(
+        "--otlp-port",
+        type=int,
+        default=0,
+        help=f"Accept OTLP/HTTP span exports on this port (usually "
+        f"{DEFAULT_OTLP_PORT}) and serve them as the otlp provider; needs a "
+        "single --transport (default: 0, disabled)",
+    )
+    parser.add_argument(
+        "--otlp-max-spans",
+        type=int,
+        default=DEFAULT_MAX_SPANS,
+        help="Received OTLP spans kept in memory; the oldest are evicted first",
+    )
+    parser.add_argument(
+        "--otlp-spill-path",
+        default=None,
+        help="SQLite file that keeps evicted OTLP spans readable "
+        "(default: evicted spans are dropped)",
+    )
+    cassettes = parser.add_mutually_exclusive_group()
+    cassettes.add_argument(
+        "--record",
+        dest="record_dir",
+        metavar="DIR",
+        default=None,
+        help="Save every upstream response to a cassette file per instance "
+        "in DIR, for offline replay",
+    )
+    cassettes.add_argument(
+        "--replay",
+        dest="replay_dir",
+        metavar="DIR",
+        default=None,
+        help="Serve the instances recorded in DIR instead of calling "
+        "LangSmith or Langfuse",
+    )
+    parser.add_argument(
+        "--replay-latency",
+        type=_replay_latency,
+        default=LATENCY_RECORDED,
+        help="How long each replayed fetch takes: 'recorded' (default), "
+        "'none' or a number of seconds",
+    )
+    parser.add_argument(
+        "--profile",
+        dest="profile_dir",
+        metavar="DIR",
+        default=None,
+        help="Profile get_trace calls and write per-call profiles and "
+        "aggregated flame-graph stacks to DIR (toggle at runtime with "
+        "POST /profiling)",
+    )
+    parser.add_argument(
+        "--profile-mode",
+        choices=PROFILE_MODES,
+        default="sample",
+        help="'sample' records stacks every few ms at low overhead; "
+        "'cprofile' traces every function call of one request at a time",
+    )
+    parser.add_argument(
+        "--profile-rate",
+        type=float,
+        default=1.0,
+        help="Fraction of get_trace calls profiled (default: 1.0, all)",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    _add_export_parser(subparsers)
     args = parser.parse_args()
 
+    if args.command == "export":
+        summary = run_export(args)
+        print(dump_yaml(summary), end="")
+        return
+    if args.otlp_port and args.transport == "both":
+        parser.error(OTLP_TRANSPORT_ERROR)
+
     # Check for LangSmith configuration
     langsmith_keys = os.environ.get("LANGSMITH_API_KEYS", "example").lower()
     langsmith_names = os.environ.get("LANGSMITH_NAMES", "")
@@ -99,7 +415,36 @@ def main():
             logger.warning(
                 f"WARNING: LANGFUSE_NAMES count ({names_count}) doesn't match keys count ({pub_keys_count})"
             )
-    server = TraceNexusServer()
+    server = TraceNexusServer(
+        ServerSettings(
+            transport=args.transport,
+            warm_up=args.warm_up,
+            compression=args.compression,
+            compression_min_size=args.compression_min_size,
+            index_path=args.index_path,
+            request_timeout=args.request_timeout,
+            provider_workers=args.provider_workers,
+            provider_queue=args.provider_queue,
+            prefetch=args.prefetch,
+            prefetch_ttl=args.prefetch_ttl,
+            prefetch_max=args.prefetch_max,
+            payload_threshold=args.payload_threshold,
+            payload_dir=args.payload_dir,
+            export_dir=args.export_dir,
+            dedup=args.dedup,
+            langfuse_page_size=args.langfuse_page_size,
+            compact_tools=args.compact_tools,
+            otlp_port=args.otlp_port,
+            otlp_max_spans=args.otlp_max_spans,
+            otlp_spill_path=args.otlp_spill_path,
+            record_dir=args.record_dir,
+            replay_dir=args.replay_dir,
+            replay_latency=args.replay_latency,
+            profile_dir=args.profile_dir,
+            profile_mode=args.profile_mode,
+            profile_rate=args.profile_rate,
+        )
+    )
     server.run(
         http_port=args.http_port,
         sse_port=args.sse_port,
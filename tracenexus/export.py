@@ -0,0 +1,378 @@
+"""Bulk export of traces as flat span rows.
+
+Traces are listed page by page (or taken from an ID list), fetched
+concurrently and written as they arrive, so memory use does not grow with the
+number of traces. Output is newline-delimited JSON, or Parquet/Arrow part
+files when the optional ``pyarrow`` package is installed.
+
+Exports are resumable: after every flush the written trace IDs are recorded in
+a ``<output>.progress`` file, and a re-run with the same output skips them.
+Rows written after the last checkpoint are discarded on resume, so every
+trace is exported exactly once. An existing output without a progress file was
+not written by an export and is never overwritten.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import uuid
+from typing import (
+    Any,
+    Callable,
+    Collection,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+)
+
+from .providers.base import BaseProvider, TraceFilter
+from .providers.spans import SPAN_FIELDS, to_datetime
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("jsonl", "parquet", "arrow")
+DEFAULT_CONCURRENCY = 8
+# Rows buffered before a flush and checkpoint
+DEFAULT_BATCH_ROWS = 5000
+MAX_REPORTED_FAILURES = 20
+
+_NUMERIC_FIELDS = (
+    "latency_ms",
+    "input_tokens",
+    "output_tokens",
+    "total_tokens",
+    "cost",
+)
+
+
+class ExportProgress:
+    """Checkpoints of an export, stored next to the output as JSON lines.
+
+    Raises:
+        FileExistsError: If `output` exists but has no progress file
+    """
+
+    def __init__(self, output: str):
+        self.path = f"{output}.progress"
+        self.completed: Set[str] = set()
+        self.checkpoints: List[Dict[str, Any]] = []
+        if not os.path.exists(self.path):
+            if os.path.isfile(output) or (os.path.isdir(output) and os.listdir(output)):
+                raise FileExistsError(
+                    f"{output} already exists and was not written by an export; "
+                    "choose another output or remove it"
+                )
+            # Marks the output as ours, so an interrupted run can resume
+            open(self.path, "a", encoding="utf-8").close()
+        else:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        checkpoint = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A checkpoint cut off mid-write never completed
+                        continue
+                    self.checkpoints.append(checkpoint)
+                    self.completed.update(checkpoint["trace_ids"])
+
+    def record(self, trace_ids: List[str], position: Dict[str, Any]) -> None:
+        checkpoint = {"trace_ids": trace_ids, **position}
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(checkpoint) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.checkpoints.append(checkpoint)
+        self.completed.update(trace_ids)
+
+
+class JsonlSpanWriter:
+    """Appends span rows to a newline-delimited JSON file."""
+
+    def __init__(self, path: str, checkpoints: List[Dict[str, Any]]):
+        self.path = path
+        self.buffered_rows = 0
+        # Drop rows written after the last checkpoint of an interrupted run
+        offset = checkpoints[-1]["offset"] if checkpoints else 0
+        mode = "r+" if os.path.exists(path) else "w"
+        self._file = open(path, mode, encoding="utf-8")
+        self._file.seek(offset)
+        self._file.truncate()
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            self._file.write(json.dumps(row, default=str, ensure_ascii=False))
+            self._file.write("\n")
+        self.buffered_rows += len(rows)
+
+    def flush(self) -> Dict[str, Any]:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.buffered_rows = 0
+        return {"offset": self._file.tell()}
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ArrowSpanWriter:
+    """Writes span rows as Parquet or Arrow IPC part files in a directory."""
+
+    def __init__(self, directory: str, fmt: str, checkpoints: List[Dict[str, Any]]):
+        try:
+            import pyarrow
+        except ImportError as e:
+            raise RuntimeError(
+                f"Exporting to {fmt} requires pyarrow (pip install pyarrow)"
+            ) from e
+        self._pa = pyarrow
+        self.directory = directory
+        self.fmt = fmt
+        self.extension = "parquet" if fmt == "parquet" else "arrow"
+        self.schema = pyarrow.schema(
+            [
+                (
+                    name,
+                    pyarrow.float64() if name in _NUMERIC_FIELDS else pyarrow.string(),
+                )
+                for name in SPAN_FIELDS
+            ]
+        )
+        self.rows: List[Dict[str, Any]] = []
+        os.makedirs(directory, exist_ok=True)
+        # Drop part files written after the last checkpoint of an interrupted run
+        kept = {checkpoint.get("part") for checkpoint in checkpoints}
+        for filename in os.listdir(directory):
+            if (
+                filename.startswith("part-")
+                and filename.endswith(f".{self.extension}")
+                and filename not in kept
+            ):
+                os.remove(os.path.join(directory, filename))
+        self.parts = len(kept - {None})
+
+    @property
+    def buffered_rows(self) -> int:
+        return len(self.rows)
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            # Free-form payloads are stored as JSON text
+            for key in ("input", "output"):
+                if row[key] is not None and not isinstance(row[key], str):
+                    row[key] = json.dumps(row[key], default=str, ensure_ascii=False)
+            if row["error"] is not None:
+                row["error"] = str(row["error"])
+        self.rows.extend(rows)
+
+    def flush(self) -> Dict[str, Any]:
+        if not self.rows:
+            return {"part": None}
+        self.parts += 1
+        part = f"part-{self.parts:05d}-{uuid.uuid4().hex[:8]}.{self.extension}"
+        path = os.path.join(self.directory, part)
+        table = self._pa.Table.from_pylist(self.rows, schema=self.schema)
+        # Write under a temporary name so a part file is never half-written
+        if self.fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            pq.write_table(table, f"{path}.tmp")
+        else:
+            import pyarrow.feather as feather
+
+            feather.write_feather(table, f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+        self.rows = []
+        return {"part": part}
+
+    def close(self) -> None:
+        self.rows = []
+
+
+def build_trace_filter(
+    name: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    tags: Optional[List[str]] = None,
+    session_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    project: Optional[str] = None,
+) -> TraceFilter:
+    """Build a `TraceFilter` from user-supplied strings (ISO 8601 timestamps)."""
+    from_timestamp, to_timestamp = to_datetime(since), to_datetime(until)
+    if since and from_timestamp is None:
+        raise ValueError(f"Invalid timestamp for since: {since}")
+    if until and to_timestamp is None:
+        raise ValueError(f"Invalid timestamp for until: {until}")
+    return TraceFilter(
+        name=name,
+        from_timestamp=from_timestamp,
+        to_timestamp=to_timestamp,
+        tags=list(tags or []),
+        session_id=session_id,
+        user_id=user_id,
+        project=project,
+    )
+
+
+def open_writer(fmt: str, output: str, checkpoints: List[Dict[str, Any]]) -> Any:
+    if fmt == "jsonl":
+        return JsonlSpanWriter(output, checkpoints)
+    if fmt in ("parquet", "arrow"):
+        return ArrowSpanWriter(output, fmt, checkpoints)
+    raise ValueError(f"Unknown export format '{fmt}', expected one of {EXPORT_FORMATS}")
+
+
+async def fetch_spans_concurrently(
+    provider: BaseProvider,
+    handle: Callable[[str, List[Dict[str, Any]]], None],
+    trace_ids: Optional[Iterable[str]] = None,
+    trace_filter: Optional[TraceFilter] = None,
+    limit: Optional[int] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    skip: Collection[str] = (),
+) -> Dict[str, Any]:
+    """Fetch many traces as span rows and pass each one to `handle`.
+
+    Trace IDs come from `trace_ids` or are listed page by page with
+    `trace_filter`; listing continues while earlier traces are in flight, and
+    at most ``2 * concurrency`` IDs are queued at a time. `handle` runs on the
+    event loop, one trace at a time. Failed traces are counted and skipped.
+
+    Returns:
+        Counts of ``fetched``, ``skipped`` and ``failed`` traces and the first
+        ``failed_trace_ids``
+    """
+    queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue(maxsize=concurrency * 2)
+    stats: Dict[str, Any] = {
+        "fetched": 0,
+        "skipped": 0,
+        "failed": 0,
+        "failed_trace_ids": [],
+    }
+
+    async def produce() -> None:
+        ids: Iterator[str] = (
+            iter(trace_ids)
+            if trace_ids is not None
+            else provider.iter_trace_ids(trace_filter or TraceFilter())
+        )
+        seen = 0
+        try:
+            while limit is None or seen < limit:
+                trace_id = await provider.call_upstream(None, next, ids, None)
+                if trace_id is None:
+                    break
+                seen += 1
+                if trace_id in skip:
+                    stats["skipped"] += 1
+                    continue
+                await queue.put(trace_id)
+        finally:
+            for _ in range(concurrency):
+                await queue.put(None)
+
+    async def work() -> None:
+        while True:
+            trace_id = await queue.get()
+            if trace_id is None:
+                return
+            try:
+                rows = await provider.call_upstream(
+                    provider.request_timeout, provider.fetch_spans, trace_id
+                )
+            except Exception as e:
+                logger.warning(f"Fetching trace {trace_id} failed: {e}")
+                stats["failed"] += 1
+                if len(stats["failed_trace_ids"]) < MAX_REPORTED_FAILURES:
+                    stats["failed_trace_ids"].append(trace_id)
+                continue
+            stats["fetched"] += 1
+            handle(trace_id, rows)
+
+    try:
+        async with asyncio.TaskGroup() as tasks:
+            tasks.create_task(produce())
+            for _ in range(concurrency):
+                tasks.create_task(work())
+    except ExceptionGroup as group:
+        raise group.exceptions[0] from None
+    return stats
+
+
+async def export_traces(
+    provider: BaseProvider,
+    output: str,
+    fmt: str = "jsonl",
+    trace_ids: Optional[Iterable[str]] = None,
+    trace_filter: Optional[TraceFilter] = None,
+    limit: Optional[int] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+) -> Dict[str, Any]:
+    """Export traces from one provider instance as flat span rows.
+
+    Args:
+        provider: The instance to export from
+        output: A ``.jsonl`` file, or a directory for Parquet/Arrow part files
+        fmt: One of ``jsonl``, ``parquet`` or ``arrow``
+        trace_ids: Explicit trace IDs; when omitted, traces are listed with
+            `trace_filter`
+        trace_filter: Selects traces when no IDs are given
+        limit: Maximum number of traces to consider (including skipped ones)
+        concurrency: Traces fetched at the same time
+        batch_rows: Rows buffered between flushes and checkpoints
+
+    Returns:
+        Summary with counts of exported, skipped and failed traces
+    """
+    progress = ExportProgress(output)
+    writer = open_writer(fmt, output, progress.checkpoints)
+    pending: List[str] = []
+    rows_written = 0
+
+    def checkpoint() -> None:
+        position = writer.flush()
+        if pending:
+            progress.record(list(pending), position)
+            pending.clear()
+
+    def handle(trace_id: str, rows: List[Dict[str, Any]]) -> None:
+        nonlocal rows_written
+        writer.write(rows)
+        pending.append(trace_id)
+        rows_written += len(rows)
+        if writer.buffered_rows >= batch_rows:
+            checkpoint()
+
+    logger.info(f"Exporting traces from {provider.name} to {output} ({fmt})")
+    try:
+        stats = await fetch_spans_concurrently(
+            provider,
+            handle,
+            trace_ids=trace_ids,
+            trace_filter=trace_filter,
+            limit=limit,
+            concurrency=concurrency,
+            skip=set(progress.completed),
+        )
+    finally:
+        # Whatever was written before a failure or interruption is kept
+        try:
+            checkpoint()
+        finally:
+            writer.close()
+
+    logger.info(f"Exported {stats['fetched']} traces ({rows_written} rows) to {output}")
+    return {
+        "output": output,
+        "format": fmt,
+        "exported": stats["fetched"],
+        "skipped": stats["skipped"],
+        "failed": stats["failed"],
+        "rows": rows_written,
+        "failed_trace_ids": stats["failed_trace_ids"],
+    }
@@ -1,10 +1,15 @@
+from .base import BaseProvider, TraceFilter
 from .langfuse import LangfuseProvider, LangfuseProviderFactory
 from .langsmith import LangSmithProvider, LangSmithProviderFactory
+from .otlp import OtlpProvider
 
 # Expose providers for direct import
 __all__ = [
+    "BaseProvider",
     "LangSmithProvider",
     "LangSmithProviderFactory",
     "LangfuseProvider",
     "LangfuseProviderFactory",
+    "OtlpProvider",
+    "TraceFilter",
 ]
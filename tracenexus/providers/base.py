@@ -0,0 +1,466 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from .cache import ExpiringCache, TraceCache
+from .emitter import dump_yaml
+from .executor import BoundedExecutor, ProviderOverloaded
+from .payloads import PayloadStore
+from .profiling import CallProfile, CallProfiler
+from .stats import RequestStats
+
+logger = logging.getLogger(__name__)
+
+# Threads per instance for trace listeners (indexing, prefetching), apart
+# from the threads serving requests
+LISTENER_WORKERS = 2
+# Notifications allowed to wait for a listener thread; more are dropped
+LISTENER_QUEUE = 16
+
+# Called as listener(provider, trace_id, header, items) after a successful fetch
+TraceListener = Callable[
+    ["BaseProvider", str, Dict[str, Any], List[Dict[str, Any]]], None
+]
+# Called as recorder(provider, kind, trace_id, result, error, seconds) after
+# each upstream fetch; exactly one of result and error is set
+TraceRecorder = Callable[
+    ["BaseProvider", str, str, Any, Optional[BaseException], float], None
+]
+
+
+@dataclass
+class TraceFilter:
+    """Selects root traces to list. Unset fields do not filter."""
+
+    name: Optional[str] = None
+    from_timestamp: Optional[datetime] = None
+    to_timestamp: Optional[datetime] = None
+    tags: List[str] = field(default_factory=list)
+    # Langfuse only
+    session_id: Optional[str] = None
+    user_id: Optional[str] = None
+    # LangSmith only (required there)
+    project: Optional[str] = None
+
+
+class BaseProvider:
+    """Shared plumbing for trace providers.
+
+    SDK clients are expensive to import and construct, so providers only keep
+    their configuration at startup and build the client on first use.
+    """
+
+    provider_type = "base"
+    display_name = "Base"
+    # Key holding a trace's child items (observations or runs)
+    children_key = "items"
+
+    def __init__(self, name: str):
+        self.name = name
+        self.trace_cache = TraceCache()
+        # Traces fetched speculatively, served by get_trace until they expire
+        self.prefetched = ExpiringCache()
+        # Blocking SDK calls run here, isolated from other instances
+        self.executor = BoundedExecutor(name)
+        # Trace listeners run here, including the upstream calls they make
+        self.listener_executor = BoundedExecutor(
+            f"{name}-listeners", LISTENER_WORKERS, LISTENER_QUEUE
+        )
+        # Default deadline in seconds for upstream fetches; None means no limit
+        self.request_timeout: Optional[float] = None
+        # Oversized values in responses are spilled here; None keeps them inline
+        self.payload_store: Optional[PayloadStore] = None
+        # Write repeated large values once and refer back to them with aliases
+        self.dedup = False
+        self.request_stats = RequestStats()
+        self.trace_listeners: List[TraceListener] = []
+        # Saves upstream responses for offline replay; None records nothing
+        self.recorder: Optional[TraceRecorder] = None
+        # Profiles a share of get_trace calls; None profiles nothing
+        self.profiler: Optional[CallProfiler] = None
+        self._background_tasks: Set["asyncio.Future[Any]"] = set()
+        self._client: Any = None
+        self._client_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._in_flight = 0
+        self._retired = False
+
+    @property
+    def config(self) -> Tuple[str, ...]:
+        """Settings that identify this instance; a change requires a new provider."""
+        raise NotImplementedError
+
+    @property
+    def endpoint(self) -> str:
+        """Base URL of the upstream API, used to share connection pools."""
+        raise NotImplementedError
+
+    @property
+    def client(self) -> Any:
+        """The SDK client, created on first access."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._create_client()
+        return self._client
+
+    @property
+    def client_initialized(self) -> bool:
+        return self._client is not None
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def retired(self) -> bool:
+        return self._retired
+
+    def _create_client(self) -> Any:
+        raise NotImplementedError
+
+    def _fetch_trace(self, trace_id: str, timeout: Optional[float] = None) -> Any:
+        """Fetch a trace from the SDK. Runs in a worker thread.
+
+        `timeout` is passed to the HTTP request so a call abandoned by its
+        caller does not hold the worker longer than the caller's deadline.
+        """
+        raise NotImplementedError
+
+    def fetch_trace_dict(
+        self, trace_id: str, timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Fetch a trace as a dict. Runs in a worker thread."""
+        trace_as_dict: Dict[str, Any] = self._recorded(
+            "trace",
+            trace_id,
+            lambda: self.trace_to_dict(self._fetch_trace(trace_id, timeout)),
+        )
+        return trace_as_dict
+
+    def _fetch_trace_parts(
+        self, trace_id: str, timeout: Optional[float] = None
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """Fetch a trace as (header, child items). Runs in a worker thread."""
+        return self.split_trace(self.fetch_trace_dict(trace_id, timeout))
+
+    def _recorded(self, kind: str, trace_id: str, fetch: Callable[[], Any]) -> Any:
+        """Run an upstream fetch, handing its result or error to the recorder."""
+        if self.recorder is None:
+            return fetch()
+        started = time.perf_counter()
+        try:
+            result = fetch()
+        except Exception as e:
+            self.recorder(self, kind, trace_id, None, e, time.perf_counter() - started)
+            raise
+        self.recorder(self, kind, trace_id, result, None, time.perf_counter() - started)
+        return result
+
+    def trace_to_dict(self, trace_data: Any) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def normalize_trace(self, trace_data: Any) -> str:
+        raise NotImplementedError
+
+    def emit_yaml(self, document: Any) -> str:
+        """Dump a response document, spilling and sharing values if enabled."""
+        transform = None
+        if self.payload_store is not None:
+            transform = self.payload_store.spill_large_values
+        return dump_yaml(document, transform, dedup=self.dedup)
+
+    def split_trace(
+        self, trace_as_dict: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """Split a trace into its header and a flat list of child items."""
+        header = {k: v for k, v in trace_as_dict.items() if k != self.children_key}
+        items: List[Dict[str, Any]] = []
+        pending = list(trace_as_dict.get(self.children_key) or [])
+        while pending:
+            item = pending.pop(0)
+            nested = item.get(self.children_key) or []
+            items.append({k: v for k, v in item.items() if k != self.children_key})
+            pending[:0] = nested
+        return header, items
+
+    def spans_from_trace(
+        self, trace_id: str, header: Dict[str, Any], items: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Flatten a trace into rows with the fields in `spans.SPAN_FIELDS`."""
+        raise NotImplementedError
+
+    def iter_trace_ids(
+        self, trace_filter: TraceFilter, page_size: int = 50
+    ) -> Iterator[str]:
+        """Yield IDs of root traces matching `trace_filter`, page by page.
+
+        Runs in a worker thread; each page is fetched as the previous one is
+        consumed.
+        """
+        raise NotImplementedError
+
+    def complete_trace_parts(
+        self, trace_id: str, header: Dict[str, Any], items: List[Dict[str, Any]]
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """Header and child items of a trace, fetching any `get_trace` left out.
+
+        Runs in a worker thread. Providers whose traces come with all their
+        child items return them unchanged.
+        """
+        return header, items
+
+    def fetch_spans(self, trace_id: str) -> List[Dict[str, Any]]:
+        """Fetch a whole trace as span rows. Runs in a worker thread."""
+        header, items = self._fetch_trace_parts(trace_id, self.request_timeout)
+        return self.spans_from_trace(trace_id, header, items)
+
+    def related_trace_ids(
+        self, trace_id: str, header: Dict[str, Any], limit: int
+    ) -> List[str]:
+        """IDs of traces likely to be requested after `trace_id`.
+
+        Runs in a worker thread. Providers without a notion of related traces
+        return an empty list.
+        """
+        return []
+
+    def _close_client(self, client: Any) -> None:
+        """Release resources held by an SDK client. No-op by default."""
+
+    def warm_up(self) -> None:
+        """Open a pooled connection to the upstream host. No-op by default."""
+
+    @contextmanager
+    def _track_call(self) -> Iterator[None]:
+        with self._state_lock:
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._state_lock:
+                self._in_flight -= 1
+                close_now = self._retired and self._in_flight == 0
+            if close_now:
+                self.close()
+
+    def retire(self) -> None:
+        """Mark the provider as removed; it closes once in-flight calls finish."""
+        with self._state_lock:
+            self._retired = True
+            close_now = self._in_flight == 0
+        if close_now:
+            self.close()
+
+    def close(self) -> None:
+        self.executor.shutdown()
+        self.listener_executor.shutdown()
+        with self._client_lock:
+            client, self._client = self._client, None
+        if client is not None:
+            logger.info(f"Closing {self.provider_type} client for '{self.name}'")
+            self._close_client(client)
+
+    def _notify_trace(self, trace_id: str, trace_as_dict: Dict[str, Any]) -> None:
+        """Hand a fetched trace to listeners in the background."""
+        if not self.trace_listeners:
+            return
+        header, items = self.split_trace(trace_as_dict)
+        self._notify_parts(trace_id, header, items)
+
+    def _notify_parts(
+        self, trace_id: str, header: Dict[str, Any], items: List[Dict[str, Any]]
+    ) -> None:
+        for listener in self.trace_listeners:
+            task = asyncio.ensure_future(
+                self.listener_executor.run(listener, self, trace_id, header, items)
+            )
+            self._background_tasks.add(task)
+            task.add_done_callback(self._listener_done)
+
+    def _listener_done(self, task: "asyncio.Future[Any]") -> None:
+        self._background_tasks.discard(task)
+        if task.cancelled():
+            return
+        if isinstance(task.exception(), ProviderOverloaded):
+            logger.debug(f"Dropped a trace notification for {self.name}: busy")
+        elif task.exception() is not None:
+            logger.warning(
+                f"Trace listener failed for {self.display_name} ({self.name}): "
+                f"{task.exception()}"
+            )
+
+    async def call_upstream(
+        self, timeout: Optional[float], func: Callable[..., Any], *args: Any
+    ) -> Any:
+        """Run a blocking SDK call on this instance's executor under a deadline.
+
+        If the awaiting task is cancelled (for example because the MCP client
+        went away) before the call starts, the queued call is dropped. A call
+        that has started is bounded by the HTTP timeout it was given. Raises
+        `ProviderOverloaded` when the executor's queue is full.
+        """
+        return await asyncio.wait_for(self.executor.run(func, *args), timeout)
+
+    async def get_trace(self, trace_id: str, timeout: Optional[float] = None) -> str:
+        logger.info(f"Getting trace {trace_id} from {self.display_name} ({self.name})")
+        timeout = timeout or self.request_timeout
+        started = time.perf_counter()
+        outcome = "ok"
+        profile = None
+        if self.profiler is not None:
+            profile = self.profiler.start(self, trace_id)
+        try:
+            with self._track_call():
+                # Served once: a later call sees a trace that is still running
+                # as it is then, not as it was when prefetched
+                trace_as_dict = self.prefetched.pop(trace_id)
+                if trace_as_dict is not None:
+                    logger.info(f"Serving prefetched trace {trace_id}")
+                else:
+                    trace_as_dict = await self.call_upstream(
+                        timeout,
+                        self._profiled(profile, "fetch", self.fetch_trace_dict),
+                        trace_id,
+                        timeout,
+                    )
+                self._notify_trace(trace_id, trace_as_dict)
+                emit = self._profiled(profile, "emit", self.normalize_trace)
+                result: str = emit(trace_as_dict)
+                if profile is not None:
+                    profile.output_bytes = len(result)
+                return result
+        except TimeoutError:
+            outcome = "timeout"
+            return self._timeout_response(trace_id, timeout)
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except Exception as e:
+            outcome = self._classify_error(e)
+            return self._error_response(trace_id, e)
+        finally:
+            self.request_stats.record(
+                "get_trace", outcome, time.perf_counter() - started
+            )
+            if profile is not None:
+                profile.finish(outcome)
+
+    @staticmethod
+    def _profiled(
+        profile: Optional[CallProfile], phase: str, func: Callable[..., Any]
+    ) -> Callable[..., Any]:
+        """`func`, run under `profile` as `phase` when the call is profiled."""
+        if profile is None:
+            return func
+        return functools.partial(profile.run, phase, func)
+
+    def _timeout_response(self, trace_id: str, timeout: Optional[float]) -> str:
+        logger.warning(
+            f"Fetching trace {trace_id} from {self.display_name} ({self.name}) "
+            f"timed out after {timeout}s"
+        )
+        return f"Timed out after {timeout}s fetching trace from {self.name}: {trace_id}"
+
+    @staticmethod
+    def _classify_error(error: Exception) -> str:
+        """Outcome recorded in `request_stats` for a failed request."""
+        if isinstance(error, ProviderOverloaded):
+            return "overloaded"
+        error_msg = str(error).lower()
+        if "404" in error_msg or "not found" in error_msg:
+            return "not_found"
+        return "error"
+
+    def _error_response(self, trace_id: str, error: Exception) -> str:
+        if self._classify_error(error) == "not_found":
+            logger.warning(
+                f"Trace {trace_id} not found in {self.display_name} "
+                f"instance '{self.name}'"
+            )
+            return f"Trace not found in {self.name}: {trace_id}"
+        # For other errors, log them but still return a user-friendly message
+        logger.error(
+            f"Error fetching trace from {self.display_name} ({self.name}): {error}"
+        )
+        return f"Error fetching trace from {self.name}: {error}"
+
+    async def get_trace_changes(
+        self,
+        trace_id: str,
+        since: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Refresh a trace and return what changed since the `since` cursor."""
+        timeout = timeout or self.request_timeout
+        with self._track_call():
+            header, items = await self.call_upstream(
+                timeout, self._fetch_trace_parts, trace_id, timeout
+            )
+        if self.trace_listeners:
+            self._notify_parts(trace_id, header, items)
+        return self.trace_cache.merge_changes(trace_id, header, items, since)
+
+    async def watch_trace(
+        self,
+        trace_id: str,
+        since: Optional[str] = None,
+        wait_seconds: float = 0.0,
+        poll_interval: float = 2.0,
+        timeout: Optional[float] = None,
+    ) -> str:
+        """Return items added or updated since `since`, long-polling for news.
+
+        Without a cursor the whole trace is returned. With one, the upstream is
+        polled every `poll_interval` seconds until something changes or
+        `wait_seconds` elapse. `timeout` bounds each upstream fetch.
+        """
+        logger.info(
+            f"Watching trace {trace_id} in {self.display_name} ({self.name}) "
+            f"since {since}"
+        )
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max(wait_seconds, 0.0)
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            while True:
+                changes = await self.get_trace_changes(trace_id, since, timeout)
+                has_news = (
+                    changes["full"]
+                    or changes["header"] is not None
+                    or bool(changes["items"])
+                )
+                if has_news or loop.time() + poll_interval > deadline:
+                    return self.normalize_changes(changes)
+                await asyncio.sleep(poll_interval)
+        except TimeoutError:
+            outcome = "timeout"
+            return self._timeout_response(trace_id, timeout or self.request_timeout)
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except Exception as e:
+            outcome = self._classify_error(e)
+            return self._error_response(trace_id, e)
+        finally:
+            # Includes time spent long-polling for changes
+            self.request_stats.record(
+                "watch_trace", outcome, time.perf_counter() - started
+            )
+
+    def normalize_changes(self, changes: Dict[str, Any]) -> str:
+        document: Dict[str, Any] = {
+            "cursor": changes["cursor"],
+            "full": changes["full"],
+        }
+        if changes["header"] is not None:
+            document["trace"] = changes["header"]
+        document[self.children_key] = changes["items"]
+        return self.emit_yaml(document)
@@ -0,0 +1,267 @@
+import hashlib
+import json
+import pickle
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from .dedup import intern_values
+
+DEFAULT_MAX_ENTRIES = 64
+# Cached values at least this large (pickled) are kept zlib-compressed
+COMPRESS_MIN_BYTES = 1024
+
+
+class _Packed:
+    """A compressed cached value."""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+
+def pack(value: Any) -> Any:
+    try:
+        pickled = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, TypeError, AttributeError):
+        return value
+    if len(pickled) < COMPRESS_MIN_BYTES:
+        return value
+    return _Packed(zlib.compress(pickled, 1))
+
+
+def unpack(value: Any) -> Any:
+    if isinstance(value, _Packed):
+        return pickle.loads(zlib.decompress(value.data))
+    return value
+
+
+def packed_size(value: Any) -> int:
+    return len(value.data) if isinstance(value, _Packed) else 0
+
+
+def fingerprint(value: Any) -> str:
+    encoded = json.dumps(value, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+@dataclass
+class CachedTrace:
+    """Base copy of a trace with a revision number for every child item.
+
+    Each merge of a fresh upstream copy bumps the revision of items that were
+    added or changed, so callers can ask for everything newer than a cursor.
+    Large values are stored compressed and only inflated when returned.
+    """
+
+    header: Any = None
+    header_revision: int = 0
+    items: Dict[str, Any] = field(default_factory=dict)
+    item_revisions: Dict[str, int] = field(default_factory=dict)
+    fingerprints: Dict[str, str] = field(default_factory=dict)
+    revision: int = 0
+    # Distinguishes a rebuilt entry (after eviction or restart) from this one
+    epoch: str = field(default_factory=lambda: uuid.uuid4().hex[:8])
+
+    @property
+    def cursor(self) -> str:
+        return f"{self.epoch}:{self.revision}"
+
+    def merge(self, header: Dict[str, Any], items: List[Dict[str, Any]]) -> None:
+        next_revision = self.revision + 1
+        changed = False
+
+        header_fingerprint = fingerprint(header)
+        if self.fingerprints.get("") != header_fingerprint:
+            self.header = pack(header)
+            self.header_revision = next_revision
+            self.fingerprints[""] = header_fingerprint
+            changed = True
+
+        for item in items:
+            item_id = str(item.get("id"))
+            item_fingerprint = fingerprint(item)
+            if self.fingerprints.get(item_id) == item_fingerprint:
+                continue
+            self.items[item_id] = pack(item)
+            self.item_revisions[item_id] = next_revision
+            self.fingerprints[item_id] = item_fingerprint
+            changed = True
+
+        if changed:
+            self.revision = next_revision
+
+    def changes_since(
+        self, revision: int
+    ) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Return the header (if it changed) and items newer than `revision`."""
+        header = unpack(self.header) if self.header_revision > revision else None
+        items = [
+            unpack(item)
+            for item_id, item in self.items.items()
+            if self.item_revisions[item_id] > revision
+        ]
+        return header, items
+
+    @property
+    def compressed_bytes(self) -> int:
+        return packed_size(self.header) + sum(
+            packed_size(item) for item in self.items.values()
+        )
+
+
+def _cache_stats(
+    entries: int, max_entries: int, hits: int, misses: int
+) -> Dict[str, Any]:
+    lookups = hits + misses
+    return {
+        "entries": entries,
+        "max_entries": max_entries,
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / lookups, 4) if lookups else None,
+    }
+
+
+class TraceCache:
+    """Thread-safe LRU of `CachedTrace` entries keyed by trace ID."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedTrace]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, trace_id: str) -> bool:
+        return trace_id in self._entries
+
+    def merge_changes(
+        self,
+        trace_id: str,
+        header: Dict[str, Any],
+        items: List[Dict[str, Any]],
+        since: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Merge a fresh copy of a trace and describe what changed since `since`.
+
+        Args:
+            trace_id: The trace being refreshed
+            header: Trace fields other than the child items
+            items: Child items (observations or runs), each with an ``id``
+            since: Cursor returned by a previous call, or None for everything
+
+        Returns:
+            Dict with the new ``cursor``, whether the result is ``full``, the
+            ``header`` if it changed (else None) and the changed ``items``
+        """
+        with self._lock:
+            entry = self._entries.get(trace_id)
+            if entry is None:
+                self.misses += 1
+                entry = CachedTrace()
+                self._entries[trace_id] = entry
+            else:
+                self.hits += 1
+            self._entries.move_to_end(trace_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+            entry.merge(header, items)
+            since_revision = self._parse_cursor(entry, since)
+            full = since_revision == 0
+            changed_header, changed_items = entry.changes_since(since_revision)
+            return {
+                "cursor": entry.cursor,
+                "full": full,
+                "header": changed_header,
+                "items": changed_items,
+            }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            result = _cache_stats(
+                len(self._entries), self.max_entries, self.hits, self.misses
+            )
+            result["compressed_bytes"] = sum(
+                entry.compressed_bytes for entry in self._entries.values()
+            )
+            return result
+
+    @staticmethod
+    def _parse_cursor(entry: CachedTrace, cursor: Optional[str]) -> int:
+        # Unknown, malformed or stale cursors fall back to a full response
+        if not cursor:
+            return 0
+        epoch, _, revision = cursor.partition(":")
+        if epoch != entry.epoch or not revision.isdigit():
+            return 0
+        return min(int(revision), entry.revision)
+
+
+class ExpiringCache:
+    """Thread-safe LRU whose entries expire after a per-entry time to live."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] > time.monotonic()
+
+    def put(self, key: str, value: Any, ttl: float) -> None:
+        # Repeated values (chat histories) are pickled once
+        packed = pack(intern_values(value))
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, packed)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Any:
+        """Return the value for `key`, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return unpack(entry[1])
+
+    def pop(self, key: str) -> Any:
+        """Like `get`, but removes the entry so it is only returned once."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry[0] <= time.monotonic():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return unpack(entry[1])
+
+    def stats(self) -> Dict[str, Any]:
+        """Occupancy and hit ratio of `get` lookups; `in` checks are not counted."""
+        with self._lock:
+            return _cache_stats(
+                len(self._entries), self.max_entries, self.hits, self.misses
+            )
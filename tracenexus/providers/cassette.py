@@ -0,0 +1,272 @@
+"""Record upstream responses to cassette files and replay them offline.
+
+With a :class:`CassetteRecorder` attached, every upstream fetch of a provider
+instance appends one entry to ``<dir>/<provider>.<instance>.jsonl.gz``: the
+trace ID, the fetched data (or the error) and how long the fetch took. Each
+entry is a separate gzip member, so recording only ever appends.
+
+:class:`ReplayProviderFactory` turns a directory of cassettes back into
+provider instances with the recorded names and types. They parse, normalize
+and flatten traces with the real provider code but answer fetches from the
+cassette, after the recorded latency or a fixed one, so profiling, tests and
+benchmarks run deterministically without network access.
+"""
+
+import glob
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .base import BaseProvider, TraceFilter
+from .emitter import to_plain
+from .langfuse import LangfuseProvider
+from .langsmith import LangSmithProvider
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_SUFFIX = ".jsonl.gz"
+# Replay latency profiles besides a fixed number of seconds
+LATENCY_RECORDED = "recorded"
+LATENCY_NONE = "none"
+
+
+def cassette_path(directory: str, provider_type: str, name: str) -> str:
+    return os.path.join(directory, f"{provider_type}.{name}{CASSETTE_SUFFIX}")
+
+
+def parse_latency(profile: str) -> Optional[float]:
+    """Seconds each replayed fetch takes; None replays the recorded latency."""
+    if profile == LATENCY_RECORDED:
+        return None
+    if profile == LATENCY_NONE:
+        return 0.0
+    try:
+        seconds = float(profile)
+    except ValueError:
+        seconds = -1.0
+    if seconds < 0:
+        raise ValueError(
+            f"Replay latency must be '{LATENCY_RECORDED}', '{LATENCY_NONE}' "
+            f"or a number of seconds, not {profile!r}"
+        )
+    return seconds
+
+
+class RecordedError(Exception):
+    """An upstream error replayed from a cassette."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class CassetteRecorder:
+    """Appends upstream fetches of every attached provider to cassettes.
+
+    Used as a provider's ``recorder``.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.recorded_count = 0
+
+    def __call__(
+        self,
+        provider: BaseProvider,
+        kind: str,
+        trace_id: str,
+        result: Any,
+        error: Optional[BaseException],
+        seconds: float,
+    ) -> None:
+        entry: Dict[str, Any] = {
+            "kind": kind,
+            "trace_id": trace_id,
+            "seconds": round(seconds, 6),
+        }
+        if error is not None:
+            entry["error"] = {
+                "type": type(error).__name__,
+                "message": str(error),
+                "status_code": getattr(error, "status_code", None),
+            }
+        else:
+            entry["data"] = result
+        try:
+            line = json.dumps(
+                to_plain(entry), ensure_ascii=False, separators=(",", ":")
+            )
+            member = gzip.compress(line.encode("utf-8") + b"\n")
+            path = cassette_path(self.directory, provider.provider_type, provider.name)
+            with self._lock, open(path, "ab") as cassette:
+                cassette.write(member)
+                self.recorded_count += 1
+        except Exception as e:
+            # Recording must never fail the fetch itself
+            logger.warning(
+                f"Could not record trace {trace_id} from {provider.name}: {e}"
+            )
+
+
+class Cassette:
+    """Recorded entries of one instance, indexed by kind and trace ID.
+
+    Entries are kept as their JSON text and decoded on every replay, so
+    callers get fresh objects and replay pays a realistic parsing cost. When a
+    trace was recorded more than once, the last recording is replayed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries: Dict[Tuple[str, str], str] = {}
+        self._trace_ids: Dict[str, None] = {}
+        with gzip.open(path, "rt", encoding="utf-8") as cassette:
+            for line in cassette:
+                entry = json.loads(line)
+                self._entries[(entry["kind"], entry["trace_id"])] = line
+                self._trace_ids.setdefault(entry["trace_id"])
+        logger.info(f"Loaded {len(self._entries)} recorded fetches from {path}")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        return key in self._entries
+
+    def trace_ids(self) -> List[str]:
+        """IDs of recorded traces, in recording order."""
+        return list(self._trace_ids)
+
+    def get(self, kind: str, trace_id: str) -> Optional[Dict[str, Any]]:
+        line = self._entries.get((kind, trace_id))
+        if line is None:
+            return None
+        entry: Dict[str, Any] = json.loads(line)
+        return entry
+
+
+class ReplayProvider(BaseProvider):
+    """Serves fetches from a cassette instead of the upstream API.
+
+    Combined with a real provider class (see `REPLAY_PROVIDERS`), which
+    supplies the parsing, normalization and span extraction.
+
+    Args:
+        path: Cassette file
+        name: Instance name
+        latency: Seconds each fetch takes; None replays the recorded latency
+    """
+
+    # Arguments before `name` for the real provider's __init__; the
+    # credentials are never used, since nothing is fetched upstream
+    placeholder_config: Tuple[str, ...] = ()
+
+    def __init__(self, path: str, name: str, latency: Optional[float] = None):
+        self.path = path
+        self.latency = latency
+        # Cooperative, so the real provider sets up its own state as well
+        super().__init__(*self.placeholder_config, name)  # type: ignore[call-arg]
+
+    @property
+    def config(self) -> Tuple[str, ...]:
+        return (self.path,)
+
+    @property
+    def endpoint(self) -> str:
+        return f"file://{os.path.abspath(self.path)}"
+
+    def _create_client(self) -> Any:
+        return Cassette(self.path)
+
+    def _close_client(self, client: Any) -> None:
+        pass
+
+    def warm_up(self) -> None:
+        pass
+
+    def _replay(self, kind: str, trace_id: str, timeout: Optional[float]) -> Any:
+        entry = self.client.get(kind, trace_id)
+        if entry is None:
+            raise LookupError(f"Trace {trace_id} not found in cassette {self.path}")
+        delay = entry["seconds"] if self.latency is None else self.latency
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Recorded fetch took {delay:.3f}s")
+        time.sleep(delay)
+        error = entry.get("error")
+        if error is not None:
+            if error["type"] == "TimeoutError":
+                raise TimeoutError(error["message"])
+            raise RecordedError(error["message"], error["status_code"])
+        return entry["data"]
+
+    def _fetch_trace(self, trace_id: str, timeout: Optional[float] = None) -> Any:
+        return self._replay("trace", trace_id, timeout)
+
+    def _fetch_trace_parts(
+        self, trace_id: str, timeout: Optional[float] = None
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        if ("parts", trace_id) not in self.client:
+            return self.split_trace(self.fetch_trace_dict(trace_id, timeout))
+        header, items = self._replay("parts", trace_id, timeout)
+        return header, items
+
+    def iter_trace_ids(
+        self, trace_filter: TraceFilter, page_size: int = 50
+    ) -> Iterator[str]:
+        # Filters need upstream queries; every recorded trace is listed
+        yield from self.client.trace_ids()
+
+    def related_trace_ids(
+        self, trace_id: str, header: Dict[str, Any], limit: int
+    ) -> List[str]:
+        return []
+
+
+class LangfuseReplayProvider(ReplayProvider, LangfuseProvider):
+    display_name = "Langfuse (replay)"
+    placeholder_config = ("replay", "replay", "replay://")
+
+
+class LangSmithReplayProvider(ReplayProvider, LangSmithProvider):
+    display_name = "LangSmith (replay)"
+    placeholder_config = ("replay",)
+
+
+REPLAY_PROVIDERS = {
+    "langfuse": LangfuseReplayProvider,
+    "langsmith": LangSmithReplayProvider,
+}
+
+
+class ReplayProviderFactory:
+    @staticmethod
+    def create_providers(
+        directory: str, latency: Optional[float] = None
+    ) -> List[Tuple[str, ReplayProvider]]:
+        """Create a replay provider for each cassette in `directory`.
+
+        Returns:
+            List of tuples (name, provider); `provider.provider_type` is the
+            type of the recorded instance
+        """
+        providers: List[Tuple[str, ReplayProvider]] = []
+        pattern = os.path.join(glob.escape(directory), f"*{CASSETTE_SUFFIX}")
+        for path in sorted(glob.glob(pattern)):
+            stem = os.path.basename(path)[: -len(CASSETTE_SUFFIX)]
+            provider_type, _, name = stem.partition(".")
+            provider_class = REPLAY_PROVIDERS.get(provider_type)
+            if provider_class is None or not name:
+                logger.warning(f"Skipping unrecognized cassette: {path}")
+                continue
+            providers.append((name, provider_class(path, name, latency)))
+            logger.info(f"Created {provider_type} replay provider: {name}")
+        if not providers:
+            logger.warning(f"No cassettes found in {directory}")
+        return providers
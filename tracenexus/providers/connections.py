@@ -0,0 +1,110 @@
+"""Host-keyed HTTP connection pools shared by provider instances.
+
+Providers on the same host reuse one pool (and its TLS sessions) while keeping
+their own credentials, which the SDKs send as per-request headers. HTTP/2 is
+used for httpx pools when the optional ``h2`` package is installed.
+"""
+
+import importlib.util
+import logging
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    import httpx
+    import requests.adapters
+
+logger = logging.getLogger(__name__)
+
+# Matches the Langfuse SDK default request timeout
+DEFAULT_TIMEOUT_SECONDS = 20.0
+MAX_CONNECTIONS_PER_HOST = 20
+
+_lock = threading.Lock()
+_httpx_clients: Dict[str, "httpx.Client"] = {}
+_requests_adapters: Dict[str, "requests.adapters.HTTPAdapter"] = {}
+
+
+def _reset_after_fork() -> None:
+    # Sockets must not be shared with a forked child process
+    global _lock
+    _lock = threading.Lock()
+    _httpx_clients.clear()
+    _requests_adapters.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+def host_key(url: str) -> str:
+    """Normalize a URL to ``scheme://host[:port]``."""
+    parts = urlsplit(url.strip())
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+def get_httpx_client(url: str) -> "httpx.Client":
+    """Return the shared httpx client for the host of `url`."""
+    import httpx
+
+    key = host_key(url)
+    with _lock:
+        client = _httpx_clients.get(key)
+        if client is None:
+            client = httpx.Client(
+                http2=http2_available(),
+                timeout=DEFAULT_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS_PER_HOST,
+                    max_keepalive_connections=MAX_CONNECTIONS_PER_HOST,
+                ),
+            )
+            _httpx_clients[key] = client
+            logger.info(
+                f"Created shared HTTP pool for {key} (http2={http2_available()})"
+            )
+    return client
+
+
+def get_requests_adapter(
+    url: str, factory: Callable[[], "requests.adapters.HTTPAdapter"]
+) -> "requests.adapters.HTTPAdapter":
+    """Return the shared requests adapter for the host of `url`.
+
+    The adapter owns the connection pool; mount it on each client's own
+    session so that closing one session does not close the others. `factory`
+    creates the adapter for the first caller on a host.
+    """
+    key = host_key(url)
+    with _lock:
+        adapter = _requests_adapters.get(key)
+        if adapter is None:
+            adapter = factory()
+            _requests_adapters[key] = adapter
+            logger.info(f"Created shared HTTP pool for {key}")
+    return adapter
+
+
+def warm_up(providers: Iterable[Any]) -> threading.Thread:
+    """Open one connection per distinct provider host in the background."""
+    by_host: Dict[str, Any] = {}
+    for provider in providers:
+        by_host.setdefault(host_key(provider.endpoint), provider)
+
+    def run() -> None:
+        for key, provider in sorted(by_host.items()):
+            try:
+                provider.warm_up()
+                logger.info(f"Warmed up connection to {key}")
+            except Exception as e:
+                logger.debug(f"Connection warm-up to {key} failed: {e}")
+
+    thread = threading.Thread(target=run, name="tracenexus-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,84 @@
+"""Content-addressed sharing of repeated values inside a trace.
+
+Agent traces repeat the same data many times: every LLM call's input holds the
+whole chat history so far, so message N appears in the input of every later
+observation. :func:`intern_values` hashes each subtree bottom-up and makes all
+equal subtrees of at least ``min_size`` characters the same object.
+
+Sharing is then free downstream: the YAML dumper writes a shared object once
+with an anchor (``&id001``) and later occurrences as an alias (``*id001``), and
+pickle (used by the trace caches) stores it once. A growing chat history
+becomes a list of aliases to earlier messages plus the new message.
+"""
+
+import hashlib
+from typing import Any, Dict, Tuple
+
+# Values serializing to fewer characters than this are left alone; an alias
+# costs about eight characters
+DEFAULT_MIN_SIZE = 256
+_DIGEST_SIZE = 16
+
+
+def intern_values(value: Any, min_size: int = DEFAULT_MIN_SIZE) -> Any:
+    """Return `value` with equal large dicts, lists and strings shared.
+
+    Containers are rebuilt; the input is not modified.
+    """
+    canonical: Dict[bytes, Any] = {}
+    return _Interner(canonical, min_size).visit(value)[0]
+
+
+class _Interner:
+    __slots__ = ("canonical", "min_size")
+
+    def __init__(self, canonical: Dict[bytes, Any], min_size: int):
+        self.canonical = canonical
+        self.min_size = min_size
+
+    def visit(self, value: Any) -> Tuple[Any, bytes, int]:
+        """Return (shared value, content key, approximate serialized size).
+
+        Small values are keyed by their own content; large ones by a hash of
+        it, so parent keys stay short.
+        """
+        if isinstance(value, str):
+            key = b"s" + value.encode("utf-8", "surrogatepass")
+            return self._share(value, key, len(value))
+        if isinstance(value, dict):
+            items = {}
+            parts = [b"d"]
+            size = 2
+            for item_key, item in value.items():
+                shared, child_key, child_size = self.visit(item)
+                items[item_key] = shared
+                name = str(item_key)
+                parts.append(
+                    b"%d:%s%d:"
+                    % (len(name), name.encode("utf-8", "surrogatepass"), len(child_key))
+                )
+                parts.append(child_key)
+                size += len(name) + child_size + 2
+            return self._share(items, b"".join(parts), size)
+        if isinstance(value, (list, tuple)):
+            elements = []
+            parts = [b"l" if isinstance(value, list) else b"t"]
+            size = 2
+            for item in value:
+                shared, child_key, child_size = self.visit(item)
+                elements.append(shared)
+                parts.append(b"%d:" % len(child_key))
+                parts.append(child_key)
+                size += child_size + 2
+            rebuilt = elements if isinstance(value, list) else tuple(elements)
+            return self._share(rebuilt, b"".join(parts), size)
+        # Numbers, booleans, None and SDK values such as datetimes
+        text = repr(value)
+        return value, b"v" + type(value).__name__.encode() + text.encode(), len(text)
+
+    def _share(self, value: Any, key: bytes, size: int) -> Tuple[Any, bytes, int]:
+        if len(key) > _DIGEST_SIZE * 2:
+            key = b"h" + hashlib.blake2b(key, digest_size=_DIGEST_SIZE).digest()
+        if size >= self.min_size:
+            value = self.canonical.setdefault(key, value)
+        return value, key, size
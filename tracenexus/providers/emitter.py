@@ -0,0 +1,129 @@
+"""YAML emitter shared by every tool that returns trace data.
+
+Values are converted to plain JSON types (strings, numbers, booleans, lists
+and dicts) in a single pass before dumping, the same result as pydantic's
+``model_dump(mode="json")``. The dump then only needs the safe representers,
+so it can run on the libyaml C emitter when PyYAML was built with it.
+"""
+
+import base64
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Callable, Dict, Optional
+from uuid import UUID
+
+import yaml
+
+try:
+    from yaml import CSafeDumper as SafeDumper
+except ImportError:  # pragma: no cover - PyYAML built without libyaml
+    from yaml import SafeDumper  # type: ignore[assignment]
+
+from .dedup import DEFAULT_MIN_SIZE, intern_values
+
+# Long strings are kept on one line instead of folded and re-indented
+_LINE_WIDTH = 1 << 30
+
+
+class _SharingDumper(SafeDumper):
+    """Also writes repeated long strings once, as an anchor and aliases.
+
+    Only strings made the same object by `intern_values` are aliased.
+    """
+
+    def ignore_aliases(self, data: Any) -> bool:
+        if isinstance(data, str) and len(data) >= DEFAULT_MIN_SIZE:
+            return False
+        result: bool = super().ignore_aliases(data)
+        return result
+
+
+def _convert_dict(value: Dict[Any, Any]) -> Dict[str, Any]:
+    return {
+        key if isinstance(key, str) else str(to_plain(key)): to_plain(item)
+        for key, item in value.items()
+    }
+
+
+def _convert_sequence(value: Any) -> Any:
+    return [to_plain(item) for item in value]
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _convert_bytes(value: bytes) -> str:
+    try:
+        return value.decode("utf-8")
+    except UnicodeDecodeError:
+        return base64.b64encode(value).decode("ascii")
+
+
+_CONVERTERS: Dict[type, Callable[[Any], Any]] = {
+    str: _identity,
+    int: _identity,
+    float: _identity,
+    bool: _identity,
+    type(None): _identity,
+    dict: _convert_dict,
+    list: _convert_sequence,
+    tuple: _convert_sequence,
+    set: _convert_sequence,
+    frozenset: _convert_sequence,
+    datetime: datetime.isoformat,
+    date: date.isoformat,
+    time: time.isoformat,
+    timedelta: timedelta.total_seconds,
+    UUID: str,
+    Decimal: str,
+    bytes: _convert_bytes,
+}
+
+
+def to_plain(value: Any) -> Any:
+    """Convert `value` to JSON-compatible Python types in one pass."""
+    converter = _CONVERTERS.get(type(value))
+    if converter is not None:
+        return converter(value)
+    # Subclasses and models, checked in order of likelihood
+    if isinstance(value, Enum):
+        return to_plain(value.value)
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json")
+    if hasattr(value, "dict") and callable(value.dict):
+        return to_plain(value.dict())
+    for base, converter in _CONVERTERS.items():
+        if isinstance(value, base):
+            return converter(value)
+    return str(value)
+
+
+def dump_yaml(
+    document: Any,
+    transform: Optional[Callable[[Any], Any]] = None,
+    dedup: bool = False,
+) -> str:
+    """Emit `document` as block-style YAML, keeping key order and Unicode.
+
+    Args:
+        document: Value to emit; converted with `to_plain` first
+        transform: Applied to the converted document before dumping
+        dedup: Write each repeated large value once and refer back to it with
+            YAML aliases (see `dedup.intern_values`)
+    """
+    plain = to_plain(document)
+    if transform is not None:
+        plain = transform(plain)
+    if dedup:
+        plain = intern_values(plain)
+    return yaml.dump(
+        plain,
+        Dumper=_SharingDumper if dedup else SafeDumper,
+        sort_keys=False,
+        indent=2,
+        default_flow_style=False,
+        allow_unicode=True,
+        width=_LINE_WIDTH,
+    )
@@ -0,0 +1,132 @@
+"""Bounded worker pools for blocking SDK calls, one per provider instance.
+
+Each instance gets its own threads and its own queue limit, so a slow upstream
+host only delays (and eventually sheds) requests to that instance instead of
+filling the event loop's shared default executor.
+"""
+
+import asyncio
+import contextvars
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 8
+# Calls allowed to wait for a worker before new calls are rejected
+DEFAULT_MAX_QUEUE = 32
+
+
+class ProviderOverloaded(RuntimeError):
+    """Raised when a provider's worker pool and queue are both full."""
+
+
+class BoundedExecutor:
+    """A thread pool with a queue-depth limit that sheds load when full.
+
+    Args:
+        name: Used in thread names and messages
+        max_workers: Threads running calls at the same time
+        max_queue: Calls allowed to wait for a free thread
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+    ):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.active = 0
+        self.queued = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def configure(self, max_workers: int, max_queue: int) -> None:
+        """Change the limits. Calls already submitted finish on the old pool."""
+        with self._lock:
+            if (max_workers, max_queue) == (self.max_workers, self.max_queue):
+                return
+            self.max_workers = max_workers
+            self.max_queue = max_queue
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix=f"tracenexus-{self.name}",
+            )
+        return self._pool
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run `func(*args)` on the pool, rejecting it if the queue is full."""
+        with self._lock:
+            if self.active + self.queued >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise ProviderOverloaded(
+                    f"'{self.name}' is overloaded "
+                    f"({self.active} running, {self.queued} queued); "
+                    "try again shortly"
+                )
+            self.queued += 1
+            pool = self._get_pool()
+
+        context = contextvars.copy_context()
+
+        def call() -> Any:
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+            try:
+                return context.run(func, *args)
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+
+        def on_done(future: "Future[Any]") -> None:
+            # A call cancelled while queued never ran `call`
+            if future.cancelled():
+                with self._lock:
+                    self.queued -= 1
+
+        try:
+            future = pool.submit(call)
+        except RuntimeError:
+            # The pool was replaced or shut down between locking and submitting
+            with self._lock:
+                self.queued -= 1
+            raise
+        future.add_done_callback(on_done)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "active": self.active,
+                "queued": self.queued,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "utilization": round(self.active / self.max_workers, 3),
+            }
+
+    def shutdown(self) -> None:
+        """Release the pool's threads once submitted calls finish.
+
+        A later call starts a new pool.
+        """
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
@@ -1,55 +1,288 @@
-import asyncio
 import logging
+import math
 import os
-from typing import Any, List, Tuple
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
-import yaml
-from langfuse import Langfuse
+from .base import BaseProvider, TraceFilter
+from .connections import get_httpx_client
+from .spans import latency_ms, span_row
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Observation pages requested at the same time in paged mode
+DEFAULT_PAGES_IN_FLIGHT = 4
+PAGE_ATTEMPTS = 3
+_RETRY_BACKOFF_SECONDS = 0.5
+# The trace header is looked up among traces started this long before the
+# trace's first observation (the API has no header-only trace endpoint). List
+# pages carry every listed trace's observation IDs, so only a few are read
+# before falling back to fetching the whole trace
+_HEADER_WINDOW = timedelta(minutes=5)
+_HEADER_LOOKUP_PAGES = 2
+_HEADER_PAGE_SIZE = 100
+
+
+def _is_retryable(error: Exception) -> bool:
+    status_code = getattr(error, "status_code", None)
+    return status_code is None or status_code == 429 or status_code >= 500
+
+
+class LangfuseProvider(BaseProvider):
+    provider_type = "langfuse"
+    display_name = "Langfuse"
+    children_key = "observations"
 
-class LangfuseProvider:
     def __init__(
         self, public_key: str, secret_key: str, host: str, name: str = "default"
     ):
-        self.name = name
-        logger.info(f"Initializing Langfuse provider '{name}' with host: {host}")
+        super().__init__(name)
+        self.public_key = public_key
+        self.secret_key = secret_key
+        self.host = host
+        # Observations per page when fetching traces page by page; 0 fetches
+        # each trace in one response
+        self.page_size = 0
+        self.pages_in_flight = DEFAULT_PAGES_IN_FLIGHT
+        self._page_pool: Optional[ThreadPoolExecutor] = None
+        self._page_pool_size = 0
+        self._page_pool_lock = threading.Lock()
+        logger.info(f"Configured Langfuse provider '{name}' with host: {host}")
         logger.info(
             f"Public key: {public_key[:5]}-xxxxx, Secret key: {secret_key[:5]}-xxxxx"
         )
-        self.client = Langfuse(
-            public_key=public_key,
-            secret_key=secret_key,
-            host=host,
+
+    @property
+    def config(self) -> Tuple[str, ...]:
+        return (self.public_key, self.secret_key, self.host)
+
+    @property
+    def endpoint(self) -> str:
+        return self.host
+
+    def _create_client(self) -> Any:
+        # Imported here: the SDK is slow to import and starts background threads
+        from langfuse import Langfuse
+
+        logger.info(f"Initializing Langfuse client for '{self.name}'")
+        return Langfuse(
+            public_key=self.public_key,
+            secret_key=self.secret_key,
+            host=self.host,
+            httpx_client=get_httpx_client(self.host),
         )
 
-    async def get_trace(self, trace_id: str) -> str:
-        logger.info(f"Getting trace {trace_id} from Langfuse ({self.name})")
-        try:
-            fetch_response = await asyncio.to_thread(self.client.fetch_trace, trace_id)
-            return self.normalize_trace(fetch_response.data)
-        except Exception as e:
-            # Check if it's a not found error
-            error_msg = str(e).lower()
-            if (
-                "404" in error_msg
-                or "not found" in error_msg
-                or "trace not found" in error_msg
-            ):
-                logger.warning(
-                    f"Trace {trace_id} not found in Langfuse instance '{self.name}'"
+    def _close_client(self, client: Any) -> None:
+        # The shared httpx pool stays open for other instances on this host
+        client.shutdown()
+
+    def warm_up(self) -> None:
+        get_httpx_client(self.host).head(self.host)
+
+    def close(self) -> None:
+        super().close()
+        with self._page_pool_lock:
+            pool, self._page_pool = self._page_pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    def _get_page_pool(self) -> ThreadPoolExecutor:
+        """Threads fetching observation pages, shared by all calls.
+
+        Sized like the instance's executor, so paged fetches add at most that
+        many threads however many traces are fetched at once.
+        """
+        with self._page_pool_lock:
+            size = self.executor.max_workers
+            if self._page_pool is None or self._page_pool_size != size:
+                # A replaced pool's threads exit once calls using it finish
+                # and it is garbage collected
+                self._page_pool = ThreadPoolExecutor(
+                    max_workers=size,
+                    thread_name_prefix=f"tracenexus-{self.name}-pages",
                 )
-                return f"Trace not found in {self.name}: {trace_id}"
-            else:
-                # For other errors, log them but still return a user-friendly message
-                logger.error(
-                    f"Error fetching trace from Langfuse ({self.name}): {str(e)}"
+                self._page_pool_size = size
+            return self._page_pool
+
+    def _fetch_trace(self, trace_id: str, timeout: Optional[float] = None) -> Any:
+        if self.page_size > 0:
+            return self._fetch_trace_paged(trace_id, timeout)
+        return self._fetch_trace_whole(trace_id, timeout)
+
+    def _fetch_trace_whole(self, trace_id: str, timeout: Optional[float] = None) -> Any:
+        """Fetch a trace with all its observations in one response."""
+        if timeout is None:
+            return self.client.fetch_trace(trace_id).data
+        # fetch_trace has no timeout option; call the API client it wraps
+        return self.client.client.trace.get(
+            trace_id, request_options={"timeout_in_seconds": math.ceil(timeout)}
+        )
+
+    def _fetch_trace_paged(self, trace_id: str, timeout: Optional[float] = None) -> Any:
+        """Fetch a trace's observations in pages, several at once.
+
+        Pages are retried individually and joined in page order. The header
+        comes from the trace list, since fetching the trace itself would
+        return every observation in one response; when it is not found there
+        (a busy project), the trace is fetched whole after all.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        first = self._fetch_page(trace_id, 1, deadline)
+        if not first.data:
+            # Nothing to page through; a trace without observations is cheap
+            # to fetch whole, and a missing one is reported as not found
+            return self._fetch_trace_whole(trace_id, self._remaining(deadline))
+        pages = {1: first.data}
+        total_pages = first.meta.total_pages
+        pool = self._get_page_pool()
+        pending: Dict[int, "Future[Any]"] = {}
+        next_page = 2
+        while next_page <= total_pages or pending:
+            while next_page <= total_pages and len(pending) < self.pages_in_flight:
+                pending[next_page] = pool.submit(
+                    self._fetch_page, trace_id, next_page, deadline
                 )
-                return f"Error fetching trace from {self.name}: {str(e)}"
+                next_page += 1
+            # Collect in order; later pages keep downloading meanwhile
+            page = min(pending)
+            try:
+                pages[page] = pending.pop(page).result().data
+            except BaseException:
+                for future in pending.values():
+                    future.cancel()
+                raise
+        observations = [
+            observation.dict() for page in sorted(pages) for observation in pages[page]
+        ]
+        logger.info(
+            f"Fetched {len(observations)} observations of trace {trace_id} "
+            f"in {total_pages} pages"
+        )
+        header = self._find_trace_header(trace_id, observations, deadline)
+        if header is None:
+            return self._fetch_trace_whole(trace_id, self._remaining(deadline))
+        return {**header, "observations": observations}
 
-    def normalize_trace(self, trace_data: Any) -> str:
+    def _fetch_page(self, trace_id: str, page: int, deadline: Optional[float]) -> Any:
+        return self._with_retries(
+            lambda request_options: self.client.client.observations.get_many(
+                trace_id=trace_id,
+                page=page,
+                limit=self.page_size,
+                request_options=request_options,
+            ),
+            deadline,
+            f"observations page {page} of trace {trace_id}",
+        )
+
+    def _find_trace_header(
+        self,
+        trace_id: str,
+        observations: List[Dict[str, Any]],
+        deadline: Optional[float],
+    ) -> Optional[Dict[str, Any]]:
+        start_times = [
+            o["startTime"]
+            for o in observations
+            if isinstance(o.get("startTime"), datetime)
+        ]
+        if not start_times:
+            return None
+        first_start = min(start_times)
+        for page in range(1, _HEADER_LOOKUP_PAGES + 1):
+            response = self._with_retries(
+                lambda request_options: self.client.client.trace.list(
+                    page=page,
+                    limit=_HEADER_PAGE_SIZE,
+                    from_timestamp=first_start - _HEADER_WINDOW,
+                    to_timestamp=first_start + timedelta(seconds=1),
+                    order_by="timestamp.desc",
+                    request_options=request_options,
+                ),
+                deadline,
+                f"header of trace {trace_id}",
+            )
+            for trace in response.data:
+                if trace.id == trace_id:
+                    header: Dict[str, Any] = trace.dict()
+                    # Only observation IDs; the full observations replace them
+                    header.pop("observations", None)
+                    return header
+            if len(response.data) < _HEADER_PAGE_SIZE:
+                break
+        logger.warning(
+            f"Header of trace {trace_id} not found in the trace list; "
+            "fetching the whole trace"
+        )
+        return None
+
+    @staticmethod
+    def _remaining(deadline: Optional[float]) -> Optional[float]:
+        if deadline is None:
+            return None
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("Deadline passed")
+        return remaining
+
+    @staticmethod
+    def _with_retries(
+        request: Callable[[Dict[str, Any]], Any],
+        deadline: Optional[float],
+        description: str,
+    ) -> Any:
+        for attempt in range(1, PAGE_ATTEMPTS + 1):
+            request_options: Dict[str, Any] = {}
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"Deadline passed fetching {description}")
+                request_options["timeout_in_seconds"] = math.ceil(remaining)
+            try:
+                return request(request_options)
+            except Exception as e:
+                if attempt == PAGE_ATTEMPTS or not _is_retryable(e):
+                    raise
+                logger.warning(f"Retrying {description} after error: {e}")
+                time.sleep(_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+
+    def iter_trace_ids(
+        self, trace_filter: TraceFilter, page_size: int = 50
+    ) -> Iterator[str]:
+        page = 1
+        while True:
+            response = self.client.fetch_traces(
+                page=page,
+                limit=page_size,
+                name=trace_filter.name,
+                user_id=trace_filter.user_id,
+                session_id=trace_filter.session_id,
+                from_timestamp=trace_filter.from_timestamp,
+                to_timestamp=trace_filter.to_timestamp,
+                tags=trace_filter.tags or None,
+            )
+            for trace in response.data:
+                yield trace.id
+            if len(response.data) < page_size:
+                return
+            page += 1
+
+    def related_trace_ids(
+        self, trace_id: str, header: Dict[str, Any], limit: int
+    ) -> List[str]:
+        # Other traces in the same session
+        session_id = header.get("sessionId")
+        if not session_id:
+            return []
+        response = self.client.fetch_traces(session_id=session_id, limit=limit + 1)
+        return [trace.id for trace in response.data if trace.id != trace_id][:limit]
+
+    def trace_to_dict(self, trace_data: Any) -> Dict[str, Any]:
+        trace_as_dict: Dict[str, Any]
         # Langfuse SDK models can be Pydantic v1 (`dict`) or v2 (`model_dump`)
         if hasattr(trace_data, "model_dump"):
             trace_as_dict = trace_data.model_dump()
@@ -59,20 +292,88 @@ class LangfuseProvider:
             trace_as_dict = trace_data
         else:
             trace_as_dict = {"raw_trace": str(trace_data)}
-        return yaml.dump(
-            trace_as_dict,
-            sort_keys=False,
-            indent=2,
-            default_flow_style=False,
-            allow_unicode=True,
-        )
+        return trace_as_dict
+
+    def normalize_trace(self, trace_data: Any) -> str:
+        trace_as_dict = self.trace_to_dict(trace_data)
+        return self.emit_yaml(trace_as_dict)
+
+    def spans_from_trace(
+        self, trace_id: str, header: Dict[str, Any], items: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        common = {
+            "provider": self.provider_type,
+            "instance": self.name,
+            "trace_id": trace_id,
+        }
+        rows = [
+            span_row(
+                **common,
+                span_id=header.get("id") or trace_id,
+                name=header.get("name"),
+                kind="TRACE",
+                start_time=header.get("timestamp"),
+                latency_ms=(
+                    header["latency"] * 1000.0
+                    if isinstance(header.get("latency"), (int, float))
+                    else None
+                ),
+                cost=header.get("totalCost"),
+                status="ok",
+                input=header.get("input"),
+                output=header.get("output"),
+            )
+        ]
+        for observation in items:
+            usage = observation.get("usage") or {}
+            failed = observation.get("level") == "ERROR"
+            rows.append(
+                span_row(
+                    **common,
+                    span_id=observation.get("id"),
+                    parent_id=observation.get("parentObservationId")
+                    or header.get("id"),
+                    name=observation.get("name"),
+                    kind=observation.get("type"),
+                    start_time=observation.get("startTime"),
+                    end_time=observation.get("endTime"),
+                    latency_ms=latency_ms(
+                        observation.get("startTime"), observation.get("endTime")
+                    ),
+                    model=observation.get("model"),
+                    input_tokens=usage.get("input"),
+                    output_tokens=usage.get("output"),
+                    total_tokens=usage.get("total"),
+                    cost=observation.get("calculatedTotalCost"),
+                    status="error" if failed else "ok",
+                    error=observation.get("statusMessage") if failed else None,
+                    input=observation.get("input"),
+                    output=observation.get("output"),
+                )
+            )
+        if any(row["status"] == "error" for row in rows[1:]):
+            rows[0]["status"] = "error"
+        return rows
 
 
 class LangfuseProviderFactory:
+    ENV_VARS = (
+        "LANGFUSE_PUBLIC_KEYS",
+        "LANGFUSE_SECRET_KEYS",
+        "LANGFUSE_HOSTS",
+        "LANGFUSE_NAMES",
+    )
+
     @staticmethod
-    def create_providers() -> List[Tuple[str, LangfuseProvider]]:
+    def create_providers(
+        existing: Optional[Dict[str, LangfuseProvider]] = None,
+    ) -> List[Tuple[str, LangfuseProvider]]:
         """Create Langfuse providers from environment variables.
 
+        Args:
+            existing: Providers from a previous call; instances whose settings
+                are unchanged are reused instead of rebuilt
+
         Returns:
             List of tuples (name, provider) for each configured instance
         """
@@ -124,6 +425,10 @@ class LangfuseProviderFactory:
                 and secret_key
                 and secret_key != "example"
             ):
+                current = (existing or {}).get(name)
+                if current and current.config == (public_key, secret_key, host):
+                    providers.append((name, current))
+                    continue
                 provider = LangfuseProvider(public_key, secret_key, host, name)
                 providers.append((name, provider))
                 logger.info(f"Created Langfuse provider: {name}")
@@ -1,55 +1,264 @@
-import asyncio
+import json
 import logging
 import os
-from typing import Any, List, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-import yaml
-from langsmith import Client
+from .base import BaseProvider, TraceFilter
+from .connections import (
+    DEFAULT_TIMEOUT_SECONDS,
+    MAX_CONNECTIONS_PER_HOST,
+    get_requests_adapter,
+)
+from .spans import latency_ms, span_row
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DEFAULT_LANGSMITH_ENDPOINT = "https://api.smith.langchain.com"
+
+
+def configured_endpoint() -> str:
+    """The LangSmith API URL from the environment, as the SDK resolves it."""
+    return (
+        os.environ.get("LANGSMITH_ENDPOINT")
+        or os.environ.get("LANGCHAIN_ENDPOINT")
+        or DEFAULT_LANGSMITH_ENDPOINT
+    )
+
+
+class LangSmithProvider(BaseProvider):
+    provider_type = "langsmith"
+    display_name = "LangSmith"
+    children_key = "child_runs"
 
-class LangSmithProvider:
     def __init__(self, api_key: str, name: str = "default"):
-        self.name = name
+        super().__init__(name)
+        self.api_key = api_key
+        self.api_url = configured_endpoint()
         logger.info(
-            f"Initializing LangSmith provider '{name}' with API key: {api_key[:5]}xxxxx"
+            f"Configured LangSmith provider '{name}' with API key: {api_key[:5]}xxxxx"
         )
-        self.client = Client(api_key=api_key)
-
-    async def get_trace(self, trace_id: str) -> str:
-        logger.info(f"Getting trace {trace_id} from LangSmith ({self.name})")
-        try:
-            run = await asyncio.to_thread(self.client.read_run, trace_id)
-            return self.normalize_trace(run)
-        except Exception as e:
-            # Check if it's a 404 Not Found error
-            error_msg = str(e).lower()
-            if "404" in error_msg or "not found" in error_msg:
-                logger.warning(
-                    f"Trace {trace_id} not found in LangSmith instance '{self.name}'"
-                )
-                return f"Trace not found in {self.name}: {trace_id}"
-            else:
-                # For other errors, log them but still return a user-friendly message
-                logger.error(
-                    f"Error fetching trace from LangSmith ({self.name}): {str(e)}"
-                )
-                return f"Error fetching trace from {self.name}: {str(e)}"
+
+    @property
+    def config(self) -> Tuple[str, ...]:
+        return (self.api_key, self.api_url)
+
+    @property
+    def endpoint(self) -> str:
+        return self.api_url
+
+    def _shared_adapter(self) -> Any:
+        def create() -> Any:
+            # Plain requests/urllib3, so warm-up does not import the SDK; the
+            # retries match the SDK's defaults
+            from requests.adapters import HTTPAdapter
+            from urllib3.util import Retry
+
+            return HTTPAdapter(
+                pool_maxsize=MAX_CONNECTIONS_PER_HOST,
+                max_retries=Retry(
+                    total=3,
+                    status_forcelist=[408, 425, 502, 503, 504],
+                    backoff_factor=0.5,
+                    allowed_methods=None,
+                    raise_on_redirect=False,
+                    raise_on_status=False,
+                    respect_retry_after_header=True,
+                ),
+            )
+
+        return get_requests_adapter(self.api_url, create)
+
+    def _create_client(self) -> Any:
+        # Imported here: the SDK is slow to import
+        from langsmith import Client
+
+        logger.info(f"Initializing LangSmith client for '{self.name}'")
+        # Client mounts a new adapter on its session; replace it with the
+        # shared one. The session stays per client, as the SDK closes it.
+        # Runs are only read, so no background tracing thread is needed
+        client = Client(
+            api_key=self.api_key, api_url=self.api_url, auto_batch_tracing=False
+        )
+        adapter = self._shared_adapter()
+        client.session.mount("https://", adapter)
+        client.session.mount("http://", adapter)
+        return client
+
+    def _close_client(self, client: Any) -> None:
+        import requests.adapters
+
+        client.cleanup()
+        # Closing the session would close every mounted adapter's pool
+        for prefix in ("https://", "http://"):
+            client.session.mount(prefix, requests.adapters.HTTPAdapter())
+
+    def warm_up(self) -> None:
+        import requests
+
+        # Not closed: that would close the shared adapter's pool
+        session = requests.Session()
+        session.mount(self.api_url, self._shared_adapter())
+        session.head(self.api_url, timeout=DEFAULT_TIMEOUT_SECONDS)
+
+    def _fetch_trace(self, trace_id: str, timeout: Optional[float] = None) -> Any:
+        if timeout is None:
+            return self.client.read_run(trace_id)
+        # read_run has no timeout option; make the same request with one
+        from langsmith import schemas
+
+        response = self.client.request_with_retries(
+            "GET", f"/runs/{trace_id}", request_kwargs={"timeout": timeout}
+        )
+        return schemas.Run(**response.json(), _host_url=self.client._host_url)
+
+    def _fetch_trace_parts(
+        self, trace_id: str, timeout: Optional[float] = None
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        # Child runs come from a second request, so record both together
+        parts: Tuple[Dict[str, Any], List[Dict[str, Any]]] = self._recorded(
+            "parts", trace_id, lambda: self._fetch_run_tree(trace_id, timeout)
+        )
+        return parts
+
+    def complete_trace_parts(
+        self, trace_id: str, header: Dict[str, Any], items: List[Dict[str, Any]]
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        if items:
+            return header, items
+        # get_trace reads the root run only; child runs need the full tree
+        return self._fetch_trace_parts(trace_id, self.request_timeout)
+
+    def _fetch_run_tree(
+        self, trace_id: str, timeout: Optional[float] = None
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        root = self._fetch_trace(trace_id, timeout)
+        root_as_dict = self.trace_to_dict(root)
+        root_as_dict.pop("child_runs", None)
+        child_runs = [
+            self.trace_to_dict(run)
+            for run in self.client.list_runs(trace_id=root.trace_id)
+            if str(run.id) != str(root.id)
+        ]
+        return root_as_dict, child_runs
+
+    def iter_trace_ids(
+        self, trace_filter: TraceFilter, page_size: int = 50
+    ) -> Iterator[str]:
+        if not trace_filter.project:
+            raise ValueError("Listing LangSmith traces requires a project name")
+        conditions = []
+        if trace_filter.name:
+            conditions.append(f"eq(name, {json.dumps(trace_filter.name)})")
+        if trace_filter.to_timestamp:
+            until = trace_filter.to_timestamp.isoformat()
+            conditions.append(f"lt(start_time, {json.dumps(until)})")
+        for tag in trace_filter.tags:
+            conditions.append(f"has(tags, {json.dumps(tag)})")
+        run_filter = None
+        if len(conditions) == 1:
+            run_filter = conditions[0]
+        elif conditions:
+            run_filter = f"and({', '.join(conditions)})"
+        runs = self.client.list_runs(
+            project_name=trace_filter.project,
+            is_root=True,
+            start_time=trace_filter.from_timestamp,
+            filter=run_filter,
+            # Only the fields the Run model requires; the SDK pages by cursor
+            select=["id", "name", "start_time", "run_type", "trace_id"],
+        )
+        for run in runs:
+            yield str(run.id)
+
+    def related_trace_ids(
+        self, trace_id: str, header: Dict[str, Any], limit: int
+    ) -> List[str]:
+        # The parent run and the direct child runs
+        related = []
+        if header.get("parent_run_id"):
+            related.append(str(header["parent_run_id"]))
+        children = self.client.list_runs(
+            parent_run_id=trace_id,
+            select=["id", "name", "start_time", "run_type", "trace_id"],
+            limit=limit,
+        )
+        related.extend(str(run.id) for run in children)
+        return related[:limit]
+
+    def trace_to_dict(self, run: Any) -> Dict[str, Any]:
+        if isinstance(run, dict):
+            return run
+        run_as_dict: Dict[str, Any] = run.dict()
+        return run_as_dict
 
     def normalize_trace(self, run: Any) -> str:
-        trace_as_dict = run.dict()
-        return yaml.dump(
-            trace_as_dict, sort_keys=False, indent=2, default_flow_style=False
+        trace_as_dict = self.trace_to_dict(run)
+        return self.emit_yaml(trace_as_dict)
+
+    @staticmethod
+    def _model_name(run: Dict[str, Any]) -> Optional[str]:
+        extra = run.get("extra") or {}
+        metadata = extra.get("metadata") or {}
+        params = extra.get("invocation_params") or {}
+        model = (
+            metadata.get("ls_model_name")
+            or params.get("model")
+            or params.get("model_name")
         )
+        return str(model) if model else None
+
+    def spans_from_trace(
+        self, trace_id: str, header: Dict[str, Any], items: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        rows = []
+        for run in [header, *items]:
+            rows.append(
+                span_row(
+                    provider=self.provider_type,
+                    instance=self.name,
+                    trace_id=str(run.get("trace_id") or trace_id),
+                    span_id=str(run.get("id")),
+                    parent_id=(
+                        str(run["parent_run_id"]) if run.get("parent_run_id") else None
+                    ),
+                    name=run.get("name"),
+                    kind=run.get("run_type"),
+                    start_time=run.get("start_time"),
+                    end_time=run.get("end_time"),
+                    latency_ms=latency_ms(run.get("start_time"), run.get("end_time")),
+                    model=self._model_name(run),
+                    input_tokens=run.get("prompt_tokens"),
+                    output_tokens=run.get("completion_tokens"),
+                    total_tokens=run.get("total_tokens"),
+                    cost=run.get("total_cost"),
+                    status="error" if run.get("error") else "ok",
+                    error=run.get("error"),
+                    input=run.get("inputs"),
+                    output=run.get("outputs"),
+                )
+            )
+        return rows
 
 
 class LangSmithProviderFactory:
+    ENV_VARS = (
+        "LANGSMITH_API_KEYS",
+        "LANGSMITH_NAMES",
+        "LANGSMITH_ENDPOINT",
+        "LANGCHAIN_ENDPOINT",
+    )
+
     @staticmethod
-    def create_providers() -> List[Tuple[str, LangSmithProvider]]:
+    def create_providers(
+        existing: Optional[Dict[str, LangSmithProvider]] = None,
+    ) -> List[Tuple[str, LangSmithProvider]]:
         """Create LangSmith providers from environment variables.
 
+        Args:
+            existing: Providers from a previous call; instances whose settings
+                are unchanged are reused instead of rebuilt
+
         Returns:
             List of tuples (name, provider) for each configured instance
         """
@@ -75,8 +284,13 @@ class LangSmithProviderFactory:
             names = [f"instance{i+1}" for i in range(len(api_keys))]
 
         # Create providers
+        api_url = configured_endpoint()
         for api_key, name in zip(api_keys, names):
             if api_key and api_key != "example":
+                current = (existing or {}).get(name)
+                if current and current.config == (api_key, api_url):
+                    providers.append((name, current))
+                    continue
                 provider = LangSmithProvider(api_key, name)
                 providers.append((name, provider))
                 logger.info(f"Created LangSmith provider: {name}")
@@ -0,0 +1,327 @@
+"""OpenTelemetry spans received locally over OTLP/HTTP.
+
+Services export spans to the receiver in ``server.otlp_receiver``, which adds
+them to an :class:`OtlpSpanStore`. The store keeps the most recent spans in a
+ring buffer with a trace-ID index, so :class:`OtlpProvider` answers get_trace
+from memory without an upstream call. Spans pushed out of the ring can be
+kept in a SQLite file instead of being dropped.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from .base import BaseProvider, TraceFilter
+from .spans import latency_ms, span_row, to_datetime, to_number
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OTLP_PORT = 4318
+DEFAULT_MAX_SPANS = 100_000
+
+# OTLP enum values, by their protobuf numbers
+SPAN_KINDS = ("UNSPECIFIED", "INTERNAL", "SERVER", "CLIENT", "PRODUCER", "CONSUMER")
+STATUS_CODES = ("UNSET", "OK", "ERROR")
+
+_SPILL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS spans (trace_id TEXT NOT NULL, span TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS spans_trace_id ON spans (trace_id);
+"""
+
+
+def _any_value(value: Dict[str, Any]) -> Any:
+    """Convert an OTLP JSON ``AnyValue`` to a Python value."""
+    if "stringValue" in value:
+        return value["stringValue"]
+    if "intValue" in value:
+        # 64-bit integers are encoded as strings in OTLP JSON
+        return int(value["intValue"])
+    if "doubleValue" in value:
+        return float(value["doubleValue"])
+    if "boolValue" in value:
+        return bool(value["boolValue"])
+    if "arrayValue" in value:
+        return [_any_value(item) for item in value["arrayValue"].get("values", [])]
+    if "kvlistValue" in value:
+        return _attributes(value["kvlistValue"].get("values", []))
+    if "bytesValue" in value:
+        return value["bytesValue"]
+    return None
+
+
+def _attributes(key_values: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {kv["key"]: _any_value(kv.get("value") or {}) for kv in key_values}
+
+
+def _timestamp(nanos: Any) -> Optional[str]:
+    if nanos in (None, "", 0, "0"):
+        return None
+    seconds, remainder = divmod(int(nanos), 1_000_000_000)
+    moment = datetime.fromtimestamp(seconds, tz=timezone.utc)
+    return moment.replace(microsecond=remainder // 1000).isoformat()
+
+
+def _enum_name(value: Any, names: Tuple[str, ...], prefix: str) -> str:
+    if isinstance(value, int) and 0 <= value < len(names):
+        return names[value]
+    if isinstance(value, str):
+        return value.removeprefix(prefix)
+    return names[0]
+
+
+def spans_from_otlp_json(request: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Flatten an OTLP/JSON ``ExportTraceServiceRequest`` into span dicts."""
+    spans = []
+    for resource_spans in request.get("resourceSpans") or []:
+        resource = _attributes(
+            (resource_spans.get("resource") or {}).get("attributes") or []
+        )
+        for scope_spans in resource_spans.get("scopeSpans") or []:
+            scope = (scope_spans.get("scope") or {}).get("name")
+            for span in scope_spans.get("spans") or []:
+                status = span.get("status") or {}
+                spans.append(
+                    {
+                        "traceId": span.get("traceId", "").lower(),
+                        # Keyed like other providers' items so watch_trace can diff them
+                        "id": span.get("spanId", "").lower(),
+                        "parentSpanId": span.get("parentSpanId", "").lower() or None,
+                        "name": span.get("name"),
+                        "kind": _enum_name(span.get("kind"), SPAN_KINDS, "SPAN_KIND_"),
+                        "startTime": _timestamp(span.get("startTimeUnixNano")),
+                        "endTime": _timestamp(span.get("endTimeUnixNano")),
+                        "status": _enum_name(
+                            status.get("code"), STATUS_CODES, "STATUS_CODE_"
+                        ),
+                        "statusMessage": status.get("message") or None,
+                        "attributes": _attributes(span.get("attributes") or []),
+                        "events": [
+                            {
+                                "name": event.get("name"),
+                                "time": _timestamp(event.get("timeUnixNano")),
+                                "attributes": _attributes(
+                                    event.get("attributes") or []
+                                ),
+                            }
+                            for event in span.get("events") or []
+                        ],
+                        "service": resource.get("service.name"),
+                        "scope": scope,
+                        "resource": resource,
+                    }
+                )
+    return spans
+
+
+class OtlpSpanStore:
+    """Ring buffer of recent spans with a trace-ID index.
+
+    Args:
+        max_spans: Spans kept in memory; the oldest are evicted first
+        spill_path: SQLite file that receives evicted spans, so their traces
+            stay readable; None drops them
+    """
+
+    def __init__(
+        self, max_spans: int = DEFAULT_MAX_SPANS, spill_path: Optional[str] = None
+    ):
+        self.max_spans = max_spans
+        self._lock = threading.Lock()
+        # Arrival order across all traces, and per trace
+        self._ring: Deque[Tuple[str, Dict[str, Any]]] = deque()
+        self._by_trace: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._spill: Optional[sqlite3.Connection] = None
+        if spill_path:
+            self._spill = sqlite3.connect(spill_path, check_same_thread=False)
+            self._spill.executescript(_SPILL_SCHEMA)
+        self.received_count = 0
+        self.evicted_count = 0
+
+    def __len__(self) -> int:
+        return len(self._ring)
+
+    def add(self, spans: List[Dict[str, Any]]) -> None:
+        evicted = []
+        with self._lock:
+            for span in spans:
+                trace_id = span["traceId"]
+                self._ring.append((trace_id, span))
+                self._by_trace.setdefault(trace_id, deque()).append(span)
+            self.received_count += len(spans)
+            while len(self._ring) > self.max_spans:
+                trace_id, span = self._ring.popleft()
+                # The oldest span overall is also the oldest of its trace
+                trace_spans = self._by_trace[trace_id]
+                trace_spans.popleft()
+                if not trace_spans:
+                    del self._by_trace[trace_id]
+                evicted.append((trace_id, span))
+            self.evicted_count += len(evicted)
+            if evicted and self._spill is not None:
+                self._spill.executemany(
+                    "INSERT INTO spans (trace_id, span) VALUES (?, ?)",
+                    [(trace_id, json.dumps(span)) for trace_id, span in evicted],
+                )
+                self._spill.commit()
+
+    def get(self, trace_id: str) -> List[Dict[str, Any]]:
+        """All stored spans of a trace, ordered by start time."""
+        trace_id = trace_id.lower()
+        with self._lock:
+            spans = list(self._by_trace.get(trace_id, ()))
+            if self._spill is not None:
+                rows = self._spill.execute(
+                    "SELECT span FROM spans WHERE trace_id = ?", (trace_id,)
+                ).fetchall()
+                spans = [json.loads(row[0]) for row in rows] + spans
+        spans.sort(key=lambda span: span.get("startTime") or "")
+        return spans
+
+    def trace_ids(self) -> List[str]:
+        """IDs of traces with spans in memory, most recently received first."""
+        with self._lock:
+            return list(reversed(self._by_trace))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "spans": len(self._ring),
+                "max_spans": self.max_spans,
+                "traces": len(self._by_trace),
+                "received": self.received_count,
+                "evicted": self.evicted_count,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._spill is not None:
+                self._spill.close()
+                self._spill = None
+
+
+class OtlpProvider(BaseProvider):
+    """Serves traces from spans received by the local OTLP receiver."""
+
+    provider_type = "otlp"
+    display_name = "OTLP"
+    children_key = "spans"
+
+    def __init__(
+        self,
+        store: OtlpSpanStore,
+        name: str = "local",
+        port: int = DEFAULT_OTLP_PORT,
+    ):
+        super().__init__(name)
+        self.store = store
+        self.port = port
+
+    @property
+    def config(self) -> Tuple[str, ...]:
+        return (str(self.port),)
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def _create_client(self) -> Any:
+        return self.store
+
+    def _fetch_trace(self, trace_id: str, timeout: Optional[float] = None) -> Any:
+        spans = self.store.get(trace_id)
+        if not spans:
+            raise LookupError(f"Trace {trace_id} not found in the local OTLP store")
+        parent_ids = {span["id"] for span in spans}
+        roots = [span for span in spans if span["parentSpanId"] not in parent_ids]
+        root = roots[0] if roots else spans[0]
+        end_times = [span["endTime"] for span in spans if span["endTime"]]
+        return {
+            "id": trace_id.lower(),
+            "name": root["name"],
+            "service": root["service"],
+            "startTime": spans[0]["startTime"],
+            "endTime": max(end_times) if end_times else None,
+            "spanCount": len(spans),
+            "spans": spans,
+        }
+
+    def trace_to_dict(self, trace_data: Any) -> Dict[str, Any]:
+        trace_as_dict: Dict[str, Any] = trace_data
+        return trace_as_dict
+
+    def normalize_trace(self, trace_data: Any) -> str:
+        return self.emit_yaml(self.trace_to_dict(trace_data))
+
+    def iter_trace_ids(
+        self, trace_filter: TraceFilter, page_size: int = 50
+    ) -> Iterator[str]:
+        for trace_id in self.store.trace_ids():
+            if self._matches(trace_id, trace_filter):
+                yield trace_id
+
+    def _matches(self, trace_id: str, trace_filter: TraceFilter) -> bool:
+        # Tags, sessions, users and projects are not OTLP concepts
+        if not (
+            trace_filter.name
+            or trace_filter.from_timestamp
+            or trace_filter.to_timestamp
+        ):
+            return True
+        try:
+            header = self._fetch_trace(trace_id)
+        except LookupError:
+            return False
+        if trace_filter.name and header["name"] != trace_filter.name:
+            return False
+        started = to_datetime(header["startTime"])
+        if started is None:
+            return not (trace_filter.from_timestamp or trace_filter.to_timestamp)
+        if trace_filter.from_timestamp and started < trace_filter.from_timestamp:
+            return False
+        if trace_filter.to_timestamp and started >= trace_filter.to_timestamp:
+            return False
+        return True
+
+    def spans_from_trace(
+        self, trace_id: str, header: Dict[str, Any], items: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        rows = []
+        for span in items:
+            attributes = span.get("attributes") or {}
+            failed = span.get("status") == "ERROR"
+            input_tokens = to_number(attributes.get("gen_ai.usage.input_tokens"))
+            output_tokens = to_number(attributes.get("gen_ai.usage.output_tokens"))
+            rows.append(
+                span_row(
+                    provider=self.provider_type,
+                    instance=self.name,
+                    trace_id=trace_id,
+                    span_id=span.get("id"),
+                    parent_id=span.get("parentSpanId"),
+                    name=span.get("name"),
+                    kind=span.get("kind"),
+                    start_time=span.get("startTime"),
+                    end_time=span.get("endTime"),
+                    latency_ms=latency_ms(span.get("startTime"), span.get("endTime")),
+                    model=attributes.get("gen_ai.response.model")
+                    or attributes.get("gen_ai.request.model"),
+                    input_tokens=input_tokens,
+                    output_tokens=output_tokens,
+                    total_tokens=(
+                        input_tokens + output_tokens
+                        if input_tokens is not None and output_tokens is not None
+                        else None
+                    ),
+                    status="error" if failed else "ok",
+                    error=span.get("statusMessage") if failed else None,
+                )
+            )
+        return rows
+
+    def close(self) -> None:
+        # The store outlives the provider; the receiver keeps writing to it
+        self.executor.shutdown()
@@ -0,0 +1,191 @@
+"""Spilling of very large trace values to disk.
+
+A single input or output (a retrieved document, a base64 image) can be tens of
+megabytes. Rather than copying it into every YAML response, values at least
+``threshold`` characters long are written to a spill directory and replaced
+with a small stub holding a handle, the size and a preview. The full value is
+read back in byte ranges with :meth:`PayloadStore.read`.
+
+Handles are content hashes, so the same payload is stored once, and both
+transport processes can share one directory and serve each other's handles.
+The default directory is per user, and an existing directory is only used if
+the current user owns it (and, for the default one, nobody else can access it).
+"""
+
+import getpass
+import hashlib
+import logging
+import os
+import re
+import stat
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Values at least this many characters long are spilled
+DEFAULT_SPILL_THRESHOLD = 256 * 1024
+# Spill files are evicted oldest-first when the directory grows past this
+DEFAULT_MAX_SPILL_BYTES = 1024 * 1024 * 1024
+PREVIEW_CHARS = 500
+DEFAULT_READ_BYTES = 64 * 1024
+MAX_READ_BYTES = 1024 * 1024
+
+_HANDLE_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+def default_spill_dir() -> str:
+    # Per user: the temp dir is shared, and its names are predictable
+    user = os.getuid() if hasattr(os, "getuid") else getpass.getuser()
+    return os.path.join(tempfile.gettempdir(), f"tracenexus-payloads-{user}")
+
+
+def _check_spill_dir(directory: str, private: bool) -> None:
+    """Refuse a directory another user could read from or plant files in.
+
+    Raises:
+        PermissionError: If the directory is a symlink, is owned by another
+            user or, when `private`, is accessible by group or others
+    """
+    if not hasattr(os, "getuid"):
+        return
+    info = os.lstat(directory)
+    problem = None
+    if not stat.S_ISDIR(info.st_mode):
+        problem = "is not a directory"
+    elif info.st_uid != os.getuid():
+        problem = "is owned by another user"
+    elif private and info.st_mode & 0o077:
+        problem = "is accessible by other users"
+    if problem:
+        raise PermissionError(
+            f"Payload directory {directory} {problem}; "
+            "remove it or choose another with --payload-dir"
+        )
+
+
+def _is_continuation(byte: int) -> bool:
+    return byte & 0xC0 == 0x80
+
+
+class PayloadStore:
+    """Content-addressed spill files for oversized trace values.
+
+    Args:
+        directory: Where spill files are written; created if missing. None
+            uses a per-user directory in the system temp dir
+        threshold: Minimum length in characters of a spilled string
+        max_bytes: Disk budget for the directory
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        threshold: int = DEFAULT_SPILL_THRESHOLD,
+        max_bytes: int = DEFAULT_MAX_SPILL_BYTES,
+    ):
+        self.directory = directory or default_spill_dir()
+        self.threshold = threshold
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.spilled_count = 0
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        _check_spill_dir(self.directory, private=directory is None)
+
+    def spill_large_values(self, value: Any) -> Any:
+        """Replace large strings in a plain (JSON-typed) value with stubs."""
+        if isinstance(value, str):
+            if len(value) >= self.threshold:
+                return self.spill(value)
+            return value
+        if isinstance(value, dict):
+            return {key: self.spill_large_values(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [self.spill_large_values(item) for item in value]
+        return value
+
+    def spill(self, text: str) -> Dict[str, Any]:
+        """Write `text` to the spill directory and return its stub."""
+        data = text.encode("utf-8")
+        handle = hashlib.blake2b(data, digest_size=16).hexdigest()
+        path = self._path(handle)
+        with self._lock:
+            if os.path.exists(path):
+                # Refresh the mtime so eviction treats it as recently used
+                os.utime(path)
+            else:
+                self._evict(len(data))
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+                self.spilled_count += 1
+                logger.debug(f"Spilled {len(data)} byte payload to {path}")
+        return {
+            "payload_handle": handle,
+            "size_bytes": len(data),
+            "preview": text[:PREVIEW_CHARS],
+            "note": "Truncated; read the rest with get_trace_payload",
+        }
+
+    def read(
+        self, handle: str, offset: int = 0, length: int = DEFAULT_READ_BYTES
+    ) -> Dict[str, Any]:
+        """Read up to `length` bytes of a spilled payload from `offset`.
+
+        Range ends are moved to UTF-8 character boundaries, so reading again
+        from `next_offset` continues without losing or splitting characters.
+        """
+        if not _HANDLE_PATTERN.match(handle):
+            raise ValueError(f"Invalid payload handle: {handle}")
+        if offset < 0 or length <= 0:
+            raise ValueError("offset must be >= 0 and length must be > 0")
+        length = min(length, MAX_READ_BYTES)
+        try:
+            f = open(self._path(handle), "rb")
+        except FileNotFoundError:
+            raise ValueError(
+                f"Payload {handle} not found; it may have been evicted, "
+                "fetch the trace again for a new handle"
+            ) from None
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            f.seek(offset)
+            # Up to 3 extra bytes complete a character cut off at the end
+            chunk = f.read(length + 3)
+        start = 0
+        while start < len(chunk) and _is_continuation(chunk[start]):
+            start += 1
+        end = max(min(length, len(chunk)), start)
+        while start < end < len(chunk) and _is_continuation(chunk[end]):
+            end += 1
+        next_offset = offset + end
+        return {
+            "payload_handle": handle,
+            "size_bytes": size,
+            "offset": offset + start,
+            "next_offset": next_offset if next_offset < size else None,
+            "data": chunk[start:end].decode("utf-8", errors="replace"),
+        }
+
+    def _path(self, handle: str) -> str:
+        return os.path.join(self.directory, handle)
+
+    def _evict(self, incoming: int) -> None:
+        entries = []
+        total = incoming
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and _HANDLE_PATTERN.match(entry.name):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
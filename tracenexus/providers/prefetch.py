@@ -0,0 +1,105 @@
+"""Speculative prefetching of traces related to the one just fetched.
+
+After a trace is returned, traces that are likely to be requested next (other
+traces in the same Langfuse session, the parent and child LangSmith runs) are
+fetched in the background into the provider's ``prefetched`` cache, where
+``get_trace`` finds them. Each prefetched copy is served once, so a trace that
+is still running is not returned as an old snapshot repeatedly.
+
+Prefetching never competes with foreground requests: it runs on the
+instance's listener threads, not its request workers or the event loop's
+default executor; each provider runs at most one prefetch at a time (further
+triggers are dropped, not queued), and the prefetch pauses while the provider
+has calls in flight and gives up when they do not finish soon.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Set
+
+from .cache import ExpiringCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PREFETCH_TTL_SECONDS = 300.0
+DEFAULT_MAX_RELATED = 10
+# How long a prefetch waits for foreground calls to finish before giving up
+MAX_YIELD_SECONDS = 5.0
+_YIELD_INTERVAL_SECONDS = 0.05
+
+
+class Prefetcher:
+    """Trace listener that prefetches related traces within a budget.
+
+    Args:
+        ttl: Seconds a prefetched trace is kept for its first lookup
+        max_related: Maximum related traces fetched per trigger
+    """
+
+    def __init__(
+        self,
+        ttl: float = DEFAULT_PREFETCH_TTL_SECONDS,
+        max_related: int = DEFAULT_MAX_RELATED,
+    ):
+        self.ttl = ttl
+        self.max_related = max_related
+        self._lock = threading.Lock()
+        self._running: Set[int] = set()
+        # Traces whose related traces were already looked up
+        self._expanded = ExpiringCache(max_entries=1024)
+        self.prefetched_count = 0
+        self.dropped_count = 0
+
+    def listener(
+        self,
+        provider: Any,
+        trace_id: str,
+        header: Dict[str, Any],
+        items: List[Dict[str, Any]],
+    ) -> None:
+        if provider.retired or trace_id in self._expanded:
+            return
+        key = id(provider)
+        with self._lock:
+            if key in self._running:
+                self.dropped_count += 1
+                return
+            self._running.add(key)
+        try:
+            self._expanded.put(trace_id, True, self.ttl)
+            related = provider.related_trace_ids(trace_id, header, self.max_related)
+            self._prefetch(provider, related)
+        finally:
+            with self._lock:
+                self._running.discard(key)
+
+    def _prefetch(self, provider: Any, trace_ids: List[str]) -> None:
+        for trace_id in trace_ids:
+            if trace_id in provider.prefetched:
+                continue
+            if not self._wait_for_idle(provider):
+                logger.debug(f"Prefetch for {provider.name} yielded to foreground")
+                return
+            try:
+                trace_as_dict = provider.fetch_trace_dict(
+                    trace_id, provider.request_timeout
+                )
+            except Exception as e:
+                logger.debug(f"Prefetch of trace {trace_id} failed: {e}")
+                continue
+            provider.prefetched.put(trace_id, trace_as_dict, self.ttl)
+            self._expanded.put(trace_id, True, self.ttl)
+            self.prefetched_count += 1
+            logger.debug(f"Prefetched trace {trace_id} from {provider.name}")
+
+    @staticmethod
+    def _wait_for_idle(provider: Any) -> bool:
+        deadline = time.monotonic() + MAX_YIELD_SECONDS
+        while not provider.retired:
+            if provider.in_flight == 0:
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(_YIELD_INTERVAL_SECONDS)
+        return False
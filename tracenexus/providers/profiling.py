@@ -0,0 +1,369 @@
+"""On-demand profiling of individual get_trace calls.
+
+A profiled call is split into phases: ``fetch`` (SDK request and conversion to
+a dict, in a worker thread) and ``emit`` (YAML emission, on the event loop).
+Two modes are available:
+
+- ``sample``: a background thread records the stacks of the threads running a
+  profiled phase every few milliseconds. Cheap enough to leave on for a
+  fraction of production calls. Each call is written as folded stacks
+  (``phase;module:function;... count``), and the last calls of each process
+  are summed into ``aggregate-<pid>.folded``, ready for flamegraph.pl or
+  speedscope.
+- ``cprofile``: deterministic cProfile of each phase, written as one pstats
+  file per call. Precise but slow; one call is profiled at a time.
+
+Both transport processes write to the same directory. The on/off state, mode,
+rate and trace filter live in ``control.json`` there, so changing them from
+either process (see ``TraceNexusServer.profiling_endpoint``) reaches both
+within a second.
+"""
+
+import cProfile
+import json
+import logging
+import os
+import pstats
+import queue
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from types import FrameType
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("sample", "cprofile")
+DEFAULT_SAMPLE_INTERVAL_SECONDS = 0.005
+# Profiled calls summed into each process's aggregate flame graph
+ROLLING_CALLS = 500
+# Per-call profile files kept per process; the oldest are removed first
+MAX_CALL_FILES = 1000
+CONTROL_FILE = "control.json"
+_CONTROL_POLL_SECONDS = 1.0
+_AGGREGATE_WRITE_SECONDS = 5.0
+_MAX_INDEX_BYTES = 16 * 1024 * 1024
+
+
+def _frame_name(frame: FrameType) -> str:
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{frame.f_code.co_name}"
+
+
+def _fold(frame: Optional[FrameType], base: Optional[FrameType]) -> str:
+    """The stack from below `base` down to `frame`, root first."""
+    names = []
+    while frame is not None and frame is not base:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class _Sampler:
+    """Samples registered threads' stacks while any are registered."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._active: Dict[int, Tuple["CallProfile", str, Optional[FrameType]]] = {}
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(
+        self, call: "CallProfile", phase: str, base: Optional[FrameType]
+    ) -> None:
+        with self._lock:
+            self._active[threading.get_ident()] = (call, phase, base)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="tracenexus-sampler", daemon=True
+                )
+                self._thread.start()
+            self._wake.set()
+
+    def unregister(self) -> None:
+        with self._lock:
+            self._active.pop(threading.get_ident(), None)
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait()
+            time.sleep(self.interval)
+            # Under the lock, so no sample lands after a phase unregisters
+            with self._lock:
+                if not self._active:
+                    self._wake.clear()
+                    continue
+                frames = sys._current_frames()
+                for thread_id, (call, phase, base) in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        call.samples[f"{phase};{_fold(frame, base)}"] += 1
+                del frames
+
+
+class CallProfile:
+    """Profile data of one get_trace call, filled in phase by phase."""
+
+    def __init__(
+        self, profiler: "CallProfiler", mode: str, provider: Any, trace_id: str
+    ):
+        self.profiler = profiler
+        self.mode = mode
+        self.provider_type = provider.provider_type
+        self.instance = provider.name
+        self.trace_id = trace_id
+        self.started = time.time()
+        self.phase_seconds: Dict[str, float] = {}
+        self.samples: Counter[str] = Counter()
+        self.profiles: List[cProfile.Profile] = []
+        self.output_bytes: Optional[int] = None
+
+    def run(self, phase: str, func: Callable[..., Any], *args: Any) -> Any:
+        """Call `func` under this profile, attributing the time to `phase`."""
+        started = time.perf_counter()
+        try:
+            if self.mode == "cprofile":
+                profile = cProfile.Profile()
+                self.profiles.append(profile)
+                return profile.runcall(func, *args)
+            self.profiler.sampler.register(self, phase, sys._getframe())
+            try:
+                return func(*args)
+            finally:
+                self.profiler.sampler.unregister()
+        finally:
+            self.phase_seconds[phase] = self.phase_seconds.get(phase, 0.0) + (
+                time.perf_counter() - started
+            )
+
+    def finish(self, outcome: str) -> None:
+        """Hand the profile to the profiler's writer."""
+        self.profiler.finish(self, outcome)
+
+
+class CallProfiler:
+    """Decides which calls to profile and writes their profiles to `directory`.
+
+    Args:
+        directory: Output directory, shared by both transport processes
+        mode: "sample" or "cprofile"
+        rate: Fraction of get_trace calls profiled
+        enabled: Whether profiling starts switched on
+        interval: Seconds between stack samples in sample mode
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        mode: str = "sample",
+        rate: float = 1.0,
+        enabled: bool = True,
+        interval: float = DEFAULT_SAMPLE_INTERVAL_SECONDS,
+    ):
+        self.directory = directory
+        self.calls_directory = os.path.join(directory, "calls")
+        os.makedirs(self.calls_directory, exist_ok=True)
+        self.sampler = _Sampler(interval)
+        self.profiled_count = 0
+        self.skipped_count = 0
+        self._state: Dict[str, Any] = {}
+        self._control_mtime = 0.0
+        self._control_checked = 0.0
+        self._cprofile_lock = threading.Lock()
+        self._window: Deque[Counter[str]] = deque()
+        self._aggregate: Counter[str] = Counter()
+        self._aggregate_written = 0.0
+        self._writes: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self.update(enabled=enabled, mode=mode, rate=rate, trace_ids=[])
+
+    def state(self) -> Dict[str, Any]:
+        self._refresh()
+        return dict(self._state)
+
+    def update(self, **changes: Any) -> Dict[str, Any]:
+        """Validate and apply state changes, and share them with other processes.
+
+        Raises:
+            ValueError: An unknown setting or an invalid value
+        """
+        self._refresh(force=True)
+        state = {**self._state, **changes}
+        unknown = set(state) - {"enabled", "mode", "rate", "trace_ids"}
+        if unknown:
+            raise ValueError(f"Unknown profiling settings: {sorted(unknown)}")
+        if state["mode"] not in PROFILE_MODES:
+            raise ValueError(f"Profiling mode must be one of {PROFILE_MODES}")
+        rate = float(state["rate"])
+        if not 0.0 <= rate <= 1.0:
+            raise ValueError("Profiling rate must be between 0 and 1")
+        trace_ids = state["trace_ids"] or []
+        if isinstance(trace_ids, str):
+            trace_ids = [trace_ids]
+        self._state = {
+            "enabled": bool(state["enabled"]),
+            "mode": state["mode"],
+            "rate": rate,
+            "trace_ids": [str(trace_id) for trace_id in trace_ids],
+        }
+        path = os.path.join(self.directory, CONTROL_FILE)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as control:
+            json.dump(self._state, control)
+        os.replace(temporary, path)
+        self._control_mtime = os.stat(path).st_mtime
+        logger.info(f"Profiling settings: {self._state}")
+        return dict(self._state)
+
+    def _refresh(self, force: bool = False) -> None:
+        """Pick up settings changed by the other process, at most once a second."""
+        now = time.monotonic()
+        if not force and now - self._control_checked < _CONTROL_POLL_SECONDS:
+            return
+        self._control_checked = now
+        path = os.path.join(self.directory, CONTROL_FILE)
+        try:
+            mtime = os.stat(path).st_mtime
+            if mtime == self._control_mtime:
+                return
+            with open(path, encoding="utf-8") as control:
+                self._state = json.load(control)
+            self._control_mtime = mtime
+        except (OSError, ValueError) as e:
+            logger.debug(f"Could not read profiling settings: {e}")
+
+    def start(self, provider: Any, trace_id: str) -> Optional[CallProfile]:
+        """Return a profile for this call if it is selected, else None."""
+        self._refresh()
+        state = self._state
+        if not state["enabled"]:
+            return None
+        if state["trace_ids"]:
+            if trace_id not in state["trace_ids"]:
+                return None
+        elif random.random() >= state["rate"]:
+            return None
+        if state["mode"] == "cprofile" and not self._cprofile_lock.acquire(
+            blocking=False
+        ):
+            # cProfile is slow; never profile two calls at once
+            self.skipped_count += 1
+            return None
+        self.profiled_count += 1
+        return CallProfile(self, state["mode"], provider, trace_id)
+
+    def finish(self, call: CallProfile, outcome: str) -> None:
+        if call.mode == "cprofile":
+            self._cprofile_lock.release()
+        self._submit(lambda: self._write_call(call, outcome))
+
+    def flush(self) -> None:
+        """Write pending profiles and the aggregate now; blocks until done."""
+        done = threading.Event()
+
+        def write() -> None:
+            try:
+                self._write_aggregate()
+            finally:
+                done.set()
+
+        self._submit(write)
+        done.wait()
+
+    def _submit(self, write: Callable[[], Any]) -> None:
+        # Files are written off the event loop, in call order
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._write_loop, name="tracenexus-profiles", daemon=True
+                )
+                self._writer.start()
+        self._writes.put(write)
+
+    def _write_loop(self) -> None:
+        while True:
+            write = self._writes.get()
+            try:
+                write()
+            except Exception as e:
+                logger.warning(f"Could not write profile: {e}")
+
+    def _write_call(self, call: CallProfile, outcome: str) -> None:
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(call.started))
+        safe_id = re.sub(r"[^A-Za-z0-9_.-]", "_", call.trace_id)[:64]
+        stem = f"{stamp}-{os.getpid()}-{call.instance}-{safe_id}"
+        path = None
+        if call.mode == "cprofile" and call.profiles:
+            path = os.path.join(self.calls_directory, f"{stem}.prof")
+            stats = pstats.Stats(call.profiles[0])
+            for profile in call.profiles[1:]:
+                stats.add(profile)
+            stats.dump_stats(path)
+        elif call.samples:
+            path = os.path.join(self.calls_directory, f"{stem}.folded")
+            with open(path, "w", encoding="utf-8") as folded:
+                for stack, count in call.samples.items():
+                    folded.write(f"{stack} {count}\n")
+            self._add_to_aggregate(call.samples)
+        self._append_index(
+            {
+                "time": stamp,
+                "pid": os.getpid(),
+                "provider": call.provider_type,
+                "instance": call.instance,
+                "trace_id": call.trace_id,
+                "mode": call.mode,
+                "outcome": outcome,
+                **{
+                    f"{phase}_ms": round(seconds * 1000, 1)
+                    for phase, seconds in call.phase_seconds.items()
+                },
+                "samples": sum(call.samples.values()),
+                "output_bytes": call.output_bytes,
+                "file": os.path.basename(path) if path else None,
+            }
+        )
+        self._remove_old_calls()
+        if time.monotonic() - self._aggregate_written >= _AGGREGATE_WRITE_SECONDS:
+            self._write_aggregate()
+
+    def _append_index(self, entry: Dict[str, Any]) -> None:
+        path = os.path.join(self.directory, "calls.jsonl")
+        try:
+            if os.path.getsize(path) > _MAX_INDEX_BYTES:
+                os.replace(path, f"{path}.1")
+        except OSError:
+            pass
+        with open(path, "a", encoding="utf-8") as index:
+            index.write(json.dumps(entry) + "\n")
+
+    def _remove_old_calls(self) -> None:
+        own = f"-{os.getpid()}-"
+        names = sorted(name for name in os.listdir(self.calls_directory) if own in name)
+        for name in names[:-MAX_CALL_FILES]:
+            try:
+                os.remove(os.path.join(self.calls_directory, name))
+            except OSError:
+                pass
+
+    def _add_to_aggregate(self, samples: Counter[str]) -> None:
+        self._window.append(samples)
+        self._aggregate.update(samples)
+        if len(self._window) > ROLLING_CALLS:
+            self._aggregate.subtract(self._window.popleft())
+            # Drop stacks that only the expired call had
+            self._aggregate = +self._aggregate
+
+    def _write_aggregate(self) -> None:
+        self._aggregate_written = time.monotonic()
+        path = os.path.join(self.directory, f"aggregate-{os.getpid()}.folded")
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as folded:
+            for stack, count in sorted(self._aggregate.items()):
+                folded.write(f"{stack} {count}\n")
+        os.replace(temporary, path)
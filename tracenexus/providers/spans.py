@@ -0,0 +1,81 @@
+"""Flat, provider-independent span rows.
+
+Providers turn a trace (header plus child observations or runs) into a list
+of rows with the fields below, so indexing, export and analytics code does
+not need to know the shape of each SDK's models.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+SPAN_FIELDS = (
+    "provider",
+    "instance",
+    "trace_id",
+    "span_id",
+    "parent_id",
+    "name",
+    "kind",
+    "start_time",
+    "end_time",
+    "latency_ms",
+    "model",
+    "input_tokens",
+    "output_tokens",
+    "total_tokens",
+    "cost",
+    "status",
+    "error",
+    "input",
+    "output",
+)
+
+
+def to_datetime(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str) and value:
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    return None
+
+
+def latency_ms(start: Any, end: Any) -> Optional[float]:
+    start_time, end_time = to_datetime(start), to_datetime(end)
+    if start_time is None or end_time is None:
+        return None
+    try:
+        return (end_time - start_time).total_seconds() * 1000.0
+    except TypeError:
+        # Mixed naive and aware timestamps
+        return None
+
+
+def to_number(value: Any) -> Optional[float]:
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def isoformat(value: Any) -> Optional[str]:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value) if value is not None else None
+
+
+def span_row(**fields: Any) -> Dict[str, Any]:
+    """Build a row with every field in `SPAN_FIELDS`, defaulting to None."""
+    row = {field: fields.get(field) for field in SPAN_FIELDS}
+    row["start_time"] = isoformat(row["start_time"])
+    row["end_time"] = isoformat(row["end_time"])
+    for field in ("latency_ms", "input_tokens", "output_tokens", "total_tokens"):
+        row[field] = to_number(row[field])
+    row["cost"] = to_number(row["cost"])
+    return row
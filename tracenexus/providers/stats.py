@@ -0,0 +1,80 @@
+"""Cheap per-instance request statistics for the status tool.
+
+Recording a request takes a lock, bumps a counter and appends one float to a
+bounded window, so it can run on every call. Percentiles are only computed when
+a snapshot is requested.
+"""
+
+import math
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List
+
+# Latencies kept per operation for percentiles; older requests drop out
+LATENCY_WINDOW = 1024
+OUTCOMES = ("ok", "not_found", "timeout", "overloaded", "cancelled", "error")
+
+
+def percentiles(values: List[float], quantiles: Iterable[float]) -> List[float]:
+    """Linear-interpolated percentiles (NumPy's default method) of `values`."""
+    ordered = sorted(values)
+    if not ordered:
+        return [math.nan for _ in quantiles]
+    results = []
+    for q in quantiles:
+        position = (len(ordered) - 1) * q / 100.0
+        lower = math.floor(position)
+        upper = min(lower + 1, len(ordered) - 1)
+        fraction = position - lower
+        results.append(ordered[lower] + (ordered[upper] - ordered[lower]) * fraction)
+    return results
+
+
+class _OperationStats:
+    __slots__ = ("outcomes", "latencies")
+
+    def __init__(self) -> None:
+        self.outcomes = dict.fromkeys(OUTCOMES, 0)
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+
+class RequestStats:
+    """Request counts by outcome and recent latencies, per operation."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._operations: Dict[str, _OperationStats] = {}
+
+    def record(self, operation: str, outcome: str, seconds: float) -> None:
+        with self._lock:
+            stats = self._operations.get(operation)
+            if stats is None:
+                stats = self._operations[operation] = _OperationStats()
+            stats.outcomes[outcome] += 1
+            stats.latencies.append(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            copies = {
+                operation: (dict(stats.outcomes), list(stats.latencies))
+                for operation, stats in self._operations.items()
+            }
+        return {
+            operation: self._summarize(outcomes, latencies)
+            for operation, (outcomes, latencies) in copies.items()
+        }
+
+    @staticmethod
+    def _summarize(outcomes: Dict[str, int], latencies: List[float]) -> Dict[str, Any]:
+        count = sum(outcomes.values())
+        p50, p90, p99 = percentiles(latencies, (50, 90, 99))
+        return {
+            "count": count,
+            **outcomes,
+            "error_rate": round(outcomes["error"] / count, 4),
+            "not_found_rate": round(outcomes["not_found"] / count, 4),
+            "p50_ms": round(p50 * 1000, 1),
+            "p90_ms": round(p90 * 1000, 1),
+            "p99_ms": round(p99 * 1000, 1),
+            "max_ms": round(max(latencies) * 1000, 1),
+        }
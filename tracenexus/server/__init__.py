@@ -1,3 +1,4 @@
 from .mcp_server import TraceNexusServer
+from .settings import ServerSettings
 
-__all__ = ["TraceNexusServer"]
+__all__ = ["ServerSettings", "TraceNexusServer"]
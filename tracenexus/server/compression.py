@@ -0,0 +1,250 @@
+"""ASGI middleware that compresses HTTP and SSE responses.
+
+The encoding is negotiated from ``Accept-Encoding``: zstd when the optional
+``zstandard`` package is installed and the client accepts it, otherwise gzip.
+Regular responses are only compressed above a minimum size. Event streams are
+compressed chunk by chunk with a flush after every event, so clients still
+receive each message as soon as it is sent.
+"""
+
+import logging
+import threading
+import zlib
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+Scope = Dict[str, Any]
+Message = Dict[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+
+DEFAULT_MINIMUM_SIZE = 1024
+
+
+class CompressionStats:
+    """Running totals of response sizes before and after compression."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.responses = 0
+        self.compressed_responses = 0
+        self.raw_bytes = 0
+        self.sent_bytes = 0
+        self.largest_response_bytes = 0
+
+    def record(self, raw_bytes: int, sent_bytes: int, encoding: Optional[str]) -> None:
+        with self._lock:
+            self.responses += 1
+            self.compressed_responses += 1 if encoding else 0
+            self.raw_bytes += raw_bytes
+            self.sent_bytes += sent_bytes
+            self.largest_response_bytes = max(self.largest_response_bytes, raw_bytes)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "responses": self.responses,
+                "compressed_responses": self.compressed_responses,
+                "raw_bytes": self.raw_bytes,
+                "sent_bytes": self.sent_bytes,
+                "largest_response_bytes": self.largest_response_bytes,
+                "ratio": (
+                    round(self.sent_bytes / self.raw_bytes, 3)
+                    if self.raw_bytes
+                    else None
+                ),
+            }
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the best supported encoding from an Accept-Encoding header."""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        token, _, params = part.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q=") and quality[2:].strip() in ("0", "0.0", "0.00"):
+            continue
+        accepted.add(token.strip())
+    if zstandard is not None and "zstd" in accepted:
+        return "zstd"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        self._zstd: Any = None
+        self._gzip: Any = None
+        if encoding == "zstd":
+            self._zstd = zstandard.ZstdCompressor(level=3).compressobj()
+        else:
+            # wbits=31 selects the gzip container
+            self._gzip = zlib.compressobj(6, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, flush: bool) -> bytes:
+        if self._zstd is not None:
+            out = bytes(self._zstd.compress(data))
+            mode = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+            return out + bytes(self._zstd.flush(mode)) if flush else out
+        out = bytes(self._gzip.compress(data))
+        return out + bytes(self._gzip.flush(zlib.Z_SYNC_FLUSH)) if flush else out
+
+    def finish(self) -> bytes:
+        if self._zstd is not None:
+            return bytes(self._zstd.flush())
+        return bytes(self._gzip.flush())
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app: Callable[[Scope, Receive, Send], Awaitable[None]],
+        minimum_size: int = DEFAULT_MINIMUM_SIZE,
+        stats: Optional[CompressionStats] = None,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.stats = stats or CompressionStats()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        encoding = choose_encoding(
+            headers.get(b"accept-encoding", b"").decode("latin-1")
+        )
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressingResponder(self, send, encoding, scope.get("path", ""))
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressingResponder:
+    def __init__(
+        self,
+        middleware: CompressionMiddleware,
+        send: Send,
+        encoding: str,
+        path: str,
+    ):
+        self.middleware = middleware
+        self.downstream = send
+        self.encoding = encoding
+        self.path = path
+        self.start: Optional[Message] = None
+        self.buffer: List[bytes] = []
+        self.buffered = 0
+        self.raw_bytes = 0
+        self.sent_bytes = 0
+        self.compressor: Optional[_Compressor] = None
+        self.streaming = False
+        self.passthrough = False
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            response_headers = {
+                key.lower(): value for key, value in message.get("headers", [])
+            }
+            content_type = response_headers.get(b"content-type", b"")
+            self.streaming = content_type.startswith(b"text/event-stream")
+            self.passthrough = b"content-encoding" in response_headers
+            if self.passthrough:
+                await self.downstream(message)
+            elif self.streaming:
+                # Streams may stay idle for a long time; send headers right away
+                await self._start_compressed()
+            return
+
+        if message["type"] != "http.response.body":
+            await self.downstream(message)
+            return
+
+        body: bytes = message.get("body", b"")
+        more_body: bool = message.get("more_body", False)
+        self.raw_bytes += len(body)
+
+        if self.passthrough:
+            await self._send_body(body, more_body)
+        elif self.streaming:
+            await self._send_stream_chunk(body, more_body)
+        else:
+            await self._send_buffered(body, more_body)
+
+        if not more_body:
+            self._record()
+
+    async def _send_stream_chunk(self, body: bytes, more_body: bool) -> None:
+        assert self.compressor is not None
+        data = self.compressor.compress(body, flush=True) if body else b""
+        if not more_body:
+            data += self.compressor.finish()
+        await self._send_body(data, more_body)
+
+    async def _send_buffered(self, body: bytes, more_body: bool) -> None:
+        if self.compressor is None:
+            self.buffer.append(body)
+            self.buffered += len(body)
+            if self.buffered < self.middleware.minimum_size:
+                if more_body:
+                    return
+                # Small response: send it untouched
+                await self._flush_start(self._headers())
+                await self._send_body(b"".join(self.buffer), False)
+                return
+            body = b"".join(self.buffer)
+            self.buffer = []
+            await self._start_compressed()
+
+        assert self.compressor is not None
+        data = self.compressor.compress(body, flush=False)
+        if not more_body:
+            data += self.compressor.finish()
+        await self._send_body(data, more_body)
+
+    def _headers(self) -> List[Tuple[bytes, bytes]]:
+        assert self.start is not None
+        return list(self.start.get("headers", []))
+
+    async def _start_compressed(self) -> None:
+        self.compressor = _Compressor(self.encoding)
+        headers = [
+            (key, value)
+            for key, value in self._headers()
+            if key.lower() != b"content-length"
+        ]
+        headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+        headers.append((b"vary", b"Accept-Encoding"))
+        await self._flush_start(headers)
+
+    async def _flush_start(self, headers: List[Tuple[bytes, bytes]]) -> None:
+        assert self.start is not None
+        message = dict(self.start)
+        message["headers"] = headers
+        self.start = None
+        await self.downstream(message)
+
+    async def _send_body(self, data: bytes, more_body: bool) -> None:
+        self.sent_bytes += len(data)
+        await self.downstream(
+            {"type": "http.response.body", "body": data, "more_body": more_body}
+        )
+
+    def _record(self) -> None:
+        encoding = self.encoding if self.compressor is not None else None
+        self.middleware.stats.record(self.raw_bytes, self.sent_bytes, encoding)
+        logger.debug(
+            f"Response {self.path}: {self.raw_bytes} bytes raw, "
+            f"{self.sent_bytes} bytes sent ({encoding or 'identity'})"
+        )
@@ -1,64 +1,198 @@
+import asyncio
 import logging
 import multiprocessing
-from typing import Dict
+import os
+import signal
+import time
+from dataclasses import replace
+from typing import Any, Callable, Dict, List, Literal, Optional, Set
 
+from dotenv import dotenv_values, find_dotenv, load_dotenv
 from fastmcp import FastMCP
+from fastmcp.exceptions import NotFoundError
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse
 
+from ..analytics import DEFAULT_MAX_GROUPS, analyze_traces
+from ..export import DEFAULT_CONCURRENCY, build_trace_filter, export_traces
 from ..providers import (
     LangfuseProvider,
     LangfuseProviderFactory,
     LangSmithProvider,
     LangSmithProviderFactory,
+    OtlpProvider,
 )
+from ..providers.cassette import CassetteRecorder, ReplayProviderFactory
+from ..providers.connections import warm_up
+from ..providers.emitter import dump_yaml, to_plain
+from ..providers.otlp import OtlpSpanStore
+from ..providers.payloads import DEFAULT_READ_BYTES, PayloadStore
+from ..providers.prefetch import Prefetcher
+from ..providers.profiling import CallProfiler
+from .compression import CompressionMiddleware, CompressionStats
+from .otlp_receiver import OtlpReceiver
+from .settings import OTLP_TRANSPORT_ERROR, ServerSettings
+from .trace_index import DEFAULT_SEARCH_LIMIT, TraceIndex
 
 logger = logging.getLogger(__name__)
 
+PROVIDER_LABELS = {"langsmith": "LangSmith", "langfuse": "Langfuse", "otlp": "OTLP"}
+# Name of the provider instance serving spans from the local OTLP receiver
+OTLP_INSTANCE = "local"
+# Tools registered in --compact-tools mode, each taking the instance as an argument
+CATALOG_TOOLS = ("get_trace", "watch_trace")
+# Plain HTTP GET endpoint with the same content as the tracenexus_status tool
+STATUS_ROUTE = "/status"
+# Admin endpoint reading (GET) or changing (POST) the profiling settings
+PROFILING_ROUTE = "/profiling"
+# Where the export_traces tool writes when no --export-dir is given
+DEFAULT_EXPORT_DIR = "tracenexus-exports"
 
-def _run_http_server(http_port: int, mount_path: str, host: str) -> None:
+
+# Provider settings currently taken from the .env file, not the shell
+_dotenv_keys: Set[str] = set()
+
+
+def _provider_env_vars() -> List[str]:
+    return list(LangSmithProviderFactory.ENV_VARS + LangfuseProviderFactory.ENV_VARS)
+
+
+def load_env() -> None:
+    """Load the .env file, remembering which provider settings came from it.
+
+    Settings already in the environment take precedence, as with `load_dotenv`.
+    """
+    path = find_dotenv()
+    values = dotenv_values(path)
+    for key in _provider_env_vars():
+        if key not in os.environ and values.get(key) is not None:
+            _dotenv_keys.add(key)
+    load_dotenv(path)
+
+
+def _refresh_provider_env() -> None:
+    """Copy provider settings from the .env file into the process environment.
+
+    Settings that came from the .env file and were deleted from it are removed.
+    """
+    values = dotenv_values(find_dotenv())
+    for key in _provider_env_vars():
+        value = values.get(key)
+        if value is not None:
+            os.environ[key] = value
+            _dotenv_keys.add(key)
+        elif key in _dotenv_keys:
+            os.environ.pop(key, None)
+            _dotenv_keys.discard(key)
+
+
+def _run_http_server(
+    http_port: int, mount_path: str, host: str, settings: ServerSettings
+) -> None:
     """Run HTTP server in a separate process. Module-level for pickling."""
-    server = TraceNexusServer()
-    logger.info(f"Starting HTTP transport on {host}:{http_port}")
-    server.mcp_http.run(
-        transport="streamable-http",
-        host=host,
-        port=http_port,
-        path=mount_path,
-    )
+    server = TraceNexusServer(replace(settings, transport="http"))
+    server.install_reload_handler()
+    if settings.warm_up:
+        server.warm_up_connections()
+    server.serve_http(http_port, mount_path, host)
 
 
 class TraceNexusServer:
-    def __init__(self) -> None:
+    def __init__(self, settings: Optional[ServerSettings] = None) -> None:
+        self.settings = settings or ServerSettings()
+        if self.settings.otlp_port and self.settings.transport == "both":
+            raise ValueError(OTLP_TRANSPORT_ERROR)
+        self.started_at = time.monotonic()
+        self.compression_stats = CompressionStats()
+        self.trace_index: Optional[TraceIndex] = None
+        if self.settings.index_path:
+            self.trace_index = TraceIndex(self.settings.index_path)
+        self.prefetcher: Optional[Prefetcher] = None
+        if self.settings.prefetch:
+            self.prefetcher = Prefetcher(
+                ttl=self.settings.prefetch_ttl,
+                max_related=self.settings.prefetch_max,
+            )
+        self.payload_store: Optional[PayloadStore] = None
+        if self.settings.payload_threshold > 0:
+            self.payload_store = PayloadStore(
+                self.settings.payload_dir, threshold=self.settings.payload_threshold
+            )
+
+        self.export_dir = os.path.realpath(
+            self.settings.export_dir or DEFAULT_EXPORT_DIR
+        )
+
         # Create two FastMCP instances - one for each transport
         self.mcp_http: FastMCP = FastMCP("TraceNexus-HTTP")
         self.mcp_sse: FastMCP = FastMCP("TraceNexus-SSE")
 
-        # Instantiate LangSmith providers (multiple instances)
-        self.langsmith_providers: Dict[str, LangSmithProvider] = {}
-        for name, provider in LangSmithProviderFactory.create_providers():  # type: ignore[assignment]
-            self.langsmith_providers[name] = provider  # type: ignore[assignment]
+        self.profiler: Optional[CallProfiler] = None
+        if self.settings.profile_dir:
+            self.profiler = CallProfiler(
+                self.settings.profile_dir,
+                mode=self.settings.profile_mode,
+                rate=self.settings.profile_rate,
+            )
+        self.recorder: Optional[CassetteRecorder] = None
+        if self.settings.record_dir:
+            self.recorder = CassetteRecorder(self.settings.record_dir)
 
-        # Instantiate Langfuse providers (multiple instances)
+        self.langsmith_providers: Dict[str, LangSmithProvider] = {}
         self.langfuse_providers: Dict[str, LangfuseProvider] = {}
-        for name, provider in LangfuseProviderFactory.create_providers():  # type: ignore[assignment]
-            self.langfuse_providers[name] = provider  # type: ignore[assignment]
+        if self.settings.replay_dir:
+            # Recorded instances stand in for the upstream ones
+            for name, replay in ReplayProviderFactory.create_providers(
+                self.settings.replay_dir, self.settings.replay_latency
+            ):
+                if isinstance(replay, LangSmithProvider):
+                    self.langsmith_providers[name] = replay
+                elif isinstance(replay, LangfuseProvider):
+                    self.langfuse_providers[name] = replay
+        else:
+            # Instantiate LangSmith providers (multiple instances)
+            for name, provider in LangSmithProviderFactory.create_providers():  # type: ignore[assignment]
+                self.langsmith_providers[name] = provider  # type: ignore[assignment]
+
+            # Instantiate Langfuse providers (multiple instances)
+            for name, provider in LangfuseProviderFactory.create_providers():  # type: ignore[assignment]
+                self.langfuse_providers[name] = provider  # type: ignore[assignment]
+
+        # Spans pushed to the local OTLP receiver, served like any instance
+        self.otlp_store: Optional[OtlpSpanStore] = None
+        self.otlp_receiver: Optional[OtlpReceiver] = None
+        self.otlp_providers: Dict[str, OtlpProvider] = {}
+        if self.settings.otlp_port:
+            self.otlp_store = OtlpSpanStore(
+                self.settings.otlp_max_spans, self.settings.otlp_spill_path
+            )
+            self.otlp_providers[OTLP_INSTANCE] = OtlpProvider(
+                self.otlp_store, OTLP_INSTANCE, self.settings.otlp_port
+            )
 
+        for provider in self._all_providers():
+            self._configure_provider(provider)
         self.register_tools()
+        self.register_routes()
 
     def create_langsmith_tool(self, provider: LangSmithProvider, name: str):
         """Create a tool function for a specific LangSmith provider instance."""
 
-        async def tool_func(trace_id: str) -> str:
+        async def tool_func(trace_id: str, timeout: Optional[float] = None) -> str:
             """Get a trace from LangSmith by its ID.
 
             Args:
                 trace_id: The ID of the trace to retrieve
+                timeout: Seconds to wait for the upstream API before giving up
+                    (defaults to the server's --request-timeout)
 
             Returns:
                 The trace data in YAML format
             """
             logger.info(f"langsmith_{name}_get_trace called with trace_id: {trace_id}")
             try:
-                result = await provider.get_trace(trace_id)
+                result = await provider.get_trace(trace_id, timeout=timeout)
                 return result
             except Exception as e:
                 logger.error(f"Error in langsmith_{name}_get_trace: {e}")
@@ -69,18 +203,20 @@ class TraceNexusServer:
     def create_langfuse_tool(self, provider: LangfuseProvider, name: str):
         """Create a tool function for a specific Langfuse provider instance."""
 
-        async def tool_func(trace_id: str) -> str:
+        async def tool_func(trace_id: str, timeout: Optional[float] = None) -> str:
             """Get a trace from Langfuse by its ID.
 
             Args:
                 trace_id: The ID of the trace to retrieve
+                timeout: Seconds to wait for the upstream API before giving up
+                    (defaults to the server's --request-timeout)
 
             Returns:
                 The trace data in YAML format
             """
             logger.info(f"langfuse_{name}_get_trace called with trace_id: {trace_id}")
             try:
-                result = await provider.get_trace(trace_id)
+                result = await provider.get_trace(trace_id, timeout=timeout)
                 return result
             except Exception as e:
                 logger.error(f"Error in langfuse_{name}_get_trace: {e}")
@@ -88,41 +224,765 @@ class TraceNexusServer:
 
         return tool_func
 
+    def create_otlp_tool(self, provider: OtlpProvider, name: str):
+        """Create a tool function for the local OTLP span store."""
+
+        async def tool_func(trace_id: str, timeout: Optional[float] = None) -> str:
+            """Get a trace received over OTLP by its ID.
+
+            Args:
+                trace_id: The hex ID of the trace to retrieve
+                timeout: Seconds to wait before giving up (defaults to the
+                    server's --request-timeout)
+
+            Returns:
+                The trace data in YAML format
+            """
+            logger.info(f"otlp_{name}_get_trace called with trace_id: {trace_id}")
+            try:
+                result = await provider.get_trace(trace_id, timeout=timeout)
+                return result
+            except Exception as e:
+                logger.error(f"Error in otlp_{name}_get_trace: {e}")
+                raise
+
+        return tool_func
+
+    def create_watch_tool(self, provider: Any, provider_type: str, name: str):
+        """Create an incremental watch tool for a specific provider instance."""
+        tool_name = self._tool_name(provider_type, name, "watch_trace")
+
+        async def tool_func(
+            trace_id: str,
+            since: Optional[str] = None,
+            wait_seconds: float = 0.0,
+            timeout: Optional[float] = None,
+        ) -> str:
+            """Follow a trace that may still be running.
+
+            Args:
+                trace_id: The ID of the trace to follow
+                since: Cursor from the previous call; omit to get the full trace
+                wait_seconds: Long-poll up to this long for new data (max 60)
+                timeout: Seconds to wait for each upstream fetch (defaults to
+                    the server's --request-timeout)
+
+            Returns:
+                YAML with a new cursor and only the items added or updated
+                since `since`
+            """
+            logger.info(f"{tool_name} called with trace_id: {trace_id}")
+            try:
+                result: str = await provider.watch_trace(
+                    trace_id,
+                    since=since,
+                    wait_seconds=min(wait_seconds, 60.0),
+                    timeout=timeout,
+                )
+                return result
+            except Exception as e:
+                logger.error(f"Error in {tool_name}: {e}")
+                raise
+
+        return tool_func
+
+    def create_catalog_get_trace_tool(self):
+        """Create the get_trace tool of the compact tool catalog."""
+
+        async def tool_func(
+            provider: Literal["langsmith", "langfuse", "otlp"],
+            instance: str,
+            trace_id: str,
+            timeout: Optional[float] = None,
+        ) -> str:
+            """Get a trace by its ID.
+
+            Args:
+                provider: Provider type of the instance
+                instance: Configured instance name
+                trace_id: The ID of the trace to retrieve
+                timeout: Seconds to wait for the upstream API before giving up
+                    (defaults to the server's --request-timeout)
+
+            Returns:
+                The trace data in YAML format
+            """
+            logger.info(f"get_trace called for {provider}/{instance}: {trace_id}")
+            result: str = await self.get_provider(provider, instance).get_trace(
+                trace_id, timeout=timeout
+            )
+            return result
+
+        return tool_func
+
+    def create_catalog_watch_tool(self):
+        """Create the watch_trace tool of the compact tool catalog."""
+
+        async def tool_func(
+            provider: Literal["langsmith", "langfuse", "otlp"],
+            instance: str,
+            trace_id: str,
+            since: Optional[str] = None,
+            wait_seconds: float = 0.0,
+            timeout: Optional[float] = None,
+        ) -> str:
+            """Follow a trace that may still be running.
+
+            Args:
+                provider: Provider type of the instance
+                instance: Configured instance name
+                trace_id: The ID of the trace to follow
+                since: Cursor from the previous call; omit to get the full trace
+                wait_seconds: Long-poll up to this long for new data (max 60)
+                timeout: Seconds to wait for each upstream fetch (defaults to
+                    the server's --request-timeout)
+
+            Returns:
+                YAML with a new cursor and only the items added or updated
+                since `since`
+            """
+            logger.info(f"watch_trace called for {provider}/{instance}: {trace_id}")
+            result: str = await self.get_provider(provider, instance).watch_trace(
+                trace_id,
+                since=since,
+                wait_seconds=min(wait_seconds, 60.0),
+                timeout=timeout,
+            )
+            return result
+
+        return tool_func
+
+    def create_search_tool(self):
+        """Create the tool that searches the local trace index."""
+        trace_index = self.trace_index
+        assert trace_index is not None
+
+        async def tool_func(
+            query: str,
+            limit: int = DEFAULT_SEARCH_LIMIT,
+            instance: Optional[str] = None,
+        ) -> str:
+            """Search traces that were already fetched, without upstream calls.
+
+            Args:
+                query: Words to find in span names, errors, models, inputs and
+                    outputs (SQLite FTS5 syntax such as "permission denied"
+                    or tool* is supported)
+                limit: Maximum number of matching spans to return
+                instance: Only search traces from this provider instance
+
+            Returns:
+                Matching spans in YAML format, most relevant first
+            """
+            logger.info(f"search_local_traces called with query: {query}")
+            hits = await asyncio.to_thread(trace_index.search, query, limit, instance)
+            return dump_yaml({"hits": hits})
+
+        return tool_func
+
+    def create_payload_tool(self):
+        """Create the tool that reads spilled payloads in ranges."""
+        payload_store = self.payload_store
+        assert payload_store is not None
+
+        async def tool_func(
+            handle: str, offset: int = 0, length: int = DEFAULT_READ_BYTES
+        ) -> str:
+            """Read part of a large value that a trace returned as a handle.
+
+            Args:
+                handle: The payload_handle from the trace
+                offset: Byte offset to start reading from
+                length: Maximum bytes to return (at most 1 MiB)
+
+            Returns:
+                YAML with the text read and next_offset to continue from
+                (null at the end of the payload)
+            """
+            logger.info(f"get_trace_payload called with handle: {handle}")
+            chunk = await asyncio.to_thread(payload_store.read, handle, offset, length)
+            return dump_yaml(chunk)
+
+        return tool_func
+
+    def resolve_export_path(self, output: str) -> str:
+        """Resolve an export_traces output inside the export directory.
+
+        Raises:
+            ValueError: If `output` resolves outside the export directory
+        """
+        path = os.path.realpath(os.path.join(self.export_dir, output))
+        if path == self.export_dir or (
+            os.path.commonpath([path, self.export_dir]) != self.export_dir
+        ):
+            raise ValueError(
+                f"Export output must be a path inside {self.export_dir}, not {output}"
+            )
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def create_export_tool(self):
+        """Create the tool that exports many traces to local files."""
+
+        async def tool_func(
+            provider: Literal["langsmith", "langfuse", "otlp"],
+            instance: str,
+            output: str,
+            format: Literal["jsonl", "parquet", "arrow"] = "jsonl",
+            trace_ids: Optional[List[str]] = None,
+            name: Optional[str] = None,
+            since: Optional[str] = None,
+            until: Optional[str] = None,
+            tags: Optional[List[str]] = None,
+            session_id: Optional[str] = None,
+            project: Optional[str] = None,
+            limit: int = 1000,
+            concurrency: int = DEFAULT_CONCURRENCY,
+        ) -> str:
+            """Export traces as flat span rows to a file on the server.
+
+            Args:
+                provider: Provider type of the instance
+                instance: Configured instance name
+                output: Path of a .jsonl file, or a directory for parquet/arrow,
+                    relative to the server's export directory
+                format: Output format
+                trace_ids: Export these traces; otherwise traces are listed
+                    with the filters below
+                name: Only traces with this name
+                since: Only traces starting at or after this ISO 8601 time
+                until: Only traces starting before this ISO 8601 time
+                tags: Only traces with all of these tags
+                session_id: Only traces in this session (Langfuse)
+                project: Project to list traces from (required for LangSmith)
+                limit: Maximum number of traces to export
+                concurrency: Traces fetched at the same time
+
+            Returns:
+                Summary of the export in YAML format. Re-running with the same
+                output resumes an interrupted export.
+            """
+            logger.info(f"export_traces called for {provider} instance {instance}")
+            trace_filter = build_trace_filter(
+                name=name,
+                since=since,
+                until=until,
+                tags=tags,
+                session_id=session_id,
+                project=project,
+            )
+            summary = await export_traces(
+                self.get_provider(provider, instance),
+                self.resolve_export_path(output),
+                fmt=format,
+                trace_ids=trace_ids,
+                trace_filter=trace_filter,
+                limit=limit,
+                concurrency=max(1, min(concurrency, 32)),
+            )
+            return dump_yaml(summary)
+
+        return tool_func
+
+    def create_analyze_tool(self):
+        """Create the tool that summarizes spans across many traces."""
+
+        async def tool_func(
+            provider: Literal["langsmith", "langfuse", "otlp"],
+            instance: str,
+            trace_ids: Optional[List[str]] = None,
+            name: Optional[str] = None,
+            since: Optional[str] = None,
+            until: Optional[str] = None,
+            tags: Optional[List[str]] = None,
+            session_id: Optional[str] = None,
+            project: Optional[str] = None,
+            limit: int = 200,
+            group_by: Literal["name", "kind", "model"] = "name",
+            span_name: Optional[str] = None,
+            max_groups: int = DEFAULT_MAX_GROUPS,
+        ) -> str:
+            """Latency percentiles, token/cost totals and error rates per span.
+
+            Args:
+                provider: Provider type of the instance
+                instance: Configured instance name
+                trace_ids: Analyze these traces; otherwise traces are listed
+                    with the filters below
+                name: Only traces with this name
+                since: Only traces starting at or after this ISO 8601 time
+                until: Only traces starting before this ISO 8601 time
+                tags: Only traces with all of these tags
+                session_id: Only traces in this session (Langfuse)
+                project: Project to list traces from (required for LangSmith)
+                limit: Maximum number of traces to analyze (max 5000)
+                group_by: Span field to group rows by
+                span_name: Only include spans with this name, e.g. "retriever"
+                max_groups: Maximum number of rows in the table
+
+            Returns:
+                A table with count, p50/p90/p95/p99/max latency in ms, errors,
+                error rate, input/output tokens and cost for each group
+            """
+            logger.info(f"analyze_traces called for {provider} instance {instance}")
+            trace_filter = build_trace_filter(
+                name=name,
+                since=since,
+                until=until,
+                tags=tags,
+                session_id=session_id,
+                project=project,
+            )
+            result: str = await analyze_traces(
+                self.get_provider(provider, instance),
+                trace_ids=trace_ids,
+                trace_filter=trace_filter,
+                limit=min(limit, 5000),
+                group_by=group_by,
+                span_name=span_name,
+                max_groups=max_groups,
+            )
+            return result
+
+        return tool_func
+
+    def status(self) -> Dict[str, Any]:
+        """Runtime state of this server process and every provider instance."""
+        providers: Dict[str, Any] = {}
+        for provider_type, instances in self._providers_by_type().items():
+            for name, provider in instances.items():
+                providers[f"{provider_type}/{name}"] = {
+                    "requests": provider.request_stats.snapshot(),
+                    "in_flight": provider.in_flight,
+                    "client_initialized": provider.client_initialized,
+                    "executor": provider.executor.stats(),
+                    "listener_executor": provider.listener_executor.stats(),
+                    "caches": {
+                        "prefetched": provider.prefetched.stats(),
+                        "watch": provider.trace_cache.stats(),
+                    },
+                }
+        server: Dict[str, Any] = {
+            "transport": self.settings.transport,
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.monotonic() - self.started_at, 1),
+        }
+        if self.settings.compression:
+            server["compression"] = self.compression_stats.snapshot()
+        if self.prefetcher is not None:
+            server["prefetch"] = {
+                "prefetched": self.prefetcher.prefetched_count,
+                "dropped": self.prefetcher.dropped_count,
+            }
+        if self.payload_store is not None:
+            server["spilled_payloads"] = self.payload_store.spilled_count
+        if self.otlp_store is not None:
+            server["otlp"] = self.otlp_store.stats()
+        if self.recorder is not None:
+            server["recorded_fetches"] = self.recorder.recorded_count
+        if self.profiler is not None:
+            server["profiling"] = self.profiling_state()
+        return {"server": server, "providers": providers}
+
+    def create_status_tool(self):
+        """Create the tool that reports server and provider state."""
+
+        async def tool_func() -> str:
+            """Report request, cache and worker pool statistics per instance.
+
+            Returns:
+                YAML with, per instance, request counts by outcome, error and
+                not-found rates and p50/p90/p99 latency for recent requests,
+                cache occupancy and hit ratios, in-flight calls and worker pool
+                utilization. Statistics cover this server process only.
+            """
+            return dump_yaml(self.status())
+
+        return tool_func
+
+    async def status_endpoint(self, request: Request) -> JSONResponse:
+        """HTTP handler returning `status()` as JSON."""
+        return JSONResponse(to_plain(self.status()))
+
+    def profiling_state(self) -> Dict[str, Any]:
+        profiler = self.profiler
+        assert profiler is not None
+        return {
+            **profiler.state(),
+            "directory": profiler.directory,
+            "profiled": profiler.profiled_count,
+            "skipped": profiler.skipped_count,
+        }
+
+    async def profiling_endpoint(self, request: Request) -> JSONResponse:
+        """HTTP handler for the profiling settings of both server processes.
+
+        POST a JSON object with any of `enabled`, `mode` ("sample" or
+        "cprofile"), `rate` (0 to 1) and `trace_ids` (profile only these
+        traces) to change them. The other transport process picks the change
+        up within a second.
+        """
+        profiler = self.profiler
+        assert profiler is not None
+        if request.method == "POST":
+            try:
+                changes = await request.json()
+                if not isinstance(changes, dict):
+                    raise ValueError("Expected a JSON object")
+                profiler.update(**changes)
+            except (ValueError, TypeError) as e:
+                return JSONResponse({"error": str(e)}, status_code=400)
+        return JSONResponse(self.profiling_state())
+
+    def register_routes(self) -> None:
+        for mcp_instance in self._mcp_instances():
+            mcp_instance.custom_route(STATUS_ROUTE, methods=["GET"])(
+                self.status_endpoint
+            )
+            if self.profiler is not None:
+                mcp_instance.custom_route(PROFILING_ROUTE, methods=["GET", "POST"])(
+                    self.profiling_endpoint
+                )
+
+    def get_provider(self, provider_type: str, instance: str) -> Any:
+        """Look up a configured provider instance."""
+        providers = self._providers_by_type().get(provider_type, {})
+        if instance not in providers:
+            raise ValueError(
+                f"No {PROVIDER_LABELS.get(provider_type, provider_type)} "
+                f"instance named '{instance}'"
+            )
+        return providers[instance]
+
+    def _providers_by_type(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            "langsmith": self.langsmith_providers,
+            "langfuse": self.langfuse_providers,
+            "otlp": self.otlp_providers,
+        }
+
+    def _all_providers(self) -> List[Any]:
+        return [
+            provider
+            for instances in self._providers_by_type().values()
+            for provider in instances.values()
+        ]
+
+    def _configure_provider(self, provider: Any) -> None:
+        provider.request_timeout = self.settings.request_timeout or None
+        provider.payload_store = self.payload_store
+        provider.dedup = self.settings.dedup
+        provider.recorder = self.recorder
+        provider.profiler = self.profiler
+        if isinstance(provider, LangfuseProvider):
+            provider.page_size = self.settings.langfuse_page_size
+        provider.executor.configure(
+            self.settings.provider_workers, self.settings.provider_queue
+        )
+        listeners = []
+        if self.trace_index is not None:
+            listeners.append(self.trace_index.listener)
+        if self.prefetcher is not None:
+            listeners.append(self.prefetcher.listener)
+        for listener in listeners:
+            if listener not in provider.trace_listeners:
+                provider.trace_listeners.append(listener)
+
+    def _mcp_instances(self) -> List[FastMCP]:
+        """FastMCP instances served by the configured transport."""
+        if self.settings.transport in ("http", "stdio"):
+            return [self.mcp_http]
+        if self.settings.transport == "sse":
+            return [self.mcp_sse]
+        return [self.mcp_http, self.mcp_sse]
+
+    @staticmethod
+    def _tool_name(provider_type: str, name: str, action: str = "get_trace") -> str:
+        # Sanitize name for Python compatibility (replace dashes with underscores)
+        safe_name = name.replace("-", "_")
+        return f"{provider_type}_{safe_name}_{action}"
+
+    def _provider_tool_names(self, provider_type: str, name: str) -> List[str]:
+        return [
+            self._tool_name(provider_type, name, action)
+            for action in ("get_trace", "watch_trace")
+        ]
+
+    def _register_provider_tools(
+        self, mcp_instance: FastMCP, provider_type: str, name: str, provider: Any
+    ) -> None:
+        tool_factories: Dict[str, Callable[[Any, str], Any]] = {
+            "langsmith": self.create_langsmith_tool,
+            "langfuse": self.create_langfuse_tool,
+            "otlp": self.create_otlp_tool,
+        }
+        label = PROVIDER_LABELS[provider_type]
+
+        # Create and register the tools
+        tool_name = self._tool_name(provider_type, name)
+        logger.info(f"Registering tool: {tool_name}")
+        mcp_instance.tool(
+            name=tool_name,
+            description=f"Get a trace from {label} instance '{name}' by trace ID",
+        )(tool_factories[provider_type](provider, name))
+
+        tool_name = self._tool_name(provider_type, name, "watch_trace")
+        logger.info(f"Registering tool: {tool_name}")
+        mcp_instance.tool(
+            name=tool_name,
+            description=(
+                f"Follow a live trace in {label} instance '{name}': returns only "
+                "what was added or updated since the `since` cursor"
+            ),
+        )(self.create_watch_tool(provider, provider_type, name))
+
+    def _instance_catalog(self) -> str:
+        parts = []
+        for provider_type, instances in self._providers_by_type().items():
+            if instances:
+                parts.append(f"{provider_type}: {', '.join(sorted(instances))}")
+        return "; ".join(parts)
+
+    def _register_catalog_tools(self, mcp_instance: FastMCP) -> None:
+        """Register the fixed tool set that takes the instance as an argument."""
+        names = sorted(
+            {
+                name
+                for instances in self._providers_by_type().values()
+                for name in instances
+            }
+        )
+        if not names:
+            logger.warning("No provider instances configured; no trace tools")
+            return
+        # The schema lists the configured names as an enum
+        instance_type = Literal[tuple(names)]  # type: ignore[valid-type]
+        catalog = self._instance_catalog()
+
+        get_trace = self.create_catalog_get_trace_tool()
+        get_trace.__annotations__["instance"] = instance_type
+        logger.info("Registering tool: get_trace")
+        mcp_instance.tool(
+            name="get_trace",
+            description=f"Get a trace by ID from a configured instance ({catalog})",
+        )(get_trace)
+
+        watch_trace = self.create_catalog_watch_tool()
+        watch_trace.__annotations__["instance"] = instance_type
+        logger.info("Registering tool: watch_trace")
+        mcp_instance.tool(
+            name="watch_trace",
+            description=(
+                "Follow a live trace in a configured instance: returns only what "
+                f"was added or updated since the `since` cursor ({catalog})"
+            ),
+        )(watch_trace)
+
     def register_tools(self) -> None:
         # Register tools on both FastMCP instances
-        for mcp_instance in [self.mcp_http, self.mcp_sse]:
+        for mcp_instance in self._mcp_instances():
             logger.info(f"Registering tools for {mcp_instance.name}")
 
-            # Register a tool for each LangSmith instance
-            for name, provider in self.langsmith_providers.items():
-                # Sanitize name for Python compatibility (replace dashes with underscores)
-                safe_name = name.replace("-", "_")
-                tool_name = f"langsmith_{safe_name}_get_trace"
-                logger.info(f"Registering tool: {tool_name}")
+            if self.settings.compact_tools:
+                self._register_catalog_tools(mcp_instance)
+            else:
+                # Register a tool for each LangSmith instance
+                for name, provider in self.langsmith_providers.items():
+                    self._register_provider_tools(
+                        mcp_instance, "langsmith", name, provider
+                    )
+
+                # Register a tool for each Langfuse instance
+                for name, provider in self.langfuse_providers.items():  # type: ignore[assignment]
+                    self._register_provider_tools(
+                        mcp_instance, "langfuse", name, provider
+                    )
+
+                for name, provider in self.otlp_providers.items():  # type: ignore[assignment]
+                    self._register_provider_tools(mcp_instance, "otlp", name, provider)
+
+            logger.info("Registering tool: tracenexus_status")
+            mcp_instance.tool(
+                name="tracenexus_status",
+                description=(
+                    "Report request counts, latency percentiles, error rates, "
+                    "cache hit ratios and worker pool load of each instance"
+                ),
+            )(self.create_status_tool())
+
+            logger.info("Registering tool: export_traces")
+            mcp_instance.tool(
+                name="export_traces",
+                description=(
+                    "Export many traces from one instance as flat span rows "
+                    "(JSONL, Parquet or Arrow) for offline analysis"
+                ),
+            )(self.create_export_tool())
 
-                # Create and register the tool
-                tool_func = self.create_langsmith_tool(provider, name)
+            logger.info("Registering tool: analyze_traces")
+            mcp_instance.tool(
+                name="analyze_traces",
+                description=(
+                    "Latency percentiles, token/cost totals and error rates per "
+                    "span name across many traces of one instance"
+                ),
+            )(self.create_analyze_tool())
+
+            if self.trace_index is not None:
+                logger.info("Registering tool: search_local_traces")
                 mcp_instance.tool(
-                    name=tool_name,
-                    description=f"Get a trace from LangSmith instance '{name}' by trace ID",
-                )(tool_func)
-
-            # Register a tool for each Langfuse instance
-            for name, provider in self.langfuse_providers.items():  # type: ignore[assignment]
-                # Sanitize name for Python compatibility (replace dashes with underscores)
-                safe_name = name.replace("-", "_")
-                tool_name = f"langfuse_{safe_name}_get_trace"
-                logger.info(f"Registering tool: {tool_name}")
-
-                # Create and register the tool
-                tool_func = self.create_langfuse_tool(provider, name)  # type: ignore[arg-type]
+                    name="search_local_traces",
+                    description=(
+                        "Full-text search over traces already fetched by this "
+                        "server (span names, errors, models, inputs and outputs)"
+                    ),
+                )(self.create_search_tool())
+
+            if self.payload_store is not None:
+                logger.info("Registering tool: get_trace_payload")
                 mcp_instance.tool(
-                    name=tool_name,
-                    description=f"Get a trace from Langfuse instance '{name}' by trace ID",
-                )(tool_func)
+                    name="get_trace_payload",
+                    description=(
+                        "Read a large trace value that was returned as a "
+                        "payload_handle, in byte ranges"
+                    ),
+                )(self.create_payload_tool())
 
         logger.info("Tool registration complete")
 
+    def _apply_provider_changes(
+        self,
+        provider_type: str,
+        current: Dict[str, Any],
+        updated: Dict[str, Any],
+    ) -> None:
+        """Swap tools for added, changed and removed instances of one provider type."""
+        for name, provider in current.items():
+            if updated.get(name) is provider:
+                continue
+            if not self.settings.compact_tools:
+                for tool_name in self._provider_tool_names(provider_type, name):
+                    for mcp_instance in self._mcp_instances():
+                        mcp_instance.remove_tool(tool_name)
+            # In-flight calls keep their reference; the client closes afterwards
+            provider.retire()
+            logger.info(f"Retired {provider_type} provider: {name}")
+
+        for name, provider in updated.items():
+            if current.get(name) is provider:
+                continue
+            self._configure_provider(provider)
+            if self.settings.compact_tools:
+                continue
+            for mcp_instance in self._mcp_instances():
+                self._register_provider_tools(
+                    mcp_instance, provider_type, name, provider
+                )
+
+    def reload_providers(self) -> None:
+        """Re-read provider settings and rebuild only instances that changed.
+
+        Unchanged providers keep their SDK clients and connections.
+        """
+        if self.settings.replay_dir:
+            logger.info("Replaying recorded instances; provider reload skipped")
+            return
+        logger.info("Reloading provider configuration")
+        try:
+            _refresh_provider_env()
+            langsmith_providers = dict(
+                LangSmithProviderFactory.create_providers(self.langsmith_providers)
+            )
+            langfuse_providers = dict(
+                LangfuseProviderFactory.create_providers(self.langfuse_providers)
+            )
+        except Exception as e:
+            logger.error(f"Provider reload failed, keeping current providers: {e}")
+            return
+
+        self._apply_provider_changes(
+            "langsmith", self.langsmith_providers, langsmith_providers
+        )
+        self._apply_provider_changes(
+            "langfuse", self.langfuse_providers, langfuse_providers
+        )
+        self.langsmith_providers = langsmith_providers
+        self.langfuse_providers = langfuse_providers
+        if self.settings.compact_tools:
+            # The instance enums list the new set of names
+            for mcp_instance in self._mcp_instances():
+                for tool_name in CATALOG_TOOLS:
+                    try:
+                        mcp_instance.remove_tool(tool_name)
+                    except NotFoundError:
+                        pass
+                self._register_catalog_tools(mcp_instance)
+        logger.info("Provider reload complete")
+
+    def http_middleware(self) -> List[Middleware]:
+        """ASGI middleware applied to both HTTP transports."""
+        if not self.settings.compression:
+            return []
+        return [
+            Middleware(
+                CompressionMiddleware,
+                minimum_size=self.settings.compression_min_size,
+                stats=self.compression_stats,
+            )
+        ]
+
+    def warm_up_connections(self) -> None:
+        """Pre-open pooled connections to every configured upstream host."""
+        warm_up(self._all_providers())
+
+    def install_reload_handler(self, forward_pid: Optional[int] = None) -> None:
+        """Reload providers on SIGHUP, forwarding the signal to `forward_pid`."""
+        if not hasattr(signal, "SIGHUP"):
+            logger.warning("SIGHUP is not available; hot reload is disabled")
+            return
+
+        def handle_sighup(signum: int, frame: Any) -> None:
+            if forward_pid:
+                os.kill(forward_pid, signal.SIGHUP)
+            # Apply the reload from the event loop rather than mid-request
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self.reload_providers()
+            else:
+                loop.call_soon_threadsafe(self.reload_providers)
+
+        signal.signal(signal.SIGHUP, handle_sighup)
+
+    def start_otlp_receiver(self, host: str) -> None:
+        """Start accepting OTLP/HTTP span exports, if enabled."""
+        if self.otlp_store is None or self.otlp_receiver is not None:
+            return
+        self.otlp_receiver = OtlpReceiver(
+            self.otlp_store, host, self.settings.otlp_port
+        )
+        self.otlp_receiver.start()
+
+    def serve_http(self, http_port: int, mount_path: str, host: str) -> None:
+        logger.info(f"Starting HTTP transport on {host}:{http_port}")
+        self.mcp_http.run(
+            transport="streamable-http",
+            host=host,
+            port=http_port,
+            path=mount_path,
+            middleware=self.http_middleware(),
+        )
+
+    def serve_sse(self, sse_port: int, host: str) -> None:
+        logger.info(f"Starting SSE transport on port {sse_port}")
+        self.mcp_sse.run(
+            transport="sse",
+            host=host,
+            port=sse_port,
+            path="/sse",
+            middleware=self.http_middleware(),
+        )
+
     def run(
         self,
         http_port: int = 52734,
@@ -130,6 +990,11 @@ class TraceNexusServer:
         mount_path: str = "/mcp",
         host: str = "127.0.0.1",
     ):
+        transport = self.settings.transport
+        if transport != "both":
+            self._run_single(transport, http_port, sse_port, mount_path, host)
+            return
+
         logger.info("Starting TraceNexus with DUAL transport support:")
         logger.info(
             f"  📡 Streamable-HTTP (Cursor): http://{host}:{http_port}{mount_path}"
@@ -139,24 +1004,53 @@ class TraceNexusServer:
         # Start HTTP server in a separate process (using module-level function for pickling)
         http_process = multiprocessing.Process(
             target=_run_http_server,
-            args=(http_port, mount_path, host),
+            args=(http_port, mount_path, host, self.settings),
             daemon=True,
         )
         http_process.start()
+        self.install_reload_handler(forward_pid=http_process.pid)
+        # Warm up after forking so the HTTP process never inherits open sockets
+        if self.settings.warm_up:
+            self.warm_up_connections()
+        self.start_otlp_receiver(host)
 
         # Start SSE server in main thread (so Ctrl+C works properly)
         # This uses the existing server instance created by CLI
         try:
-            logger.info(f"Starting SSE transport on port {sse_port}")
-            self.mcp_sse.run(
-                transport="sse",
-                host=host,
-                port=sse_port,
-                path="/sse",
-            )
+            self.serve_sse(sse_port, host)
         except KeyboardInterrupt:
             logger.info("Shutting down TraceNexus server...")
             http_process.terminate()
         except Exception as e:
             logger.error(f"Error running server: {e}")
             raise
+
+    def _run_single(
+        self,
+        transport: str,
+        http_port: int,
+        sse_port: int,
+        mount_path: str,
+        host: str,
+    ) -> None:
+        """Serve one transport from this process, without forking."""
+        self.install_reload_handler()
+        if self.settings.warm_up:
+            self.warm_up_connections()
+        self.start_otlp_receiver(host)
+        try:
+            if transport == "stdio":
+                # Logs go to stderr; stdout carries the protocol
+                logger.info("Starting stdio transport")
+                self.mcp_http.run(transport="stdio", show_banner=False)
+            elif transport == "http":
+                logger.info(
+                    f"  📡 Streamable-HTTP (Cursor): "
+                    f"http://{host}:{http_port}{mount_path}"
+                )
+                self.serve_http(http_port, mount_path, host)
+            else:
+                logger.info(f"  🌊 SSE: http://{host}:{sse_port}/sse")
+                self.serve_sse(sse_port, host)
+        except KeyboardInterrupt:
+            logger.info("Shutting down TraceNexus server...")
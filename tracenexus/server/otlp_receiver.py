@@ -0,0 +1,169 @@
+"""OTLP/HTTP trace receiver feeding the local OTLP span store.
+
+Accepts ``POST /v1/traces`` with the JSON encoding, optionally gzip-compressed.
+The protobuf encoding is accepted when the optional ``opentelemetry-proto``
+package is installed; otherwise such requests get 415 and exporters should be
+configured with ``OTEL_EXPORTER_OTLP_PROTOCOL=http/json``.
+"""
+
+import base64
+import json
+import logging
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+from ..providers.otlp import OtlpSpanStore, spans_from_otlp_json
+
+logger = logging.getLogger(__name__)
+
+TRACES_PATH = "/v1/traces"
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+
+class UnsupportedEncoding(Exception):
+    """Raised for a request encoding this installation cannot decode."""
+
+
+class BodyTooLarge(Exception):
+    """Raised when a request body decompresses to more than MAX_BODY_BYTES."""
+
+
+def _gunzip(body: bytes) -> bytes:
+    # Bounded, so a small compressed body cannot expand without limit
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    data = decompressor.decompress(body, MAX_BODY_BYTES)
+    if decompressor.unconsumed_tail:
+        raise BodyTooLarge(f"Decompressed body exceeds {MAX_BODY_BYTES} bytes")
+    if not decompressor.eof:
+        raise ValueError("Truncated gzip body")
+    return data
+
+
+def _hex_ids(value: Any) -> Any:
+    # MessageToDict writes bytes fields base64-encoded; OTLP JSON uses hex
+    if isinstance(value, dict):
+        return {
+            key: (
+                base64.b64decode(item).hex()
+                if key in ("traceId", "spanId", "parentSpanId") and item
+                else _hex_ids(item)
+            )
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_hex_ids(item) for item in value]
+    return value
+
+
+def _decode_protobuf(body: bytes) -> Dict[str, Any]:
+    try:
+        from google.protobuf.json_format import MessageToDict
+        from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import (
+            ExportTraceServiceRequest,
+        )
+    except ImportError:
+        raise UnsupportedEncoding(
+            "OTLP protobuf needs the opentelemetry-proto package; "
+            "export with OTEL_EXPORTER_OTLP_PROTOCOL=http/json instead"
+        ) from None
+    message = ExportTraceServiceRequest()
+    message.ParseFromString(body)
+    decoded: Dict[str, Any] = _hex_ids(MessageToDict(message))
+    return decoded
+
+
+def decode_export_request(
+    body: bytes, content_type: str, content_encoding: str
+) -> List[Dict[str, Any]]:
+    """Turn an OTLP/HTTP request body into span dicts for the store."""
+    if content_encoding.strip().lower() == "gzip":
+        body = _gunzip(body)
+    if content_type.split(";")[0].strip().lower() == "application/x-protobuf":
+        return spans_from_otlp_json(_decode_protobuf(body))
+    return spans_from_otlp_json(json.loads(body))
+
+
+class OtlpReceiver:
+    """A small threaded HTTP server that writes received spans to `store`."""
+
+    def __init__(self, store: OtlpSpanStore, host: str, port: int):
+        self.store = store
+        self.host = host
+        self.port = port
+        self._server: Any = None
+        self._thread: Any = None
+
+    def start(self) -> None:
+        """Start serving in a daemon thread."""
+        store = self.store
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                if self.path.split("?")[0] != TRACES_PATH:
+                    self._reply(404, {"error": f"Unknown path {self.path}"})
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                    if length < 0:
+                        raise ValueError(f"negative length {length}")
+                except ValueError as e:
+                    self._reply(400, {"error": f"Invalid Content-Length: {e}"})
+                    return
+                if length > MAX_BODY_BYTES:
+                    self._reply(413, {"error": "Request body too large"})
+                    return
+                try:
+                    spans = decode_export_request(
+                        self.rfile.read(length),
+                        self.headers.get("Content-Type", "application/json"),
+                        self.headers.get("Content-Encoding", ""),
+                    )
+                except UnsupportedEncoding as e:
+                    self._reply(415, {"error": str(e)})
+                    return
+                except BodyTooLarge as e:
+                    self._reply(413, {"error": str(e)})
+                    return
+                except Exception as e:
+                    self._reply(400, {"error": f"Invalid OTLP request: {e}"})
+                    return
+                store.add(spans)
+                # An empty response is a full success for both encodings
+                content_type = self.headers.get("Content-Type", "")
+                if "protobuf" in content_type:
+                    self._send(200, b"", "application/x-protobuf")
+                else:
+                    self._reply(200, {})
+
+            def _reply(self, status: int, document: Dict[str, Any]) -> None:
+                self._send(status, json.dumps(document).encode(), "application/json")
+
+            def _send(self, status: int, body: bytes, content_type: str) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                logger.debug(f"OTLP receiver: {format % args}")
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        # Port 0 picks a free port
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="tracenexus-otlp", daemon=True
+        )
+        self._thread.start()
+        logger.info(
+            f"OTLP receiver listening on http://{self.host}:{self.port}{TRACES_PATH}"
+        )
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
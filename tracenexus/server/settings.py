@@ -0,0 +1,84 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from ..providers.executor import DEFAULT_MAX_QUEUE, DEFAULT_MAX_WORKERS
+from ..providers.otlp import DEFAULT_MAX_SPANS
+from ..providers.payloads import DEFAULT_SPILL_THRESHOLD
+from ..providers.prefetch import DEFAULT_MAX_RELATED, DEFAULT_PREFETCH_TTL_SECONDS
+from .compression import DEFAULT_MINIMUM_SIZE
+
+DEFAULT_REQUEST_TIMEOUT_SECONDS = 60.0
+TRANSPORTS = ("both", "http", "sse", "stdio")
+OTLP_TRANSPORT_ERROR = (
+    "--otlp-port needs a single transport (--transport http, sse or stdio): "
+    "received spans live in one process, and with --transport both the "
+    "streamable-HTTP process could not serve them"
+)
+
+
+@dataclass
+class ServerSettings:
+    """Runtime options shared by both transport processes."""
+
+    # "both" (SSE plus a forked streamable-HTTP process), "http", "sse" or
+    # "stdio"; single transports run in one process
+    transport: str = "both"
+    # Open connections to each upstream host in the background at startup
+    warm_up: bool = True
+    # Compress HTTP/SSE responses for clients that send Accept-Encoding
+    compression: bool = True
+    # Regular (non-streaming) responses smaller than this are sent as-is
+    compression_min_size: int = DEFAULT_MINIMUM_SIZE
+    # SQLite file for the local full-text trace index; None disables indexing
+    index_path: Optional[str] = None
+    # Default deadline in seconds for upstream fetches; 0 disables it
+    request_timeout: float = DEFAULT_REQUEST_TIMEOUT_SECONDS
+    # Worker threads for blocking SDK calls, per provider instance
+    provider_workers: int = DEFAULT_MAX_WORKERS
+    # Calls that may wait for a worker per instance before new ones are rejected
+    provider_queue: int = DEFAULT_MAX_QUEUE
+    # Fetch traces related to each returned trace in the background
+    prefetch: bool = False
+    # Seconds a prefetched trace may wait for its (single) lookup
+    prefetch_ttl: float = DEFAULT_PREFETCH_TTL_SECONDS
+    # Maximum related traces prefetched per returned trace
+    prefetch_max: int = DEFAULT_MAX_RELATED
+    # Strings at least this many characters long are returned as a handle and
+    # preview instead of inline; 0 disables spilling
+    payload_threshold: int = DEFAULT_SPILL_THRESHOLD
+    # Directory for spilled payloads, shared by both transport processes;
+    # None uses a per-user directory under the system temp dir
+    payload_dir: Optional[str] = None
+    # Directory the export_traces tool writes into; outputs that resolve
+    # outside it are rejected. None uses "tracenexus-exports" in the working
+    # directory. The export subcommand is not restricted
+    export_dir: Optional[str] = None
+    # Emit repeated large values (such as chat histories) once, as YAML aliases
+    dedup: bool = False
+    # Fetch Langfuse observations this many per page, several pages at once;
+    # 0 fetches each trace in a single response
+    langfuse_page_size: int = 0
+    # Register one get_trace and one watch_trace tool that take the instance as
+    # an argument, instead of two tools per instance
+    compact_tools: bool = False
+    # Accept OTLP/HTTP span exports on this local port and serve them as the
+    # "otlp" provider; 0 disables the receiver. Needs a single transport
+    otlp_port: int = 0
+    # Spans kept in memory by the OTLP receiver; the oldest are evicted first
+    otlp_max_spans: int = DEFAULT_MAX_SPANS
+    # SQLite file that keeps evicted OTLP spans readable; None drops them
+    otlp_spill_path: Optional[str] = None
+    # Append every upstream response to cassette files in this directory
+    record_dir: Optional[str] = None
+    # Serve the instances recorded in this directory instead of the upstream
+    # instances configured in the environment
+    replay_dir: Optional[str] = None
+    # Seconds each replayed fetch takes; None replays the recorded latency
+    replay_latency: Optional[float] = None
+    # Directory for profiles of get_trace calls, shared by both transport
+    # processes; None disables profiling
+    profile_dir: Optional[str] = None
+    # "sample" (stack sampling, low overhead) or "cprofile"
+    profile_mode: str = "sample"
+    # Fraction of get_trace calls profiled
+    profile_rate: float = 1.0
@@ -0,0 +1,179 @@
+"""Local full-text index over traces that have already been fetched.
+
+Every trace a provider returns is flattened into span rows and written to a
+SQLite FTS5 table, so later searches ("the run where the tool said permission
+denied") are answered locally without calling the upstream APIs again.
+"""
+
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Inputs and outputs are truncated to this many characters before indexing
+MAX_TEXT_CHARS = 2000
+DEFAULT_SEARCH_LIMIT = 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS traces (
+    provider TEXT NOT NULL,
+    instance TEXT NOT NULL,
+    trace_id TEXT NOT NULL,
+    name TEXT,
+    span_count INTEGER,
+    indexed_at REAL,
+    PRIMARY KEY (provider, instance, trace_id)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS spans_fts USING fts5(
+    name, kind, model, error, input, output,
+    provider UNINDEXED, instance UNINDEXED, trace_id UNINDEXED,
+    span_id UNINDEXED, start_time UNINDEXED
+);
+"""
+
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        text = value
+    else:
+        text = json.dumps(value, default=str, ensure_ascii=False)
+    return text[:MAX_TEXT_CHARS]
+
+
+class TraceIndex:
+    """SQLite FTS5 index of span names, errors, models and truncated I/O.
+
+    Args:
+        path: Database file, or ``:memory:`` for a per-process index
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT COUNT(*) FROM traces").fetchone()
+        return int(row[0])
+
+    def add_trace(
+        self,
+        provider: str,
+        instance: str,
+        trace_id: str,
+        spans: List[Dict[str, Any]],
+    ) -> None:
+        """Replace the indexed copy of a trace with `spans`."""
+        trace_name = next((span["name"] for span in spans if span.get("name")), None)
+        rows = [
+            (
+                _text(span.get("name")),
+                _text(span.get("kind")),
+                _text(span.get("model")),
+                _text(span.get("error")),
+                _text(span.get("input")),
+                _text(span.get("output")),
+                provider,
+                instance,
+                trace_id,
+                str(span.get("span_id") or ""),
+                span.get("start_time"),
+            )
+            for span in spans
+        ]
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM spans_fts "
+                "WHERE provider = ? AND instance = ? AND trace_id = ?",
+                (provider, instance, trace_id),
+            )
+            self._conn.executemany(
+                "INSERT INTO spans_fts (name, kind, model, error, input, output, "
+                "provider, instance, trace_id, span_id, start_time) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO traces VALUES (?, ?, ?, ?, ?, ?)",
+                (provider, instance, trace_id, trace_name, len(rows), time.time()),
+            )
+
+    def listener(
+        self,
+        provider: Any,
+        trace_id: str,
+        header: Dict[str, Any],
+        items: List[Dict[str, Any]],
+    ) -> None:
+        """Trace listener that indexes every trace a provider fetches."""
+        # Index child spans too (LangSmith's get_trace returns the root only)
+        header, items = provider.complete_trace_parts(trace_id, header, items)
+        spans = provider.spans_from_trace(trace_id, header, items)
+        self.add_trace(provider.provider_type, provider.name, trace_id, spans)
+        logger.debug(f"Indexed trace {trace_id} ({len(spans)} spans)")
+
+    def search(
+        self,
+        query: str,
+        limit: int = DEFAULT_SEARCH_LIMIT,
+        instance: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Return the best matching spans, most relevant first.
+
+        Args:
+            query: FTS5 query; plain words are matched as-is and anything that
+                is not valid FTS5 syntax is searched as quoted terms
+            limit: Maximum number of hits
+            instance: Only search traces from this provider instance
+        """
+        try:
+            return self._search(query, limit, instance)
+        except sqlite3.OperationalError:
+            terms = re.findall(r"\w+", query)
+            if not terms:
+                return []
+            quoted = " ".join(f'"{term}"' for term in terms)
+            return self._search(quoted, limit, instance)
+
+    def _search(
+        self, query: str, limit: int, instance: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        sql = (
+            "SELECT provider, instance, trace_id, span_id, name, kind, model, "
+            "start_time, error, "
+            "snippet(spans_fts, -1, '[', ']', '...', 12) AS snippet "
+            "FROM spans_fts WHERE spans_fts MATCH ?"
+        )
+        params: List[Any] = [query]
+        if instance is not None:
+            sql += " AND instance = ?"
+            params.append(instance)
+        sql += " ORDER BY bm25(spans_fts) LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            columns = [column[0] for column in cursor.description]
+            return [
+                {
+                    column: value
+                    for column, value in zip(columns, row)
+                    if value not in (None, "")
+                }
+                for row in cursor.fetchall()
+            ]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()